@@ -1,5 +1,7 @@
 # Meet Maheta
 import csv
+import itertools
+import random
 
 class TrafficRecord:
     def __init__(self, data):
@@ -20,27 +22,98 @@ class TrafficRecord:
         return '\n'.join(f"{key}: {value}" for key, value in self.data.items())
     
 
-def read_csv(file_path):
-    """Reads the CSV file and returns a list of TrafficRecord objects.
+def iter_csv(file_path, chunk_size=None):
+    """Lazily reads the CSV file and yields TrafficRecord objects one at a time.
     
     Args:
         file_path (str): The path to the CSV file.
+        chunk_size (int, optional): If given, yields lists of up to chunk_size records instead.
     
-    Returns:
-        list: A list of TrafficRecord objects.
+    Yields:
+        TrafficRecord or list: The next record, or the next list of records.
     """
-    records = []
+    chunk = []
     try:
         with open(file_path, newline='') as csvfile: # Meet Maheta
             reader = csv.DictReader(csvfile)
             for row in reader:
                 record = TrafficRecord(row)
-                records.append(record)
+                if chunk_size is None:
+                    yield record
+                    continue
+                chunk.append(record)
+                if len(chunk) == chunk_size:
+                    yield chunk
+                    chunk = []
+    except FileNotFoundError:
+        print("The file is not found.")
+    except Exception as e:
+        print(f"An error occurred: {e}")
+    if chunk:
+        yield chunk
+
+def sample_csv(file_path, size, seed=None):
+    """Takes a uniform random sample of rows in one streaming pass (reservoir sampling).
+    
+    Only the sampled rows are kept in memory and turned into TrafficRecord objects,
+    so the memory used does not depend on the size of the file.
+    
+    Args:
+        file_path (str): The path to the CSV file.
+        size (int): The number of rows to sample.
+        seed (int, optional): A seed for the random choices, to get the same sample again.
+    
+    Returns:
+        list: Up to size TrafficRecord objects, in file order.
+    """
+    chooser = random.Random(seed)
+    reservoir = []
+    try:
+        with open(file_path, newline='') as csvfile:
+            reader = csv.reader(csvfile)
+            header = next(reader, None)
+            number = 0
+            for row in reader:
+                if not row:
+                    continue  # Blank lines are skipped, as csv.DictReader does
+                if number < size:
+                    reservoir.append((number, row))
+                else:
+                    slot = chooser.randrange(number + 1)  # Row number is kept with probability size / (number + 1)
+                    if slot < size:
+                        reservoir[slot] = (number, row)
+                number += 1
     except FileNotFoundError:
         print("The file is not found.")
+        return []
     except Exception as e:
         print(f"An error occurred: {e}")
-    return records
+        return []
+    reservoir.sort()
+    return [TrafficRecord(dict(zip(header, row))) for number, row in reservoir]
+
+def read_csv(file_path, limit=None, sample=False, seed=None):
+    """Reads the CSV file and returns a list of TrafficRecord objects.
+    
+    Args:
+        file_path (str): The path to the CSV file.
+        limit (int, optional): If given, only preview this many records. Parsing stops after
+            the first limit rows, so the time taken does not depend on the size of the file.
+        sample (bool): If True, return a random sample of limit records from the whole file
+            instead of the first ones, taken in one streaming pass.
+        seed (int, optional): A seed for the sample.
+    
+    Returns:
+        list: A list of TrafficRecord objects.
+    """
+    if limit is None:
+        return list(iter_csv(file_path))
+    if sample:
+        return sample_csv(file_path, limit, seed)
+    records = iter_csv(file_path)
+    head = list(itertools.islice(records, limit))
+    records.close()  # Close the file without reading the rest
+    return head
 
 def display_records(records):
     """Displays the data of each TrafficRecord.
@@ -55,7 +128,7 @@ def display_records(records):
 
 if __name__ == "__main__":
     file_path = 'Traffic_Volumes_-_Provincial_Highway_System.csv'
-    records = read_csv(file_path) # Meet Maheta
+    records = read_csv(file_path, limit=5) # Meet Maheta
     if records:
-        display_records(records[:5])  # Display first 5 records
+        display_records(records)  # Display first 5 records
     print("\nFull Name: Meet Maheta")  # Meet Maheta
@@ -16,4 +16,35 @@ CREATE TABLE IF NOT EXISTS traffic_volumes (
                     direction VARCHAR(255),
                     pct85 VARCHAR(255),
                     priority_points VARCHAR(255)
-                )
\ No newline at end of file
+                );
+
+-- The indexes are created apart from the table, so running this file again adds any index an existing table lacks.
+-- MySQL has no CREATE INDEX IF NOT EXISTS, so each statement is chosen by a lookup in information_schema.statistics.
+
+SET @create_index = (SELECT IF(COUNT(*) = 0, 'CREATE INDEX idx_section_id ON traffic_volumes (section_id)', 'DO 0')
+                     FROM information_schema.statistics
+                     WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'traffic_volumes' AND INDEX_NAME = 'idx_section_id');
+PREPARE create_index FROM @create_index;
+EXECUTE create_index;
+DEALLOCATE PREPARE create_index;
+
+SET @create_index = (SELECT IF(COUNT(*) = 0, 'CREATE INDEX idx_date ON traffic_volumes (date)', 'DO 0')
+                     FROM information_schema.statistics
+                     WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'traffic_volumes' AND INDEX_NAME = 'idx_date');
+PREPARE create_index FROM @create_index;
+EXECUTE create_index;
+DEALLOCATE PREPARE create_index;
+
+SET @create_index = (SELECT IF(COUNT(*) = 0, 'CREATE INDEX idx_highway_date ON traffic_volumes (highway, date)', 'DO 0')
+                     FROM information_schema.statistics
+                     WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'traffic_volumes' AND INDEX_NAME = 'idx_highway_date');
+PREPARE create_index FROM @create_index;
+EXECUTE create_index;
+DEALLOCATE PREPARE create_index;
+
+SET @create_index = (SELECT IF(COUNT(*) = 0, 'CREATE INDEX idx_county ON traffic_volumes (county)', 'DO 0')
+                     FROM information_schema.statistics
+                     WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'traffic_volumes' AND INDEX_NAME = 'idx_county');
+PREPARE create_index FROM @create_index;
+EXECUTE create_index;
+DEALLOCATE PREPARE create_index;
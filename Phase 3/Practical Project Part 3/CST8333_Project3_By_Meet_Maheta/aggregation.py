@@ -0,0 +1,294 @@
+# aggregation.py
+
+# Author: Meet Maheta
+
+import math
+from array import array
+from columnar_store import ColumnarStore, MISSING, TextColumn, parse_number
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+AGGREGATE_FUNCTIONS = ['count', 'sum', 'mean', 'min', 'max']
+
+
+def to_number(value):
+    """
+    Convert a raw value to a float like parse_number, using NaN for text that is not a number.
+    """
+    try:
+        return parse_number(value)
+    except (TypeError, ValueError):
+        return MISSING
+
+
+def factorize(records, name):
+    """
+    Encode the values of one attribute as integer codes.
+    ColumnarStore text columns are already encoded, so their codes are used as they are.
+
+    Parameters:
+    -----------
+    records : list of RecordBase or ColumnarStore
+        The records to encode.
+    name : str
+        The attribute name.
+
+    Returns:
+    --------
+    tuple
+        An array('i') with one code per record, and the list of values the codes stand for.
+    """
+    if isinstance(records, ColumnarStore):
+        column = records.columns[name]
+        if isinstance(column, TextColumn):
+            return column.codes, column.values
+        # Group numbers by the text records show, as the group keys of record lists are.
+        values = records.attribute_values(name)
+    else:
+        values = [getattr(record, name) for record in records]
+    lookup = {}
+    codes = array('i', (lookup.setdefault(value, len(lookup)) for value in values))
+    return codes, list(lookup)
+
+
+def numeric_column(records, name):
+    """
+    Return the values of one attribute as an array('d'), with NaN where a value is blank or not a number.
+    ColumnarStore numeric columns are returned without copying.
+    """
+    if isinstance(records, ColumnarStore):
+        column = records.columns[name]
+        if not isinstance(column, TextColumn):
+            return column
+        # Convert each distinct text once, then map the codes.
+        table = [to_number(value) for value in column.values]
+        return array('d', (table[code] for code in column.codes))
+    return array('d', (to_number(getattr(record, name)) for record in records))
+
+
+def group_codes(records, by):
+    """
+    Combine the codes of the group-by attributes into one dense group number per record.
+
+    Returns:
+    --------
+    tuple
+        The group of each record, as an int64 NumPy array when NumPy is installed and an array('q') otherwise,
+        and the list of key tuples in group order.
+    """
+    encoded = [factorize(records, name) for name in by]
+    if numpy is not None and len(encoded) == 1:
+        codes, values = encoded[0]
+        return numpy.frombuffer(codes, dtype=numpy.int32).astype(numpy.int64), [(value,) for value in values]
+    combinations = 1
+    for codes, values in encoded:
+        combinations *= max(len(values), 1)
+    if numpy is not None and combinations <= numpy.iinfo(numpy.int64).max:
+        # Mixed-radix codes, compacted to the combinations that actually occur.
+        combined = numpy.zeros(len(records), dtype=numpy.int64)
+        for codes, values in encoded:
+            combined = combined * len(values) + numpy.frombuffer(codes, dtype=numpy.int32)
+        unique, inverse = numpy.unique(combined, return_inverse=True)
+        keys = []
+        for number in unique.tolist():
+            key = []
+            for codes, values in reversed(encoded):
+                number, code = divmod(number, len(values))
+                key.append(values[code])
+            keys.append(tuple(reversed(key)))
+        return inverse.astype(numpy.int64).ravel(), keys
+    if not encoded:
+        return array('q', bytes(8 * len(records))), [()]
+    if len(encoded) == 1:
+        codes, values = encoded[0]
+        return array('q', codes), [(value,) for value in values]
+    # Too many combinations for one int64 code, or no NumPy: number the code tuples that occur instead.
+    lookup = {}
+    groups = array('q', (lookup.setdefault(key, len(lookup)) for key in zip(*(codes for codes, values in encoded))))
+    keys = [tuple(values[code] for (codes, values), code in zip(encoded, key)) for key in lookup]
+    if numpy is not None:
+        return numpy.frombuffer(groups, dtype=numpy.int64), keys
+    return groups, keys
+
+
+def _reduce_numpy(groups, count, values, functions):
+    """
+    Compute the aggregates of one column for every group with NumPy kernels.
+    """
+    values = numpy.frombuffer(values, dtype=numpy.float64)
+    present = ~numpy.isnan(values)
+    groups = groups[present]
+    values = values[present]
+    counts = numpy.bincount(groups, minlength=count)
+    results = {'count': counts.astype(numpy.float64)}
+    if 'sum' in functions or 'mean' in functions:
+        sums = numpy.bincount(groups, weights=values, minlength=count)
+        results['sum'] = sums
+        with numpy.errstate(invalid='ignore', divide='ignore'):
+            results['mean'] = numpy.where(counts > 0, sums / numpy.maximum(counts, 1), numpy.nan)
+    if 'min' in functions or 'max' in functions:
+        # Sort the values by group once; every group is then a contiguous run to reduce.
+        order = numpy.argsort(groups, kind='stable')
+        ordered = values[order]
+        filled = numpy.flatnonzero(counts)
+        starts = numpy.concatenate(([0], numpy.cumsum(counts)[:-1]))[filled]
+        for name, reduce in (('min', numpy.minimum), ('max', numpy.maximum)):
+            result = numpy.full(count, numpy.nan)
+            if len(ordered):
+                result[filled] = reduce.reduceat(ordered, starts)
+            results[name] = result
+    return {name: results[name].tolist() for name in functions}
+
+
+def _reduce_python(groups, count, values, functions):
+    """
+    Compute the aggregates of one column for every group in a single pass over the arrays.
+    """
+    counts = [0] * count
+    sums = [0.0] * count
+    lows = [math.inf] * count
+    highs = [-math.inf] * count
+    for group, value in zip(groups, values):
+        if value != value:
+            continue
+        counts[group] += 1
+        sums[group] += value
+        if value < lows[group]:
+            lows[group] = value
+        if value > highs[group]:
+            highs[group] = value
+    results = {
+        'count': [float(n) for n in counts],
+        'sum': sums,
+        'mean': [total / n if n else MISSING for total, n in zip(sums, counts)],
+        'min': [low if n else MISSING for low, n in zip(lows, counts)],
+        'max': [high if n else MISSING for high, n in zip(highs, counts)],
+    }
+    return {name: results[name] for name in functions}
+
+
+def aggregate(records, by, metrics):
+    """
+    Group records by some attributes and compute aggregates of numeric attributes for every group.
+    Keys are factorized to integer codes once and every metric is reduced over typed arrays,
+    with NumPy kernels when NumPy is installed and a single pure Python pass otherwise.
+    Blank values are left out of every aggregate.
+
+    Parameters:
+    -----------
+    records : list of RecordBase or ColumnarStore
+        The records to aggregate.
+    by : list of str
+        The attributes to group by; an empty list aggregates all records as one group.
+    metrics : dict
+        Attribute names mapped to lists of functions from AGGREGATE_FUNCTIONS, e.g. {'aadt': ['mean', 'max']}.
+
+    Returns:
+    --------
+    list of dict
+        One row per group, sorted by the group values with None last, holding the group values, 'rows' with the
+        number of records in the group, and one '<attribute>_<function>' entry per metric.
+    """
+    by, metrics = _check_metrics(by, metrics)
+    groups, keys = group_codes(records, by)
+    count = len(keys)
+    reduce = _reduce_python if numpy is None else _reduce_numpy
+    if numpy is not None:
+        sizes = numpy.bincount(groups, minlength=count).tolist()
+    else:
+        sizes = [0] * count
+        for group in groups:
+            sizes[group] += 1
+    rows = [dict(zip(by, key), rows=size) for key, size in zip(keys, sizes)]
+    for name, functions in metrics.items():
+        results = reduce(groups, count, numeric_column(records, name), functions)
+        for function in functions:
+            label = f"{name}_{function}"
+            for row, value in zip(rows, results[function]):
+                row[label] = int(value) if function == 'count' else value
+    # Drop codes no record uses any more, such as values left behind by edits of a ColumnarStore.
+    return _sorted_rows([row for row in rows if row['rows']], by)
+
+
+def stream_aggregate(chunks, by, metrics):
+    """
+    Aggregate records like aggregate in one pass over chunks of records, holding only the current chunk
+    and one row of partial results per group in memory.
+    Every chunk is aggregated on its own and its counts, sums, minima and maxima are added to the groups seen so far.
+
+    Parameters:
+    -----------
+    chunks : iterable of list of RecordBase
+        The records, in chunks such as those of TrafficManager.iter_records.
+    by : list of str
+        The attributes to group by; an empty list aggregates all records as one group.
+    metrics : dict
+        Attribute names mapped to lists of functions from AGGREGATE_FUNCTIONS.
+
+    Returns:
+    --------
+    list of dict
+        The same rows aggregate returns for all the records at once.
+    """
+    by, metrics = _check_metrics(by, metrics)
+    partial = {name: ['count', 'sum', 'min', 'max'] for name in metrics}
+    totals = {}
+    for chunk in chunks:
+        for row in aggregate(chunk, by, partial):
+            key = tuple(row[name] for name in by)
+            total = totals.get(key)
+            if total is None:
+                totals[key] = row
+                continue
+            total['rows'] += row['rows']
+            for name in metrics:
+                count = row[f"{name}_count"]
+                if not count:
+                    continue
+                if total[f"{name}_count"]:
+                    row[f"{name}_min"] = min(row[f"{name}_min"], total[f"{name}_min"])
+                    row[f"{name}_max"] = max(row[f"{name}_max"], total[f"{name}_max"])
+                total[f"{name}_count"] += count
+                total[f"{name}_sum"] += row[f"{name}_sum"]
+                total[f"{name}_min"] = row[f"{name}_min"]
+                total[f"{name}_max"] = row[f"{name}_max"]
+    rows = []
+    for total in totals.values():
+        row = {name: total[name] for name in by}
+        row['rows'] = total['rows']
+        for name, functions in metrics.items():
+            count = total[f"{name}_count"]
+            for function in functions:
+                if function == 'mean':
+                    row[f"{name}_mean"] = total[f"{name}_sum"] / count if count else MISSING
+                else:
+                    row[f"{name}_{function}"] = total[f"{name}_{function}"]
+        rows.append(row)
+    return _sorted_rows(rows, by)
+
+
+def _check_metrics(by, metrics):
+    """
+    Return the group-by attributes as a list and every metric's functions as a list, rejecting unknown functions.
+    """
+    by = [by] if isinstance(by, str) else list(by)
+    checked = {}
+    for name, functions in metrics.items():
+        functions = [functions] if isinstance(functions, str) else list(functions)
+        for function in functions:
+            if function not in AGGREGATE_FUNCTIONS:
+                raise ValueError(f"Unknown aggregate function: {function}")
+        checked[name] = functions
+    return by, checked
+
+
+def _sorted_rows(rows, by):
+    """
+    Sort aggregate rows by their group values.
+    """
+    # Blank (None) values sort after every other value instead of failing to compare with them.
+    rows.sort(key=lambda row: tuple((row[name] is None, row[name]) for name in by))
+    return rows
@@ -0,0 +1,158 @@
+# benchmark_records.py
+
+# Author: Meet Maheta
+
+import argparse
+import csv
+import itertools
+import os
+import tempfile
+import time
+import tracemalloc
+from columnar_store import ColumnarStore
+from record import TrafficRecord
+
+CSV_FILE = 'Traffic_Volumes_-_Provincial_Highway_System.csv'
+# Rows built at a time when timing construction; each chunk is dropped before the next is built.
+CHUNK_ROWS = 100000
+
+
+class DictTrafficRecord:
+    """
+    The previous record layout with a per-instance __dict__, kept as a baseline for comparison.
+    """
+
+    def __init__(self, section_id, highway, section, section_length, section_description, date, description, group, type_, county, ptrucks, adt, aadt, direction, pct85, priority_points):
+        """
+        Initialize a DictTrafficRecord object with the provided attributes.
+        """
+        self.section_id = section_id
+        self.highway = highway
+        self.section = section
+        self.section_length = section_length
+        self.section_description = section_description
+        self.date = date
+        self.description = description
+        self.group = group
+        self.type_ = type_
+        self.county = county
+        self.ptrucks = ptrucks
+        self.adt = adt
+        self.aadt = aadt
+        self.direction = direction
+        self.pct85 = pct85
+        self.priority_points = priority_points
+
+
+def build_objects(record_class):
+    """
+    Return a loader that builds a list of record_class objects from CSV rows.
+    """
+    def load(rows):
+        return [record_class(*row) for row in rows]
+    return load
+
+
+def build_columnar(rows):
+    """
+    Load CSV rows into a ColumnarStore.
+    """
+    store = ColumnarStore()
+    for row in rows:
+        store.append_row(row)
+    return store
+
+
+LAYOUTS = [
+    ('dict objects', build_objects(DictTrafficRecord)),
+    ('slotted objects', build_objects(TrafficRecord)),
+    ('columnar store', build_columnar),
+]
+
+
+def read_rows(filename, limit=None):
+    """
+    Yield the data rows of a CSV file as lists of strings, skipping the header.
+    """
+    with open(filename, newline='') as csvfile:
+        reader = csv.reader(csvfile)
+        next(reader, None)
+        yield from itertools.islice(reader, limit)
+
+
+def write_synthetic(source, rows, target):
+    """
+    Write a synthetic CSV file with the given number of rows by repeating the source rows.
+    """
+    with open(source, newline='') as csvfile:
+        reader = csv.reader(csvfile)
+        header = next(reader)
+        base = list(reader)
+    with open(target, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(header)
+        writer.writerows(itertools.islice(itertools.cycle(base), rows))
+
+
+def bytes_per_record(filename, load):
+    """
+    Measure the memory kept per record, including its strings, after loading every row of the file.
+    """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    records = load(read_rows(filename))
+    used = tracemalloc.get_traced_memory()[0] - before
+    count = len(records)
+    del records
+    tracemalloc.stop()
+    return used / max(count, 1)
+
+
+def construction_rate(filename, load):
+    """
+    Measure how many records per second are read and built from the whole file.
+    Records are built CHUNK_ROWS at a time and dropped, so the timing does not hold the whole file in memory.
+    """
+    rows = read_rows(filename)
+    count = 0
+    start = time.perf_counter()
+    while True:
+        records = load(itertools.islice(rows, CHUNK_ROWS))
+        if not len(records):
+            break
+        count += len(records)
+        del records
+    elapsed = time.perf_counter() - start
+    return count, count / elapsed
+
+
+def run(filename, label):
+    """
+    Print the memory and speed of every record layout for one file.
+    """
+    print(f"\n{label}")
+    for name, load in LAYOUTS:
+        count, rate = construction_rate(filename, load)
+        size = bytes_per_record(filename, load)
+        print(f"  {name:<16} {count:>10} rows  {size:>8.1f} bytes/record  {rate:>12,.0f} records/s")
+
+
+def main():
+    """
+    Benchmark the record layouts on the real CSV file and on synthetic files.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark traffic record memory use and construction rate.")
+    parser.add_argument('--file', default=CSV_FILE, help="The CSV file to benchmark and to build synthetic files from.")
+    parser.add_argument('--sizes', type=int, nargs='*', default=[1000000, 10000000],
+                        help="Row counts of the synthetic files to benchmark.")
+    args = parser.parse_args()
+
+    run(args.file, f"{args.file}")
+    for rows in args.sizes:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            target = os.path.join(tmpdir, 'synthetic.csv')
+            write_synthetic(args.file, rows, target)
+            run(target, f"synthetic {rows:,} rows")
+
+if __name__ == "__main__":
+    main()
@@ -3,77 +3,233 @@
 # Author: Meet Maheta
 
 import csv
+import itertools
+import os
+import threading
+from aggregation import aggregate, stream_aggregate
+from change_tracker import ChangeTracker, fsync_directory
+from columnar_store import ColumnarStore
+from filter_expression import compile_filter
+from journal import SAVE_ENTRY, Journal
+from parallel_loader import iter_parallel_rows
+from ranking import rank_positions, stream_rank
 from record import TrafficRecord
+from record_base import CSV_FIELDNAMES, RECORD_ATTRIBUTES
+from record_index import DateIndex, RecordIndex
+from snapshot_cache import read_snapshot, source_key, write_snapshot
+from string_table import StringTable
+from tail_reader import TailTracker
 from special_traffic_record import SpecialTrafficRecord
 
+# The number of records parsed at a time when a file is ranked or aggregated while it streams.
+STREAM_CHUNK_SIZE = 65536
+
 class TrafficManager:
     """
     The TrafficManager class manages a collection of RecordBase objects.
     It provides methods to load, save, add, edit, delete, and retrieve records.
     """
 
-    def __init__(self, filename):
+    def __init__(self, filename, columnar=False, workers=1, cache=False, incremental=False,
+                 journal=False, compact_bytes=64 * 1024 * 1024):
         """
         Initialize the TrafficManager with the given filename.
         
         :param filename: The path to the CSV file containing traffic data.
+        :param columnar: If True, keep the records in a ColumnarStore instead of a list of objects.
+        :param workers: The number of processes used to parse the CSV file; None uses every CPU.
+        :param cache: If True, keep a binary snapshot next to the CSV file and load from it while the file is unchanged.
+        :param incremental: If True and cache is off, reload_data only parses rows appended since the last load.
+        :param journal: If True, log every add, edit and delete to a write-ahead journal next to the CSV file
+                        and replay it on load, so changes are durable without a save.
+        :param compact_bytes: The journal size at which it is folded into the CSV file in the background.
         """
         self.filename = filename
+        self.columnar = columnar
+        self.workers = workers
+        self.cache = cache
+        self.tail = TailTracker(filename) if incremental and not cache else None
+        self.changes = ChangeTracker(filename, track_values=not columnar)
+        self.lock = threading.RLock()
+        self.journal = None
+        self.compact_bytes = compact_bytes
+        self._compactor = None
+        self.index = RecordIndex()
+        self.dates = DateIndex()
+        self.strings = StringTable()  # One shared string per distinct value of the repetitive text columns
         self.records = self.load_data(filename)
+        self.changes.reset(self.records)
+        self.index.reset(self.records)
+        self.dates.reset(self.records)
+        if journal:
+            self.journal = Journal(filename)
+            self._recover()
 
     def load_data(self, filename):
         """
         Load data from a CSV file and create TrafficRecord objects.
         
         :param filename: The path to the CSV file containing traffic data.
-        :return: A list of TrafficRecord objects.
+        :return: A list of TrafficRecord objects, or a ColumnarStore in columnar mode.
+        """
+        if self.cache:
+            store = self.load_cached(filename)
+            return store if self.columnar else list(store)
+        if self.tail is not None and filename == self.filename:
+            try:
+                return self._collect(self.tail.load(self.workers))
+            except FileNotFoundError:
+                print("File not found.")
+                return self._collect([])
+        if self.columnar:
+            return self.load_columnar(filename)
+        return list(self.iter_records(filename))
+
+    def load_cached(self, filename):
+        """
+        Load a ColumnarStore from the snapshot of a CSV file, or parse the file and rebuild the
+        snapshot if it is missing or the file changed since it was written.
+        Numeric values read this way are normalized as in a ColumnarStore, e.g. "4.50" becomes "4.5".
+        
+        :param filename: The path to the CSV file containing traffic data.
+        :return: A ColumnarStore holding one row per CSV record.
         """
         try:
-            records = []
-            with open(filename, newline='') as csvfile:
+            key = source_key(filename)
+        except FileNotFoundError:
+            print("File not found.")
+            return ColumnarStore()
+        store = read_snapshot(filename, key)
+        if store is None:
+            store = self.load_columnar(filename)
+            write_snapshot(store, filename, key)
+        return store
+
+    def load_columnar(self, filename):
+        """
+        Load data from a CSV file into a ColumnarStore.
+        
+        :param filename: The path to the CSV file containing traffic data.
+        :return: A ColumnarStore holding one row per CSV record.
+        """
+        return self._build_store(self.iter_rows(filename))
+
+    def _collect(self, rows):
+        """
+        Build the records container for this manager from rows of raw values.
+        
+        :param rows: An iterable of value lists in CSV_FIELDNAMES order.
+        :return: A ColumnarStore in columnar mode, otherwise a list of TrafficRecord objects.
+        """
+        if not self.columnar:
+            share = self.strings.share
+            return [TrafficRecord(*share(values)) for values in rows]
+        return self._build_store(rows)
+
+    @staticmethod
+    def _build_store(rows):
+        """
+        Build a ColumnarStore from rows of raw values in CSV_FIELDNAMES order.
+        """
+        store = ColumnarStore()
+        for values in rows:
+            store.append_row(values)
+        return store
+
+    def iter_rows(self, filename=None):
+        """
+        Lazily read the rows of a CSV file as lists of raw values in CSV_FIELDNAMES order.
+        With more than one worker, the file is parsed in parallel chunks and the rows still come in file order.
+        
+        :param filename: The path to the CSV file, defaults to the manager's file.
+        :return: A generator of lists of strings, one list per CSV record.
+        """
+        try:
+            if self.workers != 1:
+                yield from iter_parallel_rows(filename or self.filename, self.workers)
+                return
+            with open(filename or self.filename, newline='') as csvfile:
                 reader = csv.DictReader(csvfile)
                 for row in reader:
-                    record = TrafficRecord(
-                        row['SECTION ID'], row['HIGHWAY'], row['SECTION'], row['SECTION LENGTH'], 
-                        row['SECTION DESCRIPTION'], row['Date'], row['DESCRIPTION'], row['GROUP'], 
-                        row['TYPE'], row['COUNTY'], row['PTRUCKS'], row['ADT'], row['AADT'], 
-                        row['DIRECTION'], row['85PCT'], row['PRIORITY_POINTS']
-                    )
-                    records.append(record)
-            return records
+                    yield [row[field] for field in CSV_FIELDNAMES]
         except FileNotFoundError:
             print("File not found.")
-            return []
-
-    def save_data(self):
-        """
-        Save the current list of TrafficRecord objects to a CSV file.
-        """
-        with open(self.filename, mode='w', newline='') as csvfile:
-            fieldnames = ['SECTION ID', 'HIGHWAY', 'SECTION', 'SECTION LENGTH', 'SECTION DESCRIPTION', 
-                          'Date', 'DESCRIPTION', 'GROUP', 'TYPE', 'COUNTY', 'PTRUCKS', 'ADT', 'AADT', 
-                          'DIRECTION', '85PCT', 'PRIORITY_POINTS']
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            writer.writeheader()
-            for record in self.records:
-                writer.writerow({
-                    'SECTION ID': record.section_id,
-                    'HIGHWAY': record.highway,
-                    'SECTION': record.section,
-                    'SECTION LENGTH': record.section_length,
-                    'SECTION DESCRIPTION': record.section_description,
-                    'Date': record.date,
-                    'DESCRIPTION': record.description,
-                    'GROUP': record.group,
-                    'TYPE': record.type_,
-                    'COUNTY': record.county,
-                    'PTRUCKS': record.ptrucks,
-                    'ADT': record.adt,
-                    'AADT': record.aadt,
-                    'DIRECTION': record.direction,
-                    '85PCT': record.pct85,
-                    'PRIORITY_POINTS': record.priority_points
-                })
+
+    def iter_records(self, filename=None, chunk_size=None):
+        """
+        Lazily read TrafficRecord objects from a CSV file, so only one record or chunk is held at a time.
+        The result can be passed to save_data or any other consumer of records.
+        
+        :param filename: The path to the CSV file, defaults to the manager's file.
+        :param chunk_size: If given, yield lists of up to chunk_size records instead of single records.
+        :return: A generator of TrafficRecord objects, or of lists of TrafficRecord objects.
+        """
+        share = self.strings.share
+        records = (TrafficRecord(*share(values)) for values in self.iter_rows(filename))
+        if chunk_size is None:
+            return records
+        return self._chunked(records, chunk_size)
+
+    @staticmethod
+    def _chunked(records, chunk_size):
+        """
+        Group an iterable of records into lists of up to chunk_size records.
+        """
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+        records = iter(records)
+        while True:
+            chunk = list(itertools.islice(records, chunk_size))
+            if not chunk:
+                return
+            yield chunk
+
+    def save_data(self, records=None):
+        """
+        Save TrafficRecord objects to the CSV file.
+        When saving the current records, only the changes since the last load or save are written:
+        pure appends are appended, and other changes copy the unchanged rows from the old file.
+        Otherwise the file is written to a temporary file first and then replaced, so records streamed
+        from iter_records on the same file can be saved back in constant memory.
+        
+        :param records: An iterable of records to save, defaults to the current list of records.
+        """
+        with self.lock:
+            if self.journal is not None:
+                # Marks the journal as saved if the file changes before the journal is restarted.
+                self.journal.append(SAVE_ENTRY)
+            rows = self._save(records)
+            if self.journal is not None:
+                self.journal.reset(rows=rows)
+
+    def _save(self, records):
+        """
+        Write records to the CSV file, incrementally when they are the current records.
+        
+        :return: The number of rows in the saved file.
+        """
+        self._forget_tail()
+        if records is None:
+            if self.changes.save(self.records):
+                return len(self.records)
+            records = self.records
+        temp_filename = self.filename + '.tmp'
+        rows = 0
+        with open(temp_filename, mode='w', newline='') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(CSV_FIELDNAMES)
+            for record in records:
+                writer.writerow([getattr(record, name) for name in RECORD_ATTRIBUTES])
+                rows += 1
+            csvfile.flush()
+            os.fsync(csvfile.fileno())
+        os.replace(temp_filename, self.filename)
+        fsync_directory(self.filename)
+        if records is self.records:
+            self.changes.reset(self.records)
+        else:
+            self.changes.invalidate()
+        return rows
 
     def add_record(self, record_data):
         """
@@ -81,8 +237,14 @@ class TrafficManager:
         
         :param record_data: A dictionary containing the data for the new record.
         """
-        record = TrafficRecord(**record_data)
-        self.records.append(record)
+        record = self.strings.share_record(TrafficRecord(**record_data))
+        with self.lock:
+            self.records.append(record)
+            self.changes.added()
+            self.index.added(len(self.records) - 1)
+            self.dates.added(len(self.records) - 1)
+            self._forget_tail()
+            self._log(['add', [getattr(record, name) for name in RECORD_ATTRIBUTES]])
 
     def edit_record(self, index, new_data):
         """
@@ -91,11 +253,30 @@ class TrafficManager:
         :param index: The index of the record to edit.
         :param new_data: A dictionary containing the updated data for the record.
         :return: True if the record was successfully edited, False otherwise.
+        :raises AttributeError: If new_data names an unknown attribute; the record is left unchanged.
         """
-        if 0 <= index < len(self.records):
-            for key, value in new_data.items():
-                setattr(self.records[index], key, value)
-            return True
+        with self.lock:
+            if 0 <= index < len(self.records):
+                for key in new_data:
+                    if key not in RECORD_ATTRIBUTES:
+                        raise AttributeError(f"Unknown record attribute: {key}")
+                self.index.before_edit(index)
+                self.dates.before_edit(index)
+                try:
+                    if self.columnar:
+                        self.records.update_row(index, new_data)
+                    else:
+                        for key, value in new_data.items():
+                            setattr(self.records[index], key, value)
+                        self.strings.share_record(self.records[index])
+                finally:
+                    self.index.after_edit(index)
+                    self.dates.after_edit(index)
+                self.changes.edited(index)
+                self._forget_tail()
+                # Only an edit that was applied is journaled, so replaying the journal cannot fail on it.
+                self._log(['edit', index, new_data])
+                return True
         return False
 
     def delete_record(self, index):
@@ -105,9 +286,15 @@ class TrafficManager:
         :param index: The index of the record to delete.
         :return: True if the record was successfully deleted, False otherwise.
         """
-        if 0 <= index < len(self.records):
-            del self.records[index]
-            return True
+        with self.lock:
+            if 0 <= index < len(self.records):
+                del self.records[index]
+                self.changes.deleted(index)
+                self.index.deleted(index)
+                self.dates.deleted(index)
+                self._forget_tail()
+                self._log(['delete', index])
+                return True
         return False
 
     def get_record(self, index):
@@ -121,11 +308,263 @@ class TrafficManager:
             return self.records[index]
         return None
 
+    def fetch_page(self, size, after=None, before=None):
+        """
+        Retrieve one page of records by offset, for browsing without copying the records list.
+        The record indexes act as the page cursors.
+        
+        :param size: The most records on the page.
+        :param after: If given, the page starts with the record after this index.
+        :param before: If given, the page ends with the record before this index.
+        :return: A list of (index, TrafficRecord) pairs in index order; the first page when neither cursor is given.
+        """
+        with self.lock:
+            if before is not None:
+                end = min(max(before, 0), len(self.records))
+                start = max(end - size, 0)
+            else:
+                start = 0 if after is None else max(after + 1, 0)
+                end = min(start + size, len(self.records))
+            return [(index, self.records[index]) for index in range(start, end)]
+
+    def find_indexes(self, **criteria):
+        """
+        Find the indexes of the records whose attributes equal all the given values.
+        section_id, highway, county and direction are looked up in hash indexes.
+        
+        :param criteria: Attribute names mapped to values, e.g. county='HFX', highway='102'.
+        :return: A list of record indexes in ascending order.
+        """
+        with self.lock:
+            return self.index.positions(**criteria)
+
+    def find_by(self, **criteria):
+        """
+        Find the records whose attributes equal all the given values.
+        
+        :param criteria: Attribute names mapped to values, e.g. section_id='1047'.
+        :return: A list of TrafficRecord objects.
+        """
+        with self.lock:
+            return [self.records[index] for index in self.index.positions(**criteria)]
+
+    def find_date_range(self, start, end, highway=None):
+        """
+        Find the records dated between two dates, both included, using the sorted date index.
+        
+        :param start: The first date, as a datetime.date or text such as '2019-01-01' or '01/01/2019'.
+        :param end: The last date, in the same forms.
+        :param highway: If given, only records of this highway are returned.
+        :return: A list of TrafficRecord objects in date order, or in file order when a highway is given.
+        """
+        with self.lock:
+            candidates = None if highway is None else self.index.positions(highway=highway)
+            return [self.records[index] for index in self.dates.positions(start, end, candidates)]
+
+    def query_indexes(self, expression):
+        """
+        Find the indexes of the records that match a filter expression.
+        The expression is compiled once and cached; equality on indexed attributes and date
+        comparisons probe the indexes, other comparisons run over whole columns at once.
+        Those columns are typed arrays only with columnar=True; over a list of records each query
+        first converts the numeric columns it uses, so use columnar mode for repeated numeric filters.
+        
+        :param expression: A filter such as 'aadt > 5000 and county == "HFX" and date >= 2020-01-01'.
+        :return: A list of record indexes in ascending order.
+        :raises ValueError: If the expression is not valid.
+        """
+        with self.lock:
+            return compile_filter(expression).positions(self.records, self.index, self.dates)
+
+    def query(self, expression):
+        """
+        Find the records that match a filter expression.
+        
+        :param expression: A filter such as 'highway in (102, 103) and not direction == "N"'.
+        :return: A list of TrafficRecord objects.
+        :raises ValueError: If the expression is not valid.
+        """
+        with self.lock:
+            return [self.records[index] for index in self.query_indexes(expression)]
+
+    def top_k(self, column, k, where=None, filename=None):
+        """
+        Find the k records with the largest values of a numeric attribute, without sorting every record.
+        
+        :param column: The numeric attribute to rank by, e.g. 'aadt'.
+        :param k: The number of records to return.
+        :param where: An optional filter expression the records must match, e.g. 'county == HFX'.
+        :param filename: If given, this CSV file is ranked in one streaming pass instead of the loaded records.
+        :return: A list of up to k records, largest first; records with a blank value are skipped.
+        :raises ValueError: If the attribute is not numeric or the filter is not valid.
+        """
+        return self._rank(column, k, where, filename, largest=True)
+
+    def bottom_k(self, column, k, where=None, filename=None):
+        """
+        Find the k records with the smallest values of a numeric attribute, without sorting every record.
+        
+        :param column: The numeric attribute to rank by, e.g. 'ptrucks'.
+        :param k: The number of records to return.
+        :param where: An optional filter expression the records must match.
+        :param filename: If given, this CSV file is ranked in one streaming pass instead of the loaded records.
+        :return: A list of up to k records, smallest first; records with a blank value are skipped.
+        :raises ValueError: If the attribute is not numeric or the filter is not valid.
+        """
+        return self._rank(column, k, where, filename, largest=False)
+
+    def _rank(self, column, k, where, filename, largest):
+        """
+        Rank the loaded records, or stream a CSV file when a filename is given.
+        """
+        if filename is not None:
+            return stream_rank(self.iter_records(filename, chunk_size=STREAM_CHUNK_SIZE), column, k, where, largest)
+        with self.lock:
+            candidates = None if where is None else self.query_indexes(where)
+            return [self.records[index] for index in rank_positions(self.records, column, k, candidates, largest)]
+
+    def aggregate(self, by, metrics, filename=None):
+        """
+        Group the records by some attributes and compute totals, means, minima and maxima of numeric attributes.
+        
+        :param by: The attributes to group by, e.g. ['county'], or an empty list for one overall group.
+        :param metrics: Attribute names mapped to functions, e.g. {'aadt': ['mean', 'max'], 'adt': ['sum']}.
+        :param filename: If given, this CSV file is aggregated in one streaming pass instead of the loaded records.
+        :return: A list of dictionaries, one per group, sorted by the group values.
+        """
+        if filename is not None:
+            return stream_aggregate(self.iter_records(filename, chunk_size=STREAM_CHUNK_SIZE), by, metrics)
+        with self.lock:
+            return aggregate(self.records, by, metrics)
+
     def reload_data(self):
         """
         Reload the data from the CSV file.
+        In incremental mode, when the file has only grown since the last load, just the new rows are parsed.
+        With a journal, its changes are applied again on top of the reloaded file.
+        """
+        with self.lock:
+            if self.tail is not None:
+                rows = self.tail.read_tail()
+                if rows is not None:
+                    self._append_rows(rows)
+                    if rows:
+                        self._log(['tail', len(rows), self.tail.offset])
+                    return
+            self.strings.clear()
+            self.records = self.load_data(self.filename)
+            self.changes.reset(self.records)
+            self.index.reset(self.records)
+            self.dates.reset(self.records)
+            if self.journal is not None:
+                self._recover()
+
+    def _log(self, entry):
+        """
+        Write a change to the journal, if there is one, and start a compaction when it grows too large.
+        """
+        if self.journal is None:
+            return
+        self.journal.append(entry)
+        if self.journal.size > self.compact_bytes and not (self._compactor and self._compactor.is_alive()):
+            self._compactor = threading.Thread(target=self.compact, daemon=True)
+            self._compactor.start()
+
+    def _append_rows(self, rows):
+        """
+        Append rows that were appended to the CSV file, keeping the indexes and the change tracker in step.
+        """
+        for values in rows:
+            if self.columnar:
+                self.records.append_row(values)
+            else:
+                self.records.append(TrafficRecord(*self.strings.share(values)))
+            self.index.added(len(self.records) - 1)
+            self.dates.added(len(self.records) - 1)
+        self.changes.extended(self.records, len(rows))
+
+    def _recover(self):
+        """
+        Apply the journal to freshly loaded records and rewrite it with the entries that were applied.
+        The entries are replayed against the rows the journal was started with; rows appended to the file
+        since then are folded in where earlier reloads read them, and any new ones after the replayed changes.
+        """
+        journal = self.journal
+        entries = journal.read()
+        if journal.rows is None or journal.rows > len(self.records):
+            journal.reset(rows=len(self.records))
+            return
+        tail = []
+        if journal.rows < len(self.records):
+            tail = [[getattr(record, name) for name in RECORD_ATTRIBUTES] for record in self.records[journal.rows:]]
+            while len(self.records) > journal.rows:
+                del self.records[len(self.records) - 1]
+            self.changes.reset(self.records)
+            self.index.reset(self.records)
+            self.dates.reset(self.records)
+        applied = self._replay(entries, tail)
+        if tail:
+            self._append_rows(tail)
+            applied.append(['tail', len(tail), os.path.getsize(self.filename)])
+        journal.rewrite(applied)
+
+    def _replay(self, entries, tail=None):
+        """
+        Apply journal entries to the records without logging them again.
+        An entry that can no longer be applied is set aside in the journal's rejected file instead of stopping the load.
+        
+        :param entries: The journal entries in the order they were written.
+        :param tail: The values of the rows appended to the file after the journal was started; folded rows are removed.
+        :return: The entries that were applied.
+        """
+        journal, self.journal = self.journal, None
+        applied = []
+        rejected = []
+        try:
+            for entry in entries:
+                try:
+                    done = self._apply(entry, tail if tail is not None else [])
+                except (AttributeError, IndexError, KeyError, TypeError, ValueError):
+                    done = False
+                (applied if done else rejected).append(entry)
+        finally:
+            self.journal = journal
+        if rejected:
+            print(f"Skipped {len(rejected)} journal entries that could not be applied.")
+            journal.reject(rejected)
+        return applied
+
+    def _apply(self, entry, tail):
+        """
+        Apply one journal entry, returning True if it changed the records.
+        """
+        if entry[0] == 'tail':
+            if not 0 < entry[1] <= len(tail):
+                return False
+            self._append_rows(tail[:entry[1]])
+            del tail[:entry[1]]
+            return True
+        if entry[0] == 'add':
+            self.add_record(dict(zip(RECORD_ATTRIBUTES, entry[1])))
+            return True
+        if entry[0] == 'edit':
+            return self.edit_record(entry[1], entry[2])
+        if entry[0] == 'delete':
+            return self.delete_record(entry[1])
+        return False
+
+    def compact(self):
+        """
+        Fold the journal into the CSV file by saving the records and starting an empty journal.
+        """
+        self.save_data()
+
+    def _forget_tail(self):
+        """
+        Make the next reload a full one, because the records no longer mirror the file.
         """
-        self.records = self.load_data(self.filename)
+        if self.tail is not None:
+            self.tail.reset()
 
     def demonstrate_polymorphism(self):
         """
@@ -0,0 +1,322 @@
+# change_tracker.py
+
+# Author: Meet Maheta
+
+import csv
+import mmap
+import os
+from array import array
+from parallel_loader import count_quotes
+from record_base import RECORD_ATTRIBUTES
+from row_tracker import row_hash
+
+# Marks a record that was added or edited since the last save and has to be written out again.
+DIRTY = -1
+COPY_BLOCK_BYTES = 1024 * 1024
+
+
+def row_ranges(data):
+    """
+    Find the byte range of every non-empty row after the header of a CSV file.
+    A newline ends a row only outside quoted fields, as in parallel_loader.
+
+    Parameters:
+    -----------
+    data : mmap.mmap
+        The raw file contents.
+
+    Returns:
+    --------
+    tuple
+        The header end offset, and arrays with the start and end (after the newline) of each row.
+    """
+    starts = array('Q')
+    ends = array('Q')
+    header_end = None
+    position = 0
+    start = 0
+    quotes = 0
+    next_quote = data.find(b'"')
+    while True:
+        newline = data.find(b'\n', position)
+        if newline < 0:
+            break
+        # Most lines have no quotes, so they are only counted when the next quote is on this line.
+        if 0 <= next_quote < newline:
+            quotes += count_quotes(data, position, newline)
+            next_quote = data.find(b'"', newline)
+        position = newline + 1
+        if quotes % 2:
+            continue
+        if header_end is None:
+            header_end = position
+        elif data[start:newline].rstrip(b'\r'):
+            starts.append(start)
+            ends.append(position)
+        start = position
+        quotes = 0
+    size = len(data)
+    if header_end is None:
+        header_end = size
+    elif start < size and data[start:size].rstrip(b'\r'):
+        starts.append(start)
+        ends.append(size)
+    return header_end, starts, ends
+
+
+def fsync_directory(path):
+    """
+    Flush a directory entry to disk so a rename inside it survives a crash, where the platform allows it.
+    """
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class ChangeTracker:
+    """
+    The ChangeTracker class remembers which records were added, edited or deleted since a CSV file
+    was loaded or saved, so a save only has to write what changed.
+    For every record it keeps the row number it came from in the file, or DIRTY.
+    Records can also be changed in place without edited, for example through get_record, so unless the
+    records are read-only copies it also keeps a hash of the values each row held; a save treats every
+    record whose values no longer match that hash as edited.
+    """
+
+    def __init__(self, filename, track_values=True):
+        """
+        Initialize a ChangeTracker for a CSV file with no loaded records.
+
+        Parameters:
+        -----------
+        filename : str
+            The path to the CSV file.
+        track_values : bool
+            If False, the records cannot be changed in place and no value hashes are kept.
+        """
+        self.filename = filename
+        self.track_values = track_values
+        self.reset(())
+
+    def reset(self, records):
+        """
+        Record that the records now mirror the rows of the file exactly.
+
+        Parameters:
+        -----------
+        records : sequence
+            The records loaded from or saved to the file.
+        """
+        count = len(records)
+        self.origins = array('q', range(count))
+        self.hashes = array('q', map(row_hash, records)) if self.track_values else None
+        self.file_rows = count
+        self.file_state = self._stat()
+
+    def invalidate(self):
+        """
+        Forget the link between records and file rows, so the next save rewrites the whole file.
+        """
+        self.file_state = None
+
+    def extended(self, records, count):
+        """
+        Record that count rows appended to the file were loaded as the last count records.
+        """
+        self.origins.extend(range(self.file_rows, self.file_rows + count))
+        if self.hashes is not None:
+            self.hashes.extend(row_hash(records[index]) for index in range(len(records) - count, len(records)))
+        self.file_rows += count
+        self.file_state = self._stat()
+
+    def added(self):
+        """
+        Record that a new record was appended.
+        """
+        self.origins.append(DIRTY)
+        if self.hashes is not None:
+            self.hashes.append(0)
+
+    def edited(self, index):
+        """
+        Record that the record at an index was changed.
+        """
+        self.origins[index] = DIRTY
+
+    def deleted(self, index):
+        """
+        Record that the record at an index was removed.
+        """
+        del self.origins[index]
+        if self.hashes is not None:
+            del self.hashes[index]
+
+    def _stat(self):
+        """
+        Return the size and modification time of the file, or None if it does not exist.
+        """
+        try:
+            stat = os.stat(self.filename)
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def save(self, records):
+        """
+        Write the changes since the last load or save to the file.
+        Pure appends are appended; other changes rewrite the file into a temporary copy, taking the
+        bytes of unchanged rows straight from the old file, and then replace it atomically.
+
+        Parameters:
+        -----------
+        records : sequence
+            The current records; they must be the ones the changes were recorded against.
+
+        Returns:
+        --------
+        bool
+            True if the file was saved, False if the caller has to rewrite the whole file instead.
+        """
+        if self.file_state is None or self.file_state != self._stat() or len(self.origins) != len(records):
+            return False
+        self._find_changed(records)
+        count = self.file_rows
+        if len(self.origins) >= count and self.origins[:count] == array('q', range(count)):
+            added = self.origins[count:]
+            if added.count(DIRTY) == len(added):
+                self._append(records[count:])
+                self._saved(records)
+                return True
+        with open(self.filename, 'rb') as csvfile, mmap.mmap(csvfile.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            header_end, starts, ends = row_ranges(data)
+            if len(starts) != count:
+                return False
+            self._rewrite(records, data, header_end, starts, ends)
+        self._saved(records)
+        return True
+
+    def _find_changed(self, records):
+        """
+        Mark the records whose values no longer match the rows they were read from as edited.
+        """
+        if self.hashes is None:
+            return
+        origins = self.origins
+        for index, record, origin, saved in zip(range(len(origins)), records, origins, self.hashes):
+            if origin != DIRTY and row_hash(record) != saved:
+                origins[index] = DIRTY
+
+    def _saved(self, records):
+        """
+        Record that the records were written to the file, hashing only those that were rewritten.
+        """
+        if self.hashes is not None:
+            hashes = self.hashes
+            for index, origin in enumerate(self.origins):
+                if origin == DIRTY:
+                    hashes[index] = row_hash(records[index])
+        count = len(records)
+        self.origins = array('q', range(count))
+        self.file_rows = count
+        self.file_state = self._stat()
+
+    def _run_length(self, index):
+        """
+        Return how many records from an index come from consecutive file rows.
+        Slices are compared in growing then halving steps, so long unchanged runs cost a few array comparisons.
+        """
+        origins = self.origins
+        origin = origins[index]
+        total = len(origins)
+
+        def consecutive(length):
+            return origins[index:index + length] == array('q', range(origin, origin + length))
+
+        low = 1
+        step = 1
+        while index + low + step <= total and consecutive(low + step):
+            low += step
+            step *= 2
+        while step > 1:
+            step //= 2
+            if index + low + step <= total and consecutive(low + step):
+                low += step
+        return low
+
+    def _line_terminator(self, data):
+        """
+        Return the line ending used by the header of the file.
+        """
+        newline = data.find(b'\n')
+        return '\r\n' if newline > 0 and data[newline - 1:newline] == b'\r' else '\n'
+
+    def _append(self, records):
+        """
+        Append new records to the end of the file, undoing a partial write if it fails.
+        """
+        if not records:
+            return
+        with open(self.filename, 'rb') as csvfile:
+            head = csvfile.read(64 * 1024)
+            csvfile.seek(0, os.SEEK_END)
+            size = csvfile.tell()
+            csvfile.seek(max(size - 1, 0))
+            last = csvfile.read(1)
+        terminator = self._line_terminator(head)
+        with open(self.filename, 'a', newline='') as csvfile:
+            try:
+                if last not in (b'\n', b''):
+                    csvfile.write(terminator)
+                writer = csv.writer(csvfile, lineterminator=terminator)
+                for record in records:
+                    writer.writerow([getattr(record, name) for name in RECORD_ATTRIBUTES])
+                csvfile.flush()
+                os.fsync(csvfile.fileno())
+            except BaseException:
+                csvfile.flush()
+                csvfile.truncate(size)
+                raise
+
+    def _rewrite(self, records, data, header_end, starts, ends):
+        """
+        Write the records to a temporary file, copying runs of unchanged rows from the old file,
+        then flush it and move it over the old file.
+        """
+        temp_filename = self.filename + '.tmp'
+        terminator = self._line_terminator(data)
+        with open(temp_filename, 'w', newline='') as csvfile:
+            writer = csv.writer(csvfile, lineterminator=terminator)
+            raw = csvfile.buffer
+            csvfile.flush()
+            raw.write(data[:header_end])
+            index = 0
+            total = len(records)
+            while index < total:
+                origin = self.origins[index]
+                if origin == DIRTY:
+                    record = records[index]
+                    writer.writerow([getattr(record, name) for name in RECORD_ATTRIBUTES])
+                    index += 1
+                    continue
+                run = index + self._run_length(index)
+                csvfile.flush()
+                end = ends[origin + (run - index) - 1]
+                position = starts[origin]
+                while position < end:
+                    stop = min(end, position + COPY_BLOCK_BYTES)
+                    raw.write(data[position:stop])
+                    position = stop
+                if data[end - 1:end] != b'\n':
+                    raw.write(terminator.encode('ascii'))
+                index = run
+            csvfile.flush()
+            os.fsync(csvfile.fileno())
+        os.replace(temp_filename, self.filename)
+        fsync_directory(self.filename)
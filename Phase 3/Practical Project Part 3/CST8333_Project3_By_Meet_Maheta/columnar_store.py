@@ -0,0 +1,453 @@
+# columnar_store.py
+
+# Author: Meet Maheta
+
+import math
+from array import array
+from bisect import bisect_right, insort
+from itertools import zip_longest
+from record import TrafficRecord
+from record_base import RECORD_ATTRIBUTES, NUMERIC_ATTRIBUTES
+
+MISSING = float('nan')
+# The number of deleted rows marked before they are removed from the arrays.
+COMPACT_ROWS = 1024
+
+
+def parse_number(value):
+    """
+    Convert a raw CSV value to a float, using NaN for blank or missing values and for text that is not a number.
+
+    Parameters:
+    -----------
+    value : str, int, float or None
+        The raw value to convert.
+
+    Returns:
+    --------
+    float
+        The numeric value, or NaN if the value is blank or not a number.
+    """
+    if value is None or value == '' or value == 'N/A':
+        return MISSING
+    try:
+        return float(value)
+    except ValueError:
+        return MISSING
+
+
+def format_number(value):
+    """
+    Convert a stored float back to the text form used in the CSV file.
+
+    Parameters:
+    -----------
+    value : float
+        The stored value.
+
+    Returns:
+    --------
+    str
+        An empty string for NaN, an integer string for whole numbers, otherwise the shortest float text.
+    """
+    if math.isnan(value):
+        return ''
+    if value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class TextColumn:
+    """
+    A text column stored as integer codes into a table of distinct values.
+    """
+
+    def __init__(self):
+        """
+        Initialize an empty text column.
+        """
+        self.codes = array('i')
+        self.values = []
+        self.lookup = {}
+
+    def encode(self, value):
+        """
+        Return the code for a value, adding it to the value table if it is new.
+
+        Parameters:
+        -----------
+        value : str
+            The text value to encode.
+
+        Returns:
+        --------
+        int
+            The code of the value.
+        """
+        value = '' if value is None else str(value)
+        code = self.lookup.get(value)
+        if code is None:
+            code = len(self.values)
+            self.values.append(value)
+            self.lookup[value] = code
+        return code
+
+
+class StoredRecord(TrafficRecord):
+    """
+    A TrafficRecord built from one row of a ColumnarStore. It is a copy of the row,
+    so its attributes cannot be set; rows are changed with ColumnarStore.update_row
+    or TrafficManager.edit_record instead of being silently left unchanged.
+    """
+
+    __slots__ = ()
+
+    def __init__(self, *values):
+        """
+        Initialize a StoredRecord with the values of a row in RECORD_ATTRIBUTES order.
+        """
+        for name, value in zip(RECORD_ATTRIBUTES, values):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Records read from a ColumnarStore are copies; change the row with edit_record")
+
+    def __delattr__(self, name):
+        raise AttributeError("Records read from a ColumnarStore are copies; change the row with edit_record")
+
+
+class ColumnarStore:
+    """
+    The ColumnarStore class keeps traffic records column by column.
+    Numeric attributes live in float arrays and text attributes in encoded integer arrays.
+    On the sample CSV file a row costs about 186 bytes, against about 871 bytes for a record
+    object with a __dict__ and its strings, or 4.7 times less (see benchmark_records.py).
+    A numeric value the float arrays cannot give back as it was given, such as the text 'P' or '4.50'
+    or a float set by an edit, is stored as its number (NaN if it is not one) and the value itself
+    is kept in the raw table of the column, so records show the same values as in list mode.
+    It behaves like a list of TrafficRecord objects for reading, appending and deleting.
+    Deleted rows are only marked at first and removed from the arrays in one pass later,
+    when COMPACT_ROWS rows are marked or the columns are read directly.
+    """
+
+    def __init__(self):
+        """
+        Initialize an empty store with one column per record attribute.
+        """
+        self._columns = {}
+        self._raw = {}  # Numeric column name -> {row position in the arrays: value as given}
+        self._deleted = []  # Sorted positions in the arrays of rows deleted but not yet removed
+        for name in RECORD_ATTRIBUTES:
+            if name in NUMERIC_ATTRIBUTES:
+                self._columns[name] = array('d')
+                self._raw[name] = {}
+            else:
+                self._columns[name] = TextColumn()
+        self._appenders = [self._appender(name) for name in RECORD_ATTRIBUTES]
+
+    @property
+    def columns(self):
+        """
+        The columns by attribute name: an array('d') per numeric attribute and a TextColumn per text attribute.
+        """
+        self._compact()
+        return self._columns
+
+    @property
+    def raw(self):
+        """
+        The raw table of every numeric column, mapping row indexes to the values kept as given.
+        """
+        self._compact()
+        return self._raw
+
+    def _appender(self, name):
+        """
+        Build a function that appends one raw value to the named column.
+        """
+        column = self._columns[name]
+        if isinstance(column, TextColumn):
+            codes_append = column.codes.append
+            encode = column.encode
+            return lambda value: codes_append(encode(value))
+        values_append = column.append
+        raw = self._raw[name]
+        convert = self._convert
+
+        def append_number(value):
+            number, keep = convert(value)
+            if keep:
+                raw[len(column)] = value
+            values_append(number)
+        return append_number
+
+    @staticmethod
+    def _convert(value):
+        """
+        Convert a raw numeric value to the float stored for it, and whether the value itself has to be
+        kept in the raw table because format_number would not give it back.
+        """
+        number = parse_number(value)
+        if value is None:
+            return number, False
+        if type(value) is not str:
+            return number, True
+        return number, format_number(number) != value
+
+    def _position(self, index):
+        """
+        Return the position in the arrays of the row at an index, skipping the rows marked as deleted.
+        """
+        deleted = self._deleted
+        if not deleted:
+            return index
+        skipped = bisect_right(deleted, index)
+        while True:
+            following = bisect_right(deleted, index + skipped)
+            if following == skipped:
+                return index + skipped
+            skipped = following
+
+    def _check(self, index):
+        """
+        Return the position in the arrays of the row at an index, which may be negative.
+        """
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("record index out of range")
+        return self._position(index)
+
+    def _compact(self):
+        """
+        Remove the rows marked as deleted from every column in one pass.
+        """
+        deleted = self._deleted
+        if not deleted:
+            return
+        bounds = [-1] + deleted + [len(self._columns['section_id'].codes)]
+        removed = set(deleted)
+        for name, column in self._columns.items():
+            values = column.codes if isinstance(column, TextColumn) else column
+            kept = array(values.typecode)
+            for low, high in zip(bounds, bounds[1:]):
+                kept.extend(values[low + 1:high])
+            # Replaced in place, so the appenders keep writing to the same arrays.
+            values[:] = kept
+            raw = self._raw.get(name)
+            if raw:
+                moved = {position - bisect_right(deleted, position): value
+                         for position, value in raw.items() if position not in removed}
+                raw.clear()
+                raw.update(moved)
+        self._deleted = []
+
+    def __len__(self):
+        """
+        Return the number of rows in the store.
+        """
+        return len(self._columns['section_id'].codes) - len(self._deleted)
+
+    def __iter__(self):
+        """
+        Iterate over the rows as StoredRecord objects.
+        """
+        self._compact()
+        for index in range(len(self)):
+            yield self._build_record(index)
+
+    def __getitem__(self, index):
+        """
+        Return the row at an index as a StoredRecord, or a list of them for a slice.
+        """
+        if isinstance(index, slice):
+            self._compact()
+            return [self._build_record(i) for i in range(*index.indices(len(self)))]
+        return self._build_record(self._check(index))
+
+    def __delitem__(self, index):
+        """
+        Delete the row at an index. The row is marked and skipped at once, and removed from the arrays later,
+        so a run of deletes costs one pass over the columns instead of one per delete.
+        """
+        insort(self._deleted, self._check(index))
+        if len(self._deleted) >= COMPACT_ROWS:
+            self._compact()
+
+    def append_row(self, values):
+        """
+        Append one row given as raw values in RECORD_ATTRIBUTES order.
+        Missing trailing values are appended as blanks, so every column keeps the same length.
+
+        Parameters:
+        -----------
+        values : sequence
+            The 16 raw values of the row, for example the fields of a CSV line.
+
+        Raises:
+        -------
+        ValueError
+            If the row has more values than there are attributes.
+        """
+        if len(values) > len(self._appenders):
+            raise ValueError(f"Expected at most {len(self._appenders)} values, got {len(values)}")
+        for append, value in zip_longest(self._appenders, values, fillvalue=''):
+            append(value)
+
+    def append(self, record):
+        """
+        Append a record object to the store.
+
+        Parameters:
+        -----------
+        record : RecordBase
+            The record whose attributes are copied into the columns.
+        """
+        self.append_row([getattr(record, name) for name in RECORD_ATTRIBUTES])
+
+    def update_row(self, index, new_data):
+        """
+        Update some attributes of one row.
+        Every value is converted before any column is written, so a row is never left half updated.
+
+        Parameters:
+        -----------
+        index : int
+            The index of the row to update.
+        new_data : dict
+            A dictionary mapping attribute names to their new values.
+        """
+        for name in new_data:
+            if name not in self._columns:
+                raise AttributeError(f"Unknown record attribute: {name}")
+        position = self._check(index)
+        numbers = {name: self._convert(value) for name, value in new_data.items()
+                   if not isinstance(self._columns[name], TextColumn)}
+        for name, value in new_data.items():
+            column = self._columns[name]
+            if isinstance(column, TextColumn):
+                column.codes[position] = column.encode(value)
+                continue
+            column[position], keep = numbers[name]
+            if keep:
+                self._raw[name][position] = value
+            else:
+                self._raw[name].pop(position, None)
+
+    def get_value(self, index, name):
+        """
+        Return a single decoded value from the store.
+
+        Parameters:
+        -----------
+        index : int
+            The index of the row.
+        name : str
+            The attribute name of the column.
+
+        Returns:
+        --------
+        str or float
+            The text value, or the float value (NaN when blank) for numeric columns.
+        """
+        column = self._columns[name]
+        position = self._position(index)
+        if isinstance(column, TextColumn):
+            return column.values[column.codes[position]]
+        return column[position]
+
+    def get_attribute(self, index, name):
+        """
+        Return a single value from the store as a record of the row shows it.
+
+        Parameters:
+        -----------
+        index : int
+            The index of the row.
+        name : str
+            The attribute name of the column.
+
+        Returns:
+        --------
+        object
+            The text value, the text form of a stored number, or a numeric value kept as it was given.
+        """
+        return self._attribute(self._position(index), name)
+
+    def _attribute(self, position, name):
+        """
+        Return the value of a column at a position in the arrays, as a record shows it.
+        """
+        column = self._columns[name]
+        if isinstance(column, TextColumn):
+            return column.values[column.codes[position]]
+        raw = self._raw[name]
+        if position in raw:
+            return raw[position]
+        return format_number(column[position])
+
+    def attribute_values(self, name, start=0, stop=None):
+        """
+        Return the values of a range of rows of a column as the records of the rows show them.
+        Numbers are formatted once per distinct number.
+
+        Parameters:
+        -----------
+        name : str
+            The attribute name of the column.
+        start : int
+            The first row.
+        stop : int, optional
+            The row after the last one, defaults to the end of the store.
+
+        Returns:
+        --------
+        list
+            One value per row.
+        """
+        column = self.columns[name]
+        if isinstance(column, TextColumn):
+            return [column.values[code] for code in column.codes[start:stop]]
+        stop = len(column) if stop is None else min(stop, len(column))
+        # NaN never equals itself, so numbers are looked up by their bits instead.
+        bits = array('q')
+        bits.frombytes(column[start:stop].tobytes())
+        formatted = {}
+        values = [formatted[key] if key in formatted else formatted.setdefault(key, format_number(number))
+                  for key, number in zip(bits, column[start:stop])]
+        raw = self._raw[name]
+        if len(raw) < len(values):
+            for position, value in raw.items():
+                if start <= position < stop:
+                    values[position - start] = value
+        else:
+            for position in range(start, stop):
+                if position in raw:
+                    values[position - start] = raw[position]
+        return values
+
+    def column(self, name):
+        """
+        Return the typed array backing a column.
+        Numeric columns return float values; text columns return their integer codes.
+
+        Parameters:
+        -----------
+        name : str
+            The attribute name of the column.
+
+        Returns:
+        --------
+        array.array
+            The array holding one entry per row.
+        """
+        column = self.columns[name]
+        if isinstance(column, TextColumn):
+            return column.codes
+        return column
+
+    def _build_record(self, position):
+        """
+        Build a StoredRecord with the values of the row at a position in the arrays.
+        """
+        return StoredRecord(*[self._attribute(position, name) for name in RECORD_ATTRIBUTES])
@@ -0,0 +1,211 @@
+# connection_pool.py
+
+# Author: Meet Maheta
+
+import threading
+import time
+import weakref
+
+try:
+    from mysql.connector import Error
+    from mysql.connector.errors import PoolError
+except ImportError:
+    # The pool only needs the connector's error classes, so it also works with other drivers and in tests.
+    class Error(Exception):
+        """
+        Stands in for mysql.connector.Error when the connector is not installed.
+        """
+
+    class PoolError(Error):
+        """
+        Stands in for mysql.connector.errors.PoolError when the connector is not installed.
+        """
+
+POOL_SIZE = 8
+# Connections idle for longer than this are pinged before they are handed out again.
+HEALTH_CHECK_SECONDS = 5.0
+
+
+class ConnectionPool:
+    """
+    The ConnectionPool class shares a bounded set of database connections between threads.
+    Each thread checks out its own connection on first use and keeps it until it calls release
+    or exits, so one thread's transaction never mixes with another's.
+    Connections that have been idle are pinged first, and a lost connection is replaced
+    by a new one, retrying with exponential backoff while the server is unreachable.
+    """
+
+    def __init__(self, connect, size=POOL_SIZE, timeout=30.0, retries=3, backoff=0.5,
+                 check_interval=HEALTH_CHECK_SECONDS):
+        """
+        Initialize an empty pool; connections are opened when threads first ask for them.
+
+        Parameters:
+        -----------
+        connect : callable
+            A function that opens a new connection, raising mysql.connector.Error on failure.
+        size : int
+            The most connections that can be checked out at the same time.
+        timeout : float
+            The seconds a thread waits for a free connection before a PoolError is raised.
+        retries : int
+            How many more times opening a connection is tried after it fails.
+        backoff : float
+            The seconds to wait before the first retry; the wait doubles on every retry.
+        check_interval : float
+            The idle seconds after which a connection is pinged before it is used.
+        """
+        self._connect = connect
+        self.size = size
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.check_interval = check_interval
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._idle = []
+        self._local = threading.local()
+
+    def _open(self):
+        """
+        Open a new connection, retrying with exponential backoff.
+        """
+        for attempt in range(self.retries + 1):
+            try:
+                return self._connect()
+            except Error:
+                if attempt == self.retries:
+                    raise
+                time.sleep(self.backoff * 2 ** attempt)
+
+    @staticmethod
+    def _healthy(conn):
+        """
+        Return True if the server still answers on a connection.
+        """
+        try:
+            conn.ping(reconnect=False)
+            return True
+        except Error:
+            return False
+
+    def _take(self):
+        """
+        Return an idle connection, or open a new one when none is left.
+        Each returned connection holds one of the pool's slots.
+        """
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolError(f"No free connection in the pool of {self.size} after {self.timeout} seconds")
+        try:
+            with self._lock:
+                conn, used = self._idle.pop() if self._idle else (None, 0.0)
+            if conn is None:
+                conn, used = self._open(), time.monotonic()
+            return [conn, used]
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def _checkin(self, state):
+        """
+        Give a checked out connection back to the pool, ending any transaction left open on it.
+        """
+        conn = state[0]
+        if conn is not None:
+            try:
+                conn.rollback()
+                with self._lock:
+                    self._idle.append((conn, time.monotonic()))
+            except Error:
+                self._close(conn)
+        self._slots.release()
+
+    @staticmethod
+    def _close(conn):
+        """
+        Close a connection, ignoring one that is already broken.
+        """
+        try:
+            conn.close()
+        except Error:
+            pass
+
+    def connection(self):
+        """
+        Return the connection of the calling thread, checking one out on the thread's first call.
+        A connection idle for longer than check_interval is pinged and replaced if it is lost.
+
+        Returns:
+        --------
+        mysql.connector.connection.MySQLConnection
+            The connection reserved for the calling thread.
+
+        Raises:
+        -------
+        mysql.connector.Error
+            If no connection could be opened, or a PoolError if every connection stayed in use.
+        """
+        checkout = getattr(self._local, 'checkout', None)
+        if checkout is None:
+            state = self._take()
+            checkout = _Checkout(state)
+            # Hand the connection back when the thread ends without calling release.
+            checkout.finalizer = weakref.finalize(checkout, self._checkin, state)
+            self._local.checkout = checkout
+        state = checkout.state
+        now = time.monotonic()
+        if now - state[1] > self.check_interval and not self._healthy(state[0]):
+            self._close(state[0])
+            state[0] = None
+            try:
+                state[0] = self._open()
+            except Error:
+                self.discard()
+                raise
+        state[1] = now
+        return state[0]
+
+    def release(self):
+        """
+        Give the calling thread's connection back to the pool, if it holds one.
+        """
+        checkout = getattr(self._local, 'checkout', None)
+        if checkout is not None:
+            del self._local.checkout
+            checkout.finalizer()
+
+    def discard(self):
+        """
+        Close the calling thread's connection after it failed, so the next call opens a new one.
+        """
+        checkout = getattr(self._local, 'checkout', None)
+        if checkout is not None:
+            del self._local.checkout
+            conn = checkout.state[0]
+            checkout.state[0] = None
+            checkout.finalizer()
+            if conn is not None:
+                self._close(conn)
+
+    def close(self):
+        """
+        Release the calling thread's connection and close every idle connection.
+        """
+        self.release()
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, used in idle:
+            self._close(conn)
+
+
+class _Checkout:
+    """
+    The connection a thread has checked out, kept in thread-local storage.
+    The state list holds the connection and the time it was last used.
+    """
+
+    __slots__ = ('state', 'finalizer', '__weakref__')
+
+    def __init__(self, state):
+        self.state = state
+        self.finalizer = None
@@ -0,0 +1,528 @@
+# filter_expression.py
+
+# Author: Meet Maheta
+
+import datetime
+import functools
+import operator
+import re
+from itertools import repeat
+from aggregation import numeric_column, numpy, to_number
+from columnar_store import ColumnarStore, TextColumn
+from record_base import NUMERIC_ATTRIBUTES, RECORD_ATTRIBUTES
+from record_index import parse_date
+from row_tracker import FLOAT_ATTRIBUTES
+
+# The number of compiled filters kept, keyed by their expression text.
+FILTER_CACHE_SIZE = 512
+
+TOKEN_PATTERN = re.compile(r'''
+    \s*(?:
+        (?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+      | (?P<date>\d{4}-\d{1,2}-\d{1,2}|\d{1,2}/\d{1,2}/\d{2,4})
+      | (?P<number>-?\d+(?:\.\d*)?|-?\.\d+)
+      | (?P<op>==|!=|<=|>=|<|>|=)
+      | (?P<punct>[(),\[\]])
+      | (?P<word>[A-Za-z_][A-Za-z0-9_]*)
+    )''', re.VERBOSE)
+
+OPERATORS = {'==': operator.eq, '=': operator.eq, '!=': operator.ne, '<': operator.lt,
+             '<=': operator.le, '>': operator.gt, '>=': operator.ge}
+KEYWORDS = {'and', 'or', 'not', 'in'}
+
+FIRST_DAY = datetime.date.min.toordinal()
+LAST_DAY = datetime.date.max.toordinal()
+
+# A text literal of a SQL condition, compared as a binary string.
+SQL_TEXT = "CAST(%s AS BINARY)"
+# The SQL test that a row has a date that can be compared.
+SQL_DATE_TEST = "date IS NOT NULL"
+
+
+def tokenize(text):
+    """
+    Split a filter expression into (kind, text) tokens.
+
+    Raises:
+    -------
+    ValueError
+        If the expression contains a character that starts no token.
+    """
+    tokens = []
+    position = 0
+    text = text.rstrip()
+    while position < len(text):
+        match = TOKEN_PATTERN.match(text, position)
+        if match is None or match.end() == position:
+            raise ValueError(f"Invalid filter expression at position {position}: {text[position:position + 20]!r}")
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == 'word' and value.lower() in KEYWORDS:
+            kind, value = 'keyword', value.lower()
+        tokens.append((kind, value))
+        position = match.end()
+    return tokens
+
+
+# Masks hold one flag per record: NumPy boolean arrays when NumPy is installed,
+# otherwise bytearrays of 0 and 1 combined as big integers, so neither needs a Python loop per record.
+
+def _mask_from_flags(flags, count):
+    """
+    Build a mask from an iterable of one truth value per record.
+    """
+    if numpy is not None:
+        return numpy.fromiter(flags, dtype=bool, count=count)
+    return bytearray(flags)
+
+
+def _mask_from_positions(positions, count):
+    """
+    Build a mask that is set at the given record positions.
+    """
+    if numpy is not None:
+        mask = numpy.zeros(count, dtype=bool)
+        mask[numpy.asarray(positions, dtype=numpy.int64)] = True
+        return mask
+    mask = bytearray(count)
+    for position in positions:
+        mask[position] = 1
+    return mask
+
+
+def _and(left, right):
+    if numpy is not None:
+        return left & right
+    return bytearray((int.from_bytes(left, 'little') & int.from_bytes(right, 'little')).to_bytes(len(left), 'little'))
+
+
+def _or(left, right):
+    if numpy is not None:
+        return left | right
+    return bytearray((int.from_bytes(left, 'little') | int.from_bytes(right, 'little')).to_bytes(len(left), 'little'))
+
+
+def _not(mask):
+    if numpy is not None:
+        return ~mask
+    return mask.translate(bytes([1, 0]) + bytes(254))
+
+
+def mask_positions(mask):
+    """
+    Return the positions set in a mask, in ascending order.
+    """
+    if numpy is not None:
+        return numpy.flatnonzero(mask).tolist()
+    positions = []
+    position = mask.find(1)
+    while position >= 0:
+        positions.append(position)
+        position = mask.find(1, position + 1)
+    return positions
+
+
+class Context:
+    """
+    The records a compiled filter runs against, with the indexes it may probe.
+    Columns converted for one evaluation are kept, so a filter that names a column twice converts it once.
+    Nothing is kept between evaluations: records in a list can be changed in place at any time, so every
+    query reads and converts the columns it uses again. Only a ColumnarStore holds typed columns that
+    the kernels use without a conversion pass.
+    """
+
+    def __init__(self, records, index=None, dates=None):
+        self.records = records
+        self.index = index
+        self.dates = dates
+        self.count = len(records)
+        self.numbers = {}
+
+    def numeric(self, name):
+        """
+        Return a numeric column as a NumPy array or an array('d').
+        """
+        if name not in self.numbers:
+            column = numeric_column(self.records, name)
+            self.numbers[name] = numpy.frombuffer(column, dtype=numpy.float64) if numpy is not None else column
+        return self.numbers[name]
+
+
+def _compare_text(name, test):
+    """
+    Compile a test of a text attribute. ColumnarStore columns test each distinct value once and map the codes;
+    a list of records is tested record by record.
+    """
+    def evaluate(context):
+        records = context.records
+        if isinstance(records, ColumnarStore) and isinstance(records.columns[name], TextColumn):
+            column = records.columns[name]
+            table = bytes(bool(test(value)) for value in column.values)
+            if numpy is not None:
+                lookup = numpy.frombuffer(table, dtype=bool)
+                return lookup[numpy.frombuffer(column.codes, dtype=numpy.int32)]
+            return bytearray(map(table.__getitem__, column.codes))
+        return _mask_from_flags(map(test, map(operator.attrgetter(name), records)), context.count)
+    return evaluate
+
+
+def _compare_number(name, compare, value):
+    """
+    Compile a comparison of a numeric attribute with a number. Blank values never match.
+    """
+    def evaluate(context):
+        column = context.numeric(name)
+        if numpy is not None:
+            return compare(column, value) & ~numpy.isnan(column)
+        mask = bytearray(map(compare, column, repeat(value)))
+        if compare is operator.ne:
+            mask = _and(mask, bytearray(map(operator.eq, column, column)))
+        return mask
+    return evaluate
+
+
+def _compare_date(compare, ordinal):
+    """
+    Compile a comparison of the record date with a date. Records without a valid date never match.
+    The sorted date index is probed when there is one.
+    """
+    if compare is operator.ne:
+        before = _compare_date(operator.lt, ordinal)
+        after = _compare_date(operator.gt, ordinal)
+        return lambda context: _or(before(context), after(context))
+    first, last = {operator.eq: (ordinal, ordinal), operator.lt: (FIRST_DAY, ordinal - 1),
+                   operator.le: (FIRST_DAY, ordinal), operator.gt: (ordinal + 1, LAST_DAY),
+                   operator.ge: (ordinal, LAST_DAY)}[compare]
+    cache = {}
+
+    def parsed(text):
+        if text not in cache:
+            cache[text] = parse_date(text)
+        return cache[text]
+
+    scan = _compare_text('date', lambda text: parsed(text) is not None and first <= parsed(text) <= last)
+
+    def evaluate(context):
+        if context.dates is None or first > last:
+            return scan(context)
+        positions = context.dates.positions(datetime.date.fromordinal(first), datetime.date.fromordinal(last))
+        return _mask_from_positions(positions, context.count)
+    return evaluate
+
+
+def _compare(name, symbol, literal):
+    """
+    Compile one comparison of an attribute with a literal value.
+    """
+    compare = OPERATORS[symbol]
+    if name in NUMERIC_ATTRIBUTES:
+        value = to_number(literal)
+        if value != value:
+            raise ValueError(f"{name} must be compared with a number, not {literal!r}")
+        return _compare_number(name, compare, value)
+    if name == 'date':
+        ordinal = parse_date(literal)
+        if ordinal is None:
+            raise ValueError(f"Invalid date in filter expression: {literal!r}")
+        return _compare_date(compare, ordinal)
+    literal = str(literal)
+    scan = _compare_text(name, lambda value: compare(value, literal))
+    if compare is not operator.eq:
+        return scan
+
+    def evaluate(context):
+        if context.index is not None and name in context.index.attributes:
+            return _mask_from_positions(context.index.positions(**{name: literal}), context.count)
+        return scan(context)
+    return evaluate
+
+
+def _member(name, literals):
+    """
+    Compile a test that an attribute equals one of several literal values.
+    """
+    if name in NUMERIC_ATTRIBUTES or name == 'date':
+        tests = [_compare(name, '==', literal) for literal in literals]
+        return lambda context: functools.reduce(_or, (test(context) for test in tests),
+                                                _mask_from_positions((), context.count))
+    literals = {str(literal) for literal in literals}
+    return _compare_text(name, literals.__contains__)
+
+
+class _Parser:
+    """
+    A recursive descent parser that turns tokens into a tree of compiled mask functions.
+
+        expression := term ('or' term)*
+        term       := factor ('and' factor)*
+        factor     := 'not' factor | '(' expression ')' | NAME OP literal | NAME 'in' '(' literal (',' literal)* ')'
+    """
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.position = 0
+
+    def peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else (None, None)
+
+    def take(self, kind=None, value=None):
+        token = self.peek()
+        if token[0] is None or (kind and token[0] != kind) or (value and token[1] != value):
+            expected = value or kind or 'more input'
+            raise ValueError(f"Invalid filter expression: expected {expected}, found {token[1] or 'the end'}")
+        self.position += 1
+        return token
+
+    def parse(self):
+        evaluate = self.expression()
+        if self.position < len(self.tokens):
+            raise ValueError(f"Invalid filter expression: unexpected {self.tokens[self.position][1]}")
+        return evaluate
+
+    def expression(self):
+        evaluate = self.term()
+        while self.peek() == ('keyword', 'or'):
+            self.take()
+            evaluate = self.either(evaluate, self.term())
+        return evaluate
+
+    def term(self):
+        evaluate = self.factor()
+        while self.peek() == ('keyword', 'and'):
+            self.take()
+            evaluate = self.both(evaluate, self.factor())
+        return evaluate
+
+    def factor(self):
+        if self.peek() == ('keyword', 'not'):
+            self.take()
+            return self.negate(self.factor())
+        if self.peek() == ('punct', '('):
+            self.take()
+            evaluate = self.expression()
+            self.take('punct', ')')
+            return evaluate
+        name = self.take('word')[1].lower()
+        if name == 'type':
+            name = 'type_'
+        if name not in RECORD_ATTRIBUTES:
+            raise ValueError(f"Unknown record attribute in filter expression: {name}")
+        if self.peek() == ('keyword', 'in'):
+            self.take()
+            closing = ')' if self.peek() == ('punct', '(') else ']'
+            self.take('punct')
+            literals = [self.literal()]
+            while self.peek() == ('punct', ','):
+                self.take()
+                literals.append(self.literal())
+            self.take('punct', closing)
+            return self.member(name, literals)
+        symbol = self.take('op')[1]
+        return self.compare(name, symbol, self.literal())
+
+    def literal(self):
+        kind, value = self.take()
+        if kind == 'string':
+            return re.sub(r'\\(.)', r'\1', value[1:-1])
+        if kind in ('date', 'number', 'word'):
+            return value
+        raise ValueError(f"Invalid filter expression: expected a value, found {value}")
+
+    # The parts of the tree; _SqlParser builds SQL from the same grammar by overriding them.
+
+    def either(self, left, right):
+        return lambda context: _or(left(context), right(context))
+
+    def both(self, left, right):
+        return lambda context: _and(left(context), right(context))
+
+    def negate(self, inner):
+        return lambda context: _not(inner(context))
+
+    def compare(self, name, symbol, literal):
+        return _compare(name, symbol, literal)
+
+    def member(self, name, literals):
+        return _member(name, literals)
+
+
+def sql_column(name):
+    """
+    Return the traffic_volumes column of a record attribute; 'group' is a reserved word in SQL, so its column is group_.
+    """
+    return 'group_' if name == 'group' else name
+
+
+def sql_number(name):
+    """
+    Return the SQL expression of a numeric attribute, NULL where it is blank.
+    Attributes kept in VARCHAR columns are cast, treating '' and 'N/A' as blank like parse_number.
+    """
+    if name in FLOAT_ATTRIBUTES:
+        return name
+    return f"CAST(NULLIF(NULLIF({name}, ''), 'N/A') AS DECIMAL(30, 10))"
+
+
+class _SqlParser(_Parser):
+    """
+    A parser for the same grammar that builds a parameterized SQL condition on the traffic_volumes table
+    instead of mask functions. Every node is a (sql, params) pair. Comparisons of columns that can be NULL
+    are false rather than NULL there, so 'not' matches the same records as it does in Python.
+    Text is compared as binary strings, case-sensitively and in code point order like Python,
+    rather than by the case-insensitive default collation of the table.
+    The parameter marker, the binary text literal and the date test are those of MySQL by default.
+    """
+
+    def __init__(self, tokens, param='%s', text_param=SQL_TEXT, date_test=SQL_DATE_TEST):
+        super().__init__(tokens)
+        self.param = param
+        self.text_param = text_param
+        self.date_test = date_test
+
+    def either(self, left, right):
+        return f"({left[0]} OR {right[0]})", left[1] + right[1]
+
+    def both(self, left, right):
+        return f"({left[0]} AND {right[0]})", left[1] + right[1]
+
+    def negate(self, inner):
+        return f"(NOT {inner[0]})", inner[1]
+
+    def compare(self, name, symbol, literal):
+        symbol = {'==': '=', '!=': '<>'}.get(symbol, symbol)
+        if name in NUMERIC_ATTRIBUTES:
+            value = to_number(literal)
+            if value != value:
+                raise ValueError(f"{name} must be compared with a number, not {literal!r}")
+            column = sql_number(name)
+            return f"({column} IS NOT NULL AND {column} {symbol} {self.param})", [value]
+        if name == 'date':
+            ordinal = parse_date(literal)
+            if ordinal is None:
+                raise ValueError(f"Invalid date in filter expression: {literal!r}")
+            return f"({self.date_test} AND date {symbol} {self.param})", [datetime.date.fromordinal(ordinal)]
+        column = sql_column(name)
+        literal = str(literal)
+        if symbol == '=':
+            # The plain test can use an index on the column; the binary one drops matches that differ in case.
+            return f"({column} = {self.param} AND {column} = {self.text_param})", [literal, literal]
+        if symbol == '<>':
+            return f"({column} IS NULL OR {column} <> {self.text_param})", [literal]
+        return f"({column} IS NOT NULL AND {column} {symbol} {self.text_param})", [literal]
+
+    def member(self, name, literals):
+        if name in NUMERIC_ATTRIBUTES or name == 'date':
+            tests = [self.compare(name, '==', literal) for literal in literals]
+            return "(" + " OR ".join(sql for sql, params in tests) + ")", [value for sql, params in tests
+                                                                           for value in params]
+        column = sql_column(name)
+        values = list(dict.fromkeys(str(literal) for literal in literals))
+        return (f"({column} IN (" + ", ".join([self.param] * len(values)) + f") AND {column} IN ("
+                + ", ".join([self.text_param] * len(values)) + "))"), values + values
+
+
+class CompiledFilter:
+    """
+    The CompiledFilter class is a filter expression parsed once into mask operations.
+    Comparisons of numeric attributes run over whole typed columns, equality on indexed attributes
+    probes the hash indexes and date comparisons probe the sorted date index.
+    The typed columns exist only in a ColumnarStore; over a list of records every numeric column
+    a filter uses is first converted with to_number, which is a full pass in Python per query.
+    """
+
+    def __init__(self, text, evaluate):
+        """
+        Initialize a CompiledFilter.
+
+        Parameters:
+        -----------
+        text : str
+            The expression the filter was compiled from.
+        evaluate : callable
+            The compiled function that returns the mask of matching records for a Context.
+        """
+        self.text = text
+        self.evaluate = evaluate
+
+    def mask(self, records, index=None, dates=None):
+        """
+        Evaluate the filter over a set of records.
+
+        Parameters:
+        -----------
+        records : list of RecordBase or ColumnarStore
+            The records to filter.
+        index : RecordIndex, optional
+            A hash index over the records, used for equality tests.
+        dates : DateIndex, optional
+            A date index over the records, used for date comparisons.
+
+        Returns:
+        --------
+        numpy.ndarray or bytearray
+            One flag per record, set for the records that match.
+        """
+        return self.evaluate(Context(records, index, dates))
+
+    def positions(self, records, index=None, dates=None):
+        """
+        Return the positions of the matching records in ascending order.
+        Takes the same parameters as mask.
+        """
+        return mask_positions(self.mask(records, index, dates))
+
+
+@functools.lru_cache(maxsize=FILTER_CACHE_SIZE)
+def compile_filter(text):
+    """
+    Compile a filter expression such as 'aadt > 5000 and county == "HFX" and date >= 2020-01-01'.
+    Compiled filters are cached by their text, so repeated expressions are only parsed once.
+
+    Parameters:
+    -----------
+    text : str
+        The expression. Comparisons use ==, !=, <, <=, > and >=, or 'in (a, b, ...)',
+        and combine with and, or, not and parentheses. Dates may be written as YYYY-MM-DD or MM/DD/YYYY.
+
+    Returns:
+    --------
+    CompiledFilter
+        The compiled filter.
+
+    Raises:
+    -------
+    ValueError
+        If the expression is not valid.
+    """
+    return CompiledFilter(text, _Parser(tokenize(text)).parse())
+
+
+@functools.lru_cache(maxsize=FILTER_CACHE_SIZE)
+def compile_sql(text, param='%s', text_param=SQL_TEXT, date_test=SQL_DATE_TEST):
+    """
+    Compile a filter expression, as accepted by compile_filter, to a condition for the WHERE clause
+    of a query on the traffic_volumes table. Literals are passed as parameters, never as SQL text.
+
+    Parameters:
+    -----------
+    text : str
+        The expression.
+    param : str
+        The parameter marker of the database driver.
+    text_param : str
+        The SQL of a text parameter that compares with a column as a binary string.
+    date_test : str
+        The SQL condition that the date column holds a date.
+
+    Returns:
+    --------
+    tuple
+        The SQL condition with param placeholders, and the tuple of parameter values.
+
+    Raises:
+    -------
+    ValueError
+        If the expression is not valid.
+    """
+    sql, params = _SqlParser(tokenize(text), param, text_param, date_test).parse()
+    return sql, tuple(params)
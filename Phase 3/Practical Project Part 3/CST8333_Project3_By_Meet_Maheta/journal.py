@@ -0,0 +1,198 @@
+# journal.py
+
+# Author: Meet Maheta
+
+import hashlib
+import json
+import os
+from change_tracker import fsync_directory
+
+# The entry written before the journal's changes are saved into the CSV file.
+SAVE_ENTRY = ['save']
+HASH_BLOCK_BYTES = 1024 * 1024
+
+
+class Journal:
+    """
+    The Journal class is a write-ahead log of record changes kept next to a CSV file.
+    Each add, edit or delete is appended as one JSON line, so it is durable without rewriting the CSV file.
+    The first line names the size and a hash of the CSV file the entries apply to, and how many rows it held.
+    Rows appended to the file later leave that prefix intact, so the entries still apply and the new rows
+    are folded in after them, which is recorded as a ['tail', rows, size] entry.
+    A save first writes a ['save'] entry; a journal that ends with it while the file has changed was
+    already saved into the file and is never replayed twice.
+    """
+
+    def __init__(self, filename, sync=True):
+        """
+        Initialize a Journal for a CSV file.
+
+        Parameters:
+        -----------
+        filename : str
+            The path to the CSV file.
+        sync : bool
+            If True, every entry is flushed to disk before the change returns.
+        """
+        self.filename = filename
+        self.path = filename + '.journal'
+        self.sync = sync
+        self.size = 0
+        self.header = None
+        self.rows = None
+        self._file = None
+
+    def _digest(self, size=None):
+        """
+        Return the size and SHA-256 hash of the first size bytes of the CSV file, or of the whole file,
+        or None if the file does not exist or is shorter.
+        """
+        digest = hashlib.sha256()
+        try:
+            with open(self.filename, 'rb') as csvfile:
+                if size is None:
+                    size = os.fstat(csvfile.fileno()).st_size
+                remaining = size
+                while remaining > 0:
+                    block = csvfile.read(min(remaining, HASH_BLOCK_BYTES))
+                    if not block:
+                        return None
+                    digest.update(block)
+                    remaining -= len(block)
+        except OSError:
+            return None
+        return [size, digest.hexdigest()]
+
+    def _matches(self, base):
+        """
+        Return True if the CSV file still starts with the bytes a journal was written for.
+        """
+        size = base[0] if isinstance(base, list) and base and isinstance(base[0], int) else None
+        return self._digest(size) == base
+
+    def read(self):
+        """
+        Read the entries that still apply to the CSV file.
+        Entries of a journal written against another version of the file are ignored,
+        as is a last line cut short by a crash. Afterwards rows holds the number of rows
+        of the file the entries apply to, or None if no entries apply.
+
+        Returns:
+        --------
+        list
+            The journal entries in the order they were written.
+        """
+        self.header = None
+        self.rows = None
+        try:
+            with open(self.path, encoding='utf-8') as journal:
+                lines = journal.read().splitlines()
+        except FileNotFoundError:
+            return []
+        if not lines:
+            return []
+        try:
+            header = json.loads(lines[0])
+        except ValueError:
+            return []
+        if not isinstance(header, dict) or not self._matches(header.get('base')):
+            print("Ignoring a journal written for another version of the data file.")
+            return []
+        entries = []
+        for line in lines[1:]:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                break
+        if entries and entries[-1] == SAVE_ENTRY:
+            sizes = [entry[2] for entry in entries if isinstance(entry, list) and entry[:1] == ['tail']]
+            try:
+                saved = os.path.getsize(self.filename) != max([header['base'][0]] + sizes)
+            except OSError:
+                saved = False
+            if saved:
+                return []
+        self.header = header
+        self.rows = header.get('rows')
+        return [entry for entry in entries if entry != SAVE_ENTRY]
+
+    def reset(self, entries=(), rows=0):
+        """
+        Start a journal for the current version of the CSV file, replacing the old one atomically.
+
+        Parameters:
+        -----------
+        entries : list, optional
+            Entries to carry over into the new journal.
+        rows : int
+            The number of rows in the CSV file.
+        """
+        self._write({'base': self._digest(), 'rows': rows}, entries)
+
+    def rewrite(self, entries):
+        """
+        Replace the entries of the journal read last, keeping the version of the CSV file they apply to.
+
+        Parameters:
+        -----------
+        entries : list
+            The entries to keep.
+        """
+        self._write(self.header, entries)
+
+    def _write(self, header, entries):
+        """
+        Write a header and entries to a temporary file, move it over the journal and reopen it for appending.
+        """
+        self.close()
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as journal:
+            journal.write(json.dumps(header) + '\n')
+            for entry in entries:
+                journal.write(json.dumps(entry, separators=(',', ':')) + '\n')
+            journal.flush()
+            os.fsync(journal.fileno())
+        os.replace(temp_path, self.path)
+        fsync_directory(self.path)
+        self.header = header
+        self.rows = header.get('rows')
+        self._file = open(self.path, 'a', encoding='utf-8')
+        self.size = os.path.getsize(self.path)
+
+    def reject(self, entries):
+        """
+        Set entries that could not be applied aside in a file next to the journal, so they are kept for inspection
+        but never replayed again.
+
+        Parameters:
+        -----------
+        entries : list
+            The rejected entries.
+        """
+        with open(self.path + '.rejected', 'a', encoding='utf-8') as rejected:
+            for entry in entries:
+                rejected.write(json.dumps(entry, separators=(',', ':')) + '\n')
+
+    def append(self, entry):
+        """
+        Append one entry to the journal.
+
+        Parameters:
+        -----------
+        entry : list
+            The entry, such as ['add', values], ['edit', index, new_data] or ['delete', index].
+        """
+        line = json.dumps(entry, separators=(',', ':')) + '\n'
+        self._file.write(line)
+        self._file.flush()
+        if self.sync:
+            os.fsync(self._file.fileno())
+        self.size += len(line)
+
+    def close(self):
+        """
+        Close the journal file.
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -37,8 +37,8 @@ def main():
             display_message("Data saved successfully.")
         
         elif choice == 3:
-            num_records = int(input("Enter the number of records to display: "))
-            display_records(manager.records, num_records)  # Display the specified number of records
+            num_records = int(input("Enter the number of records to display per page: "))
+            display_records(manager, num_records)  # Browse the records one page at a time
         
         elif choice == 4:
             display_message("Adding a new record...")
@@ -0,0 +1,241 @@
+# mapped_reader.py
+
+# Author: Meet Maheta
+
+import csv
+import mmap
+from array import array
+from columnar_store import parse_number
+from parallel_loader import file_encoding, next_row_boundary
+from record import TrafficRecord
+from record_base import CSV_FIELDNAMES, RECORD_ATTRIBUTES
+
+ATTRIBUTE_FIELDS = dict(zip(RECORD_ATTRIBUTES, CSV_FIELDNAMES))
+
+
+class RecordView:
+    """
+    A read-only view of one CSV row in a MappedCsv.
+    Field offsets are found on first access and each field is decoded only when it is read.
+    """
+
+    __slots__ = ('_source', '_start', '_end', '_offsets', '_values')
+
+    def __init__(self, source, start, end):
+        """
+        Initialize a RecordView over the bytes of one row.
+
+        Parameters:
+        -----------
+        source : MappedCsv
+            The mapped file the row belongs to.
+        start : int
+            The offset of the first byte of the row.
+        end : int
+            The offset just after the last byte of the row, excluding the line ending.
+        """
+        self._source = source
+        self._start = start
+        self._end = end
+        self._offsets = None
+        self._values = None
+
+    def __getattr__(self, name):
+        """
+        Decode the field behind a record attribute name such as 'aadt' or 'county'.
+        """
+        if name not in ATTRIBUTE_FIELDS:
+            raise AttributeError(name)
+        return self.field(self._source.columns[name])
+
+    def field(self, position):
+        """
+        Decode the field at a column position of the row.
+
+        Parameters:
+        -----------
+        position : int or None
+            The position of the field in the row.
+
+        Returns:
+        --------
+        str or None
+            The decoded text, or None if the row has no such field.
+        """
+        if self._offsets is None:
+            self._split()
+        if self._values is not None:
+            return self._values[position] if position is not None and position < len(self._values) else None
+        if position is None or position + 1 >= len(self._offsets):
+            return None
+        data = self._source.data
+        return data[self._offsets[position]:self._offsets[position + 1] - 1].decode(self._source.encoding)
+
+    def number(self, name):
+        """
+        Decode a numeric attribute as a float, with NaN for blank values.
+
+        Parameters:
+        -----------
+        name : str
+            The attribute name, for example 'aadt'.
+
+        Returns:
+        --------
+        float
+            The value of the field.
+        """
+        return parse_number(getattr(self, name))
+
+    def _split(self):
+        """
+        Record the start offset of every field in the row.
+        Rows with quoted fields are rare and are decoded in full by the csv module instead.
+        """
+        data = self._source.data
+        raw = data[self._start:self._end]
+        if b'"' in raw:
+            self._offsets = ()
+            self._values = next(csv.reader([raw.decode(self._source.encoding)]), [])
+            return
+        offsets = [self._start]
+        position = raw.find(b',')
+        while position >= 0:
+            offsets.append(self._start + position + 1)
+            position = raw.find(b',', position + 1)
+        offsets.append(self._end + 1)
+        self._offsets = offsets
+
+    def to_record(self):
+        """
+        Decode every field and return a TrafficRecord.
+
+        Returns:
+        --------
+        TrafficRecord
+            A record with the text values of the row.
+        """
+        return TrafficRecord(*[getattr(self, name) for name in RECORD_ATTRIBUTES])
+
+    def display(self):
+        """
+        Return a string representation of the traffic record.
+
+        Returns:
+        --------
+        str
+            The same text as TrafficRecord.display for this row.
+        """
+        return self.to_record().display()
+
+
+class MappedCsv:
+    """
+    The MappedCsv class memory-maps a traffic CSV file and finds row offsets only as far as they are needed.
+    Reading the first rows or looking up a near row costs almost nothing even for very large files,
+    and processes that map the same file share the operating system page cache.
+    Row offsets are only known once the rows before them were scanned, so the first lookup of row i
+    reads every row up to i; the offsets are kept, and later lookups of rows up to i cost O(1).
+    """
+
+    def __init__(self, filename, encoding=None):
+        """
+        Map the file and read its header.
+
+        Parameters:
+        -----------
+        filename : str
+            The path to the CSV file.
+        encoding : str, optional
+            The text encoding of the file; by default the one the serial CSV reader uses.
+        """
+        self.filename = filename
+        self.encoding = encoding or file_encoding()
+        self._file = open(filename, 'rb')
+        try:
+            self.data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files cannot be mapped.
+            self.data = b''
+        self._scanned = next_row_boundary(self.data, 0, 0) if self.data else 0
+        header = next(csv.reader([self.data[:self._scanned].decode(self.encoding)]), [])
+        self.columns = {name: header.index(field) if field in header else None
+                        for name, field in ATTRIBUTE_FIELDS.items()}
+        self._starts = array('Q')
+        self._ends = array('Q')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """
+        Unmap and close the file.
+        """
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self._file.close()
+
+    def _scan(self, count=None):
+        """
+        Index rows until at least count rows are known, or until the end of the file.
+        """
+        data = self.data
+        size = len(data)
+        while self._scanned < size and (count is None or len(self._starts) < count):
+            start = self._scanned
+            end = next_row_boundary(data, start, start)
+            self._scanned = end
+            stop = end
+            if data[stop - 1:stop] == b'\n':
+                stop -= 1
+            if data[stop - 1:stop] == b'\r':
+                stop -= 1
+            if stop > start:
+                self._starts.append(start)
+                self._ends.append(stop)
+
+    def __len__(self):
+        """
+        Return the number of rows, indexing the whole file if needed.
+        """
+        self._scan()
+        return len(self._starts)
+
+    def __getitem__(self, index):
+        """
+        Return a RecordView for an index, or a list of them for a slice.
+        Rows past the last one scanned are indexed first, which reads the file up to the requested row;
+        a negative index scans the whole file.
+        """
+        if isinstance(index, slice):
+            if index.stop is not None and index.stop >= 0 and (index.start or 0) >= 0 and (index.step or 1) > 0:
+                self._scan(index.stop)
+                return [self._view(i) for i in range(*index.indices(len(self._starts)))]
+            return [self._view(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        self._scan(index + 1)
+        if not 0 <= index < len(self._starts):
+            raise IndexError("record index out of range")
+        return self._view(index)
+
+    def __iter__(self):
+        """
+        Iterate over the rows as RecordView objects, indexing the file as it goes.
+        """
+        index = 0
+        while True:
+            self._scan(index + 1)
+            if index >= len(self._starts):
+                return
+            yield self._view(index)
+            index += 1
+
+    def _view(self, index):
+        """
+        Build the RecordView of an indexed row.
+        """
+        return RecordView(self, self._starts[index], self._ends[index])
@@ -0,0 +1,215 @@
+# parallel_loader.py
+
+# Author: Meet Maheta
+
+import csv
+import io
+import locale
+import mmap
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from record_base import CSV_FIELDNAMES
+
+# Chunks smaller than this are not worth sending to another process.
+MIN_CHUNK_BYTES = 4 * 1024 * 1024
+# Quote characters are counted through windows of this size to keep memory flat.
+SCAN_WINDOW_BYTES = 1024 * 1024
+# The ranges parsed or waiting to be read per worker; more would hold more parsed rows than needed.
+RANGES_PER_WORKER = 2
+
+
+def count_quotes(data, start, end):
+    """
+    Count the quote characters between two offsets of a memory-mapped file.
+    """
+    quotes = 0
+    while start < end:
+        stop = min(end, start + SCAN_WINDOW_BYTES)
+        quotes += data[start:stop].count(b'"')
+        start = stop
+    return quotes
+
+
+def next_row_boundary(data, start, target):
+    """
+    Find the first row boundary at or after a target offset.
+    A newline ends a row only when it is outside a quoted field, which is the case when the
+    number of quote characters since the last known boundary is even ("" escapes count twice).
+
+    Parameters:
+    -----------
+    data : mmap.mmap
+        The raw file contents.
+    start : int
+        An offset known to be the start of a row.
+    target : int
+        The offset to search from.
+
+    Returns:
+    --------
+    int
+        The offset just after the row-ending newline, or len(data) if there is none.
+    """
+    position = max(start, target)
+    quotes = count_quotes(data, start, position)
+    while True:
+        newline = data.find(b'\n', position)
+        if newline < 0:
+            return len(data)
+        quotes += count_quotes(data, position, newline)
+        position = newline + 1
+        if quotes % 2 == 0:
+            return position
+
+
+def split_ranges(filename, chunks):
+    """
+    Split a CSV file into byte ranges that each start and end on a row boundary.
+
+    Parameters:
+    -----------
+    filename : str
+        The path to the CSV file.
+    chunks : int
+        The number of ranges to aim for.
+
+    Returns:
+    --------
+    tuple
+        The header offset and a list of (start, end) byte ranges covering the data rows in order.
+    """
+    size = os.path.getsize(filename)
+    if size == 0:
+        return 0, []
+    with open(filename, 'rb') as csvfile, mmap.mmap(csvfile.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        header_end = next_row_boundary(data, 0, 0)
+        chunk_bytes = max(MIN_CHUNK_BYTES, (size - header_end) // max(chunks, 1) + 1)
+        ranges = []
+        start = header_end
+        while start < size:
+            end = next_row_boundary(data, start, start + chunk_bytes)
+            ranges.append((start, end))
+            start = end
+    return header_end, ranges
+
+
+def file_encoding():
+    """
+    Return the encoding open() uses for text files by default, which the serial CSV reader uses too.
+    """
+    return locale.getpreferredencoding(False)
+
+
+def read_header(filename, header_end):
+    """
+    Return the column headers of a CSV file.
+    """
+    with open(filename, 'rb') as csvfile:
+        text = csvfile.read(header_end).decode(file_encoding())
+    return next(csv.reader(io.StringIO(text, newline='')), [])
+
+
+def parse_range(filename, start, end, columns, encoding=None):
+    """
+    Parse the CSV rows in one byte range of a file.
+
+    Parameters:
+    -----------
+    filename : str
+        The path to the CSV file.
+    start : int
+        The offset of the first row in the range.
+    end : int
+        The offset just after the last row in the range.
+    columns : list of int or None
+        The position of each CSV_FIELDNAMES column in a row, or None if the column is missing.
+    encoding : str, optional
+        The encoding of the file, defaults to file_encoding().
+
+    Returns:
+    --------
+    list of list
+        The rows of the range with their values in CSV_FIELDNAMES order.
+    """
+    with open(filename, 'rb') as csvfile:
+        csvfile.seek(start)
+        text = csvfile.read(end - start).decode(encoding or file_encoding())
+    rows = []
+    for row in csv.reader(io.StringIO(text, newline='')):
+        if not row:
+            continue
+        rows.append([row[i] if i is not None and i < len(row) else None for i in columns])
+    return rows
+
+
+def column_positions(filename, header_end):
+    """
+    Return the position of each CSV_FIELDNAMES column in the rows of a CSV file, or None if it is missing.
+    """
+    header = read_header(filename, header_end)
+    return [header.index(field) if field in header else None for field in CSV_FIELDNAMES]
+
+
+def parse_ranges(filename, ranges, columns, workers=1):
+    """
+    Parse byte ranges of a CSV file, in a process pool if there is more than one range and worker,
+    and yield their rows in file order.
+    At most RANGES_PER_WORKER ranges per worker are submitted ahead of the one being read,
+    so the parsed rows held in memory stay bounded however large the file is.
+
+    Parameters:
+    -----------
+    filename : str
+        The path to the CSV file.
+    ranges : list of tuple
+        The (start, end) byte ranges to parse, each aligned on row boundaries.
+    columns : list of int or None
+        The position of each CSV_FIELDNAMES column in a row.
+    workers : int
+        The number of worker processes.
+
+    Yields:
+    -------
+    list
+        The values of each row in CSV_FIELDNAMES order.
+    """
+    if len(ranges) <= 1 or workers == 1:
+        for start, end in ranges:
+            yield from parse_range(filename, start, end, columns)
+        return
+    workers = min(workers, len(ranges))
+    # Workers decode with the parent's encoding, so a pool started another way cannot decode differently.
+    encoding = file_encoding()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        ranges = iter(ranges)
+        pending = deque(executor.submit(parse_range, filename, start, end, columns, encoding)
+                        for start, end in islice(ranges, workers * RANGES_PER_WORKER))
+        while pending:
+            rows = pending.popleft().result()
+            following = next(ranges, None)
+            if following is not None:
+                pending.append(executor.submit(parse_range, filename, *following, columns, encoding))
+            yield from rows
+
+
+def iter_parallel_rows(filename, workers=None):
+    """
+    Parse a CSV file in a process pool and yield its rows in file order.
+
+    Parameters:
+    -----------
+    filename : str
+        The path to the CSV file.
+    workers : int, optional
+        The number of worker processes, defaults to the number of CPUs.
+
+    Yields:
+    -------
+    list
+        The values of each row in CSV_FIELDNAMES order.
+    """
+    workers = workers or os.cpu_count() or 1
+    header_end, ranges = split_ranges(filename, workers)
+    yield from parse_ranges(filename, ranges, column_positions(filename, header_end), workers)
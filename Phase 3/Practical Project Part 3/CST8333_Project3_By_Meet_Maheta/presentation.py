@@ -2,6 +2,8 @@
 
 # Author: Meet Maheta
 
+from record_renderer import RecordRenderer
+
 def display_menu():
     """
     Display the main menu to the user.
@@ -34,23 +36,75 @@ def get_user_choice():
     print("Invalid choice, please try again.")
     return None
 
-def display_records(records, num_records): 
+def fetch_page(manager, size, after=None, before=None):
+    """
+    Fetch one page of records from a manager, by its fetch_page method or, for a manager without one,
+    by slicing its records list; a sequence of records such as a MappedCsv is sliced directly.
+
+    Parameters
+    ----------
+    manager : TrafficManager, MappedCsv or list
+        The source of the records.
+    size : int
+        The most records on the page.
+    after : int, optional
+        If given, the page starts with the record after this key.
+    before : int, optional
+        If given, the page ends with the record before this key.
+
+    Returns
+    -------
+    list
+        (key, record) pairs in key order; record indexes are the keys of sliced records.
+    """
+    if hasattr(manager, 'fetch_page'):
+        return manager.fetch_page(size, after=after, before=before)
+    records = getattr(manager, 'records', manager)
+    if before is not None:
+        start = max(before - size, 0)
+        end = max(before, 0)
+    else:
+        start = 0 if after is None else max(after + 1, 0)
+        end = start + size
+    return list(enumerate(records[start:end], start))
+
+def display_records(manager, num_records):
     """
-    Display a specified number of traffic records.
+    Display the records of a manager one page at a time, with next and previous page navigation.
+    Only the page on screen is fetched, so browsing a large table is as fast as browsing a small one.
 
     Parameters
     ----------
-    records : list of TrafficRecord
-        The list of TrafficRecord objects to display.
+    manager : TrafficManager, MappedCsv or list
+        A manager with a fetch_page method, such as the MySQL, SQLite or CSV TrafficManager,
+        or any other source fetch_page can slice.
     num_records : int
-        The number of records to display.
+        The number of records to display per page.
     """
-    for record in records[:num_records]:
-        print(f"SECTION ID: {record.section_id}, HIGHWAY: {record.highway}, SECTION: {record.section}, "
-              f"SECTION LENGTH: {record.section_length}, SECTION DESCRIPTION: {record.section_description}, "
-              f"DATE: {record.date}, DESCRIPTION: {record.description}, GROUP: {record.group}, TYPE: {record.type_}, "
-              f"COUNTY: {record.county}, PTRUCKS: {record.ptrucks}, ADT: {record.adt}, AADT: {record.aadt}, "
-              f"DIRECTION: {record.direction}, 85PCT: {record.pct85}, PRIORITY_POINTS: {record.priority_points}")
+    if num_records < 1:
+        print("The number of records must be at least 1.")
+        return
+    renderer = RecordRenderer()  # Writes each page in one go instead of one print per record
+    page = fetch_page(manager, num_records)
+    if not page:
+        print("No records to display.")
+        return
+    show = True
+    while True:
+        if show:
+            renderer.write([record for key, record in page], ids=[key for key, record in page])
+        command = input("Enter N for the next page, P for the previous page, or anything else to return: ").strip().lower()
+        if command == 'n':
+            following = fetch_page(manager, num_records, after=page[-1][0])
+        elif command == 'p':
+            following = fetch_page(manager, num_records, before=page[0][0])
+        else:
+            return
+        show = bool(following)
+        if following:
+            page = following
+        else:
+            print("There are no more records in that direction.")
 
 def get_record_details():
     """
@@ -0,0 +1,113 @@
+# ranking.py
+
+# Author: Meet Maheta
+
+import heapq
+from aggregation import numeric_column, numpy, to_number
+from filter_expression import compile_filter
+from record_base import NUMERIC_ATTRIBUTES
+
+
+def _check_column(column, k):
+    """
+    Reject ranking by a column that is not numeric, or a negative k.
+    """
+    if column not in NUMERIC_ATTRIBUTES:
+        raise ValueError(f"Records can only be ranked by a numeric attribute, not {column}")
+    if k < 0:
+        raise ValueError("k must not be negative")
+
+
+def rank_positions(records, column, k, candidates=None, largest=True):
+    """
+    Return the positions of the k records with the largest or smallest value of a numeric attribute.
+    Only the k best are ordered: NumPy partitions the column when it is installed, otherwise a heap
+    of k positions is kept, so the cost is O(N log k) instead of a full sort.
+    Blank values are skipped, and equal values keep their record order.
+
+    Parameters:
+    -----------
+    records : list of RecordBase or ColumnarStore
+        The records to rank.
+    column : str
+        The numeric attribute to rank by, e.g. 'aadt'.
+    k : int
+        The number of records to return.
+    candidates : list of int, optional
+        Sorted positions to rank instead of every record, for example the matches of a filter.
+    largest : bool
+        If True, return the largest values first; otherwise the smallest first.
+
+    Returns:
+    --------
+    list of int
+        Up to k positions, best first.
+    """
+    _check_column(column, k)
+    values = numeric_column(records, column)
+    if k == 0:
+        return []
+    if numpy is not None:
+        values = numpy.frombuffer(values, dtype=numpy.float64)
+        positions = numpy.arange(len(values)) if candidates is None else numpy.asarray(candidates, dtype=numpy.int64)
+        positions = positions[~numpy.isnan(values[positions])]
+        keys = -values[positions] if largest else values[positions]
+        if k < len(positions):
+            # Everything strictly better than the k-th key is kept, then the earliest ties fill the rest.
+            threshold = numpy.partition(keys, k - 1)[k - 1]
+            better = keys < threshold
+            ties = numpy.flatnonzero(keys == threshold)[:k - int(better.sum())]
+            chosen = numpy.concatenate((numpy.flatnonzero(better), ties))
+            positions = positions[chosen]
+            keys = keys[chosen]
+        order = numpy.lexsort((positions, keys))
+        return positions[order].tolist()
+    positions = range(len(values)) if candidates is None else candidates
+    positions = (position for position in positions if values[position] == values[position])
+    select = heapq.nlargest if largest else heapq.nsmallest
+    return select(k, positions, key=values.__getitem__)
+
+
+def stream_rank(chunks, column, k, where=None, largest=True):
+    """
+    Find the k records with the largest or smallest value of a numeric attribute in one pass
+    over chunks of records, holding only the current chunk and a heap of k records in memory.
+
+    Parameters:
+    -----------
+    chunks : iterable of list of RecordBase
+        The records in file order, in chunks such as those of TrafficManager.iter_records.
+    column : str
+        The numeric attribute to rank by.
+    k : int
+        The number of records to return.
+    where : str, optional
+        A filter expression the records must match, as accepted by compile_filter.
+    largest : bool
+        If True, return the largest values first; otherwise the smallest first.
+
+    Returns:
+    --------
+    list of RecordBase
+        Up to k records, best first.
+    """
+    _check_column(column, k)
+    matcher = compile_filter(where) if where else None
+    sign = 1 if largest else -1
+    heap = []
+    seen = 0
+    for chunk in chunks:
+        positions = matcher.positions(chunk) if matcher is not None else range(len(chunk))
+        for position in positions:
+            record = chunk[position]
+            value = to_number(getattr(record, column))
+            if value != value:
+                continue
+            # The heap keeps the k best keys; an earlier record wins a tie, as in rank_positions.
+            key = (sign * value, -(seen + position))
+            if len(heap) < k:
+                heapq.heappush(heap, (key, record))
+            elif heap and key > heap[0][0]:
+                heapq.heapreplace(heap, (key, record))
+        seen += len(chunk)
+    return [record for key, record in sorted(heap, key=lambda item: item[0], reverse=True)]
@@ -9,6 +9,8 @@ class TrafficRecord(RecordBase):
     A subclass of RecordBase representing a specific type of traffic record.
     """
 
+    __slots__ = ()
+
     def __init__(self, section_id, highway, section, section_length, section_description, date, description, group, type_, county, ptrucks, adt, aadt, direction, pct85, priority_points):
         """
         Initialize a TrafficRecord object with the provided attributes by calling the superclass initializer.
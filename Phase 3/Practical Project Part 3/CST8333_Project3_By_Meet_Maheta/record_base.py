@@ -2,6 +2,17 @@
 
 # Author: Meet Maheta
 
+# CSV column headers and the matching record attribute names, in file order.
+CSV_FIELDNAMES = ['SECTION ID', 'HIGHWAY', 'SECTION', 'SECTION LENGTH', 'SECTION DESCRIPTION',
+                  'Date', 'DESCRIPTION', 'GROUP', 'TYPE', 'COUNTY', 'PTRUCKS', 'ADT', 'AADT',
+                  'DIRECTION', '85PCT', 'PRIORITY_POINTS']
+RECORD_ATTRIBUTES = ['section_id', 'highway', 'section', 'section_length', 'section_description',
+                     'date', 'description', 'group', 'type_', 'county', 'ptrucks', 'adt', 'aadt',
+                     'direction', 'pct85', 'priority_points']
+
+# Attributes that hold numeric measurements; every other attribute is text.
+NUMERIC_ATTRIBUTES = ['section_length', 'ptrucks', 'adt', 'aadt', 'pct85', 'priority_points']
+
 class RecordBase:
     """
     A base class representing a traffic record.
@@ -41,6 +52,9 @@ class RecordBase:
     priority_points : str
         The priority points of the section.
     """
+
+    # Fixed attribute slots instead of a per-instance __dict__ keep each record compact.
+    __slots__ = tuple(RECORD_ATTRIBUTES)
     
     def __init__(self, section_id, highway, section, section_length, section_description, date, description, group, type_, county, ptrucks, adt, aadt, direction, pct85, priority_points):
         """
@@ -0,0 +1,102 @@
+# record_cache.py
+
+# Author: Meet Maheta
+
+import threading
+from collections import OrderedDict
+
+CACHE_SIZE = 1024
+
+
+class RecordCache:
+    """
+    The RecordCache class is a bounded least-recently-used cache of table rows by id,
+    counting the lookups it could and could not answer.
+    Rows fetched while an invalidation happened are not stored, so a read that races
+    with an edit can never put the old row back into the cache.
+    """
+
+    def __init__(self, size=CACHE_SIZE):
+        """
+        Initialize an empty cache.
+
+        Parameters:
+        -----------
+        size : int
+            The most rows kept; 0 disables the cache.
+        """
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._rows = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = 0
+
+    def lookup(self, ids):
+        """
+        Look up rows by id, marking the found ones as recently used.
+
+        Parameters:
+        -----------
+        ids : list of int
+            The ids to look up.
+
+        Returns:
+        --------
+        tuple
+            The cached rows by id, the ids that were not cached, and a version to pass to store.
+        """
+        found = {}
+        missing = []
+        with self._lock:
+            for row_id in ids:
+                row = self._rows.get(row_id)
+                if row is None:
+                    missing.append(row_id)
+                    self.misses += 1
+                else:
+                    self._rows.move_to_end(row_id)
+                    found[row_id] = row
+                    self.hits += 1
+            return found, missing, self._version
+
+    def store(self, rows, version):
+        """
+        Add fetched rows, evicting the least recently used ones beyond the size.
+        Nothing is stored if the cache was invalidated since the lookup that returned the version.
+
+        Parameters:
+        -----------
+        rows : dict
+            The fetched rows by id.
+        version : int
+            The version returned by lookup before the rows were fetched.
+        """
+        with self._lock:
+            if version != self._version or not self.size:
+                return
+            for row_id, row in rows.items():
+                self._rows[row_id] = row
+                self._rows.move_to_end(row_id)
+            while len(self._rows) > self.size:
+                self._rows.popitem(last=False)
+
+    def invalidate(self, ids):
+        """
+        Drop the rows of some ids after they were changed or deleted.
+        """
+        with self._lock:
+            self._version += 1
+            for row_id in ids:
+                self._rows.pop(row_id, None)
+
+    def clear(self):
+        """
+        Drop every row.
+        """
+        with self._lock:
+            self._version += 1
+            self._rows.clear()
+
+    def __len__(self):
+        return len(self._rows)
@@ -0,0 +1,391 @@
+# record_index.py
+
+# Author: Meet Maheta
+
+import datetime
+import heapq
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from columnar_store import ColumnarStore
+
+# The attributes that get a hash index by default.
+INDEXED_ATTRIBUTES = ['section_id', 'highway', 'county', 'direction']
+
+# Date index keys pack the date ordinal above the record position, so one sorted array orders by both.
+POSITION_BITS = 36
+POSITION_MASK = (1 << POSITION_BITS) - 1
+NO_DATE = -1
+# Up to this many pending date keys are inserted one by one; larger batches are merged in one pass.
+INSERT_KEYS = 64
+
+
+def parse_date(value):
+    """
+    Convert a date to its proleptic Gregorian ordinal.
+    Accepts date objects and the MM/DD/YYYY, MM/DD/YY and YYYY-MM-DD text used in the data.
+
+    Parameters:
+    -----------
+    value : str or datetime.date
+        The date to convert.
+
+    Returns:
+    --------
+    int or None
+        The ordinal of the date, or None if it cannot be parsed.
+    """
+    if isinstance(value, datetime.date):
+        return value.toordinal()
+    if not isinstance(value, str):
+        return None
+    for pattern in ('%m/%d/%Y', '%m/%d/%y', '%Y-%m-%d'):
+        try:
+            return datetime.datetime.strptime(value.strip(), pattern).toordinal()
+        except ValueError:
+            continue
+    return None
+
+
+def _contains(positions, position):
+    """
+    Return True if a sorted array of positions contains a position.
+    """
+    at = bisect_left(positions, position)
+    return at < len(positions) and positions[at] == position
+
+
+class RecordIndex:
+    """
+    The RecordIndex class keeps secondary hash indexes from attribute values to record positions.
+    Each value maps to a sorted array of positions, so a lookup costs O(result) instead of a full scan.
+    The index is built on the first lookup and then updated in place: additions and edits move single positions,
+    and a deletion removes its position and moves the later positions of every value down by one.
+    """
+
+    def __init__(self, attributes=None):
+        """
+        Initialize an empty index.
+
+        Parameters:
+        -----------
+        attributes : list of str, optional
+            The record attributes to index, defaults to INDEXED_ATTRIBUTES.
+        """
+        self.attributes = list(attributes or INDEXED_ATTRIBUTES)
+        self.maps = {name: {} for name in self.attributes}
+        self.records = []
+        self.stale = True
+
+    def reset(self, records):
+        """
+        Switch to a new set of records; they are indexed on the next lookup.
+
+        Parameters:
+        -----------
+        records : list of RecordBase or ColumnarStore
+            The records to index.
+        """
+        self.records = records
+        self.stale = True
+
+    def build(self):
+        """
+        Index every record of the current list or ColumnarStore.
+        """
+        records = self.records
+        self.stale = False
+        for name in self.attributes:
+            groups = {}
+            if isinstance(records, ColumnarStore):
+                column = records.columns[name]
+                for position, code in enumerate(column.codes):
+                    groups.setdefault(code, array('q')).append(position)
+                self.maps[name] = {column.values[code]: positions for code, positions in groups.items()}
+            else:
+                for position, record in enumerate(records):
+                    groups.setdefault(getattr(record, name), array('q')).append(position)
+                self.maps[name] = groups
+
+    def _value(self, position, name):
+        """
+        Return the value of an attribute for the record at a position, as the record itself would show it.
+        """
+        if isinstance(self.records, ColumnarStore):
+            return self.records.get_attribute(position, name)
+        return getattr(self.records[position], name)
+
+    def added(self, position):
+        """
+        Index the record that was appended at a position.
+        """
+        if self.stale:
+            return
+        for name in self.attributes:
+            self.maps[name].setdefault(self._value(position, name), array('q')).append(position)
+
+    def before_edit(self, position):
+        """
+        Remove the record at a position from the index before its values change.
+        """
+        if self.stale:
+            return
+        for name in self.attributes:
+            value = self._value(position, name)
+            positions = self.maps[name].get(value)
+            if positions is None:
+                continue
+            if _contains(positions, position):
+                del positions[bisect_left(positions, position)]
+            if not positions:
+                del self.maps[name][value]
+
+    def after_edit(self, position):
+        """
+        Index the record at a position again after its values changed.
+        """
+        if self.stale:
+            return
+        for name in self.attributes:
+            positions = self.maps[name].setdefault(self._value(position, name), array('q'))
+            insort(positions, position)
+
+    def deleted(self, position):
+        """
+        Remove the record that was deleted at a position and move the records after it down by one.
+        The record is already gone, so every value's positions are searched for it; each array is
+        sorted, so only its tail after the deleted position is rewritten.
+        """
+        if self.stale:
+            return
+        for name in self.attributes:
+            groups = self.maps[name]
+            emptied = []
+            for value, positions in groups.items():
+                at = bisect_left(positions, position)
+                if at == len(positions):
+                    continue
+                if positions[at] == position:
+                    del positions[at]
+                    if not positions:
+                        emptied.append(value)
+                        continue
+                positions[at:] = array('q', [later - 1 for later in positions[at:]])
+            for value in emptied:
+                del groups[value]
+
+    def positions(self, **criteria):
+        """
+        Return the positions of the records whose attributes equal all the given values.
+        Indexed attributes are looked up; other attributes filter the indexed candidates.
+
+        Parameters:
+        -----------
+        **criteria : dict
+            Attribute names mapped to the values to match, e.g. county='HFX'.
+
+        Returns:
+        --------
+        list of int
+            The matching positions in ascending order.
+        """
+        if self.stale:
+            self.build()
+        indexed = [(name, value) for name, value in criteria.items() if name in self.maps]
+        others = [(name, value) for name, value in criteria.items() if name not in self.maps]
+        if indexed:
+            candidates = sorted((self.maps[name].get(value, ()) for name, value in indexed), key=len)
+            result = candidates[0]
+            # Probe the larger position arrays by binary search, so the cost follows the smallest match.
+            for positions in candidates[1:]:
+                if not result:
+                    break
+                result = [position for position in result if _contains(positions, position)]
+            result = list(result)
+        else:
+            result = range(len(self.records))
+        if others:
+            result = [position for position in result
+                      if all(self._value(position, name) == value for name, value in others)]
+        return list(result)
+
+
+class DateIndex:
+    """
+    The DateIndex class keeps the date of every record as an ordinal integer, plus one sorted array
+    of (ordinal, position) keys, so a date range query costs O(log N + k).
+    It is built on the first query and then kept up to date without parsing any date again:
+    keys of added or edited records wait in a batch that is merged into the array on the next query,
+    and deleted positions are collected and removed, with the later positions moved down, in one pass
+    when the index is next queried or changed in another way.
+    """
+
+    def __init__(self):
+        """
+        Initialize an empty date index.
+        """
+        self.records = []
+        self.ordinals = array('l')
+        self.keys = array('q')
+        self.pending = array('q')  # Keys added since the last query, not sorted into keys yet
+        self.removed = []  # Sorted positions, as stored in keys, of the records deleted since then
+        self.stale = True
+
+    def reset(self, records):
+        """
+        Switch to a new set of records; they are indexed on the next query.
+        """
+        self.records = records
+        self.stale = True
+
+    def _ordinal(self, position, cache=None):
+        """
+        Return the date ordinal of the record at a position, or NO_DATE.
+        """
+        if isinstance(self.records, ColumnarStore):
+            text = self.records.get_value(position, 'date')
+        else:
+            text = self.records[position].date
+        # Dates repeat across many rows, so each distinct text is parsed once per build.
+        if cache is not None and text in cache:
+            return cache[text]
+        ordinal = parse_date(text)
+        ordinal = NO_DATE if ordinal is None else ordinal
+        if cache is not None:
+            cache[text] = ordinal
+        return ordinal
+
+    def build(self):
+        """
+        Convert every record date to an ordinal and sort the keys.
+        """
+        cache = {}
+        self.ordinals = array('l', (self._ordinal(position, cache) for position in range(len(self.records))))
+        self.keys = array('q', sorted((ordinal << POSITION_BITS) | position
+                                      for position, ordinal in enumerate(self.ordinals) if ordinal != NO_DATE))
+        self.pending = array('q')
+        self.removed = []
+        self.stale = False
+
+    def _merge(self):
+        """
+        Move the pending keys into the sorted key array: a few are inserted by binary search,
+        and a larger batch is sorted on its own and merged with the keys in one linear pass.
+        """
+        if not self.pending:
+            return
+        pending = sorted(self.pending)
+        self.pending = array('q')
+        if len(pending) <= INSERT_KEYS:
+            for key in pending:
+                insort(self.keys, key)
+        else:
+            self.keys = array('q', heapq.merge(self.keys, pending))
+
+    def _remove(self):
+        """
+        Drop the keys of the deleted records and move the positions after each of them down, in one pass.
+        Moving positions down keeps the keys in order, so nothing has to be sorted again.
+        """
+        removed = self.removed
+        if not removed:
+            return
+        gone = set(removed)
+        self.keys = array('q', (key - bisect_right(removed, key & POSITION_MASK) for key in self.keys
+                                if key & POSITION_MASK not in gone))
+        self.removed = []
+
+    def _apply(self):
+        """
+        Bring the key array up to date with every pending change.
+        """
+        self._remove()
+        self._merge()
+
+    def added(self, position):
+        """
+        Index the record that was appended at a position.
+        """
+        if self.stale:
+            return
+        self._remove()
+        ordinal = self._ordinal(position)
+        self.ordinals.append(ordinal)
+        if ordinal != NO_DATE:
+            self.pending.append((ordinal << POSITION_BITS) | position)
+
+    def before_edit(self, position):
+        """
+        Remove the record at a position from the index before its values change.
+        """
+        if self.stale:
+            return
+        self._apply()
+        ordinal = self.ordinals[position]
+        if ordinal != NO_DATE:
+            key = (ordinal << POSITION_BITS) | position
+            if _contains(self.keys, key):
+                del self.keys[bisect_left(self.keys, key)]
+
+    def after_edit(self, position):
+        """
+        Index the record at a position again after its values changed.
+        """
+        if self.stale:
+            return
+        self._remove()
+        ordinal = self._ordinal(position)
+        self.ordinals[position] = ordinal
+        if ordinal != NO_DATE:
+            self.pending.append((ordinal << POSITION_BITS) | position)
+
+    def deleted(self, position):
+        """
+        Record that the record at a position was deleted; its key is removed with the others on the next query.
+        """
+        if self.stale:
+            return
+        self._merge()
+        self.ordinals.pop(position)
+        # Map the position to the one stored in the keys, which still count the earlier deleted records.
+        removed = self.removed
+        skipped = bisect_right(removed, position)
+        while True:
+            following = bisect_right(removed, position + skipped)
+            if following == skipped:
+                break
+            skipped = following
+        insort(removed, position + skipped)
+
+    def positions(self, start, end, candidates=None):
+        """
+        Return the positions of the records dated between start and end, both included.
+
+        Parameters:
+        -----------
+        start : str or datetime.date
+            The first date of the range.
+        end : str or datetime.date
+            The last date of the range.
+        candidates : list of int, optional
+            Sorted positions to restrict the result to, for example those of one highway.
+
+        Returns:
+        --------
+        list of int
+            The matching positions, in date order, or in position order when candidates are given.
+        """
+        if self.stale:
+            self.build()
+        self._apply()
+        first = parse_date(start)
+        last = parse_date(end)
+        if first is None or last is None:
+            raise ValueError(f"Invalid date range: {start} to {end}")
+        low = bisect_left(self.keys, first << POSITION_BITS)
+        high = bisect_left(self.keys, (last + 1) << POSITION_BITS)
+        if candidates is not None and len(candidates) < high - low:
+            return [position for position in candidates if first <= self.ordinals[position] <= last]
+        positions = [key & POSITION_MASK for key in self.keys[low:high]]
+        if candidates is not None:
+            positions = [position for position in sorted(positions) if _contains(candidates, position)]
+        return positions
@@ -0,0 +1,234 @@
+# record_renderer.py
+
+# Author: Meet Maheta
+
+import json
+import operator
+import sys
+from itertools import repeat
+from columnar_store import ColumnarStore, TextColumn
+from record_base import CSV_FIELDNAMES, RECORD_ATTRIBUTES
+
+RENDER_FORMATS = ['text', 'fixed', 'csv', 'jsonl']
+# The number of records formatted and written at a time.
+RENDER_BATCH_SIZE = 8192
+# The most distinct values remembered per column before a column's memo is cleared.
+MEMO_SIZE = 65536
+
+# The labels of the text format, the same as those of display.
+DISPLAY_LABELS = ['SECTION ID', 'HIGHWAY', 'SECTION', 'SECTION LENGTH', 'SECTION DESCRIPTION', 'DATE',
+                  'DESCRIPTION', 'GROUP', 'TYPE', 'COUNTY', 'PTRUCKS', 'ADT', 'AADT', 'DIRECTION', '85PCT',
+                  'PRIORITY_POINTS']
+# The column widths of the fixed-width format, at least as wide as the column names; longer values are cut to fit.
+FIXED_WIDTHS = {'id': 10, 'section_id': 10, 'highway': 7, 'section': 7, 'section_length': 14,
+                'section_description': 40, 'date': 10, 'description': 30, 'group': 5, 'type_': 4,
+                'county': 6, 'ptrucks': 7, 'adt': 8, 'aadt': 8, 'direction': 9, 'pct85': 5,
+                'priority_points': 15}
+
+
+def _csv_field(value):
+    """
+    Format a value as a CSV field, quoted only when it contains a delimiter, quote or line break.
+    """
+    text = '' if value is None else str(value)
+    if ',' in text or '"' in text or '\n' in text or '\r' in text:
+        return '"' + text.replace('"', '""') + '"'
+    return text
+
+
+def _json_value(value):
+    """
+    Format a value as JSON; dates become ISO text and NaN becomes null.
+    """
+    if value is None or value != value:
+        return 'null'
+    return json.dumps(value, ensure_ascii=False, default=str)
+
+
+class _Memo(dict):
+    """
+    The output text of the values of one column, computed once per distinct value.
+    Only text and None are remembered, since equal numbers of different types, such as 1 and 1.0,
+    can be written differently.
+    """
+
+    def __init__(self, encode):
+        super().__init__()
+        self.encode = encode
+
+    def __missing__(self, value):
+        text = self.encode(value)
+        if value is None or type(value) is str:
+            if len(self) >= MEMO_SIZE:
+                self.clear()
+            self[value] = text
+        return text
+
+
+class RecordRenderer:
+    """
+    The RecordRenderer class writes records to a stream in bulk, as the display text, fixed-width
+    columns, CSV or JSON Lines. Records are formatted a batch at a time, column by column:
+    each distinct value is encoded once, the lines are joined from precomputed separators,
+    and every batch is sent to the stream in a single write.
+    """
+
+    def __init__(self, fmt='text', widths=None, batch_size=RENDER_BATCH_SIZE):
+        """
+        Initialize a RecordRenderer.
+
+        Parameters:
+        -----------
+        fmt : str
+            One of RENDER_FORMATS: 'text' for the lines of display, 'fixed' for padded columns,
+            'csv' for the columns of the CSV file, or 'jsonl' for one JSON object per line.
+        widths : dict, optional
+            Column widths of the fixed-width format by attribute name, overriding FIXED_WIDTHS.
+        batch_size : int
+            The number of records formatted and written at a time.
+
+        Raises:
+        -------
+        ValueError
+            If the format is unknown.
+        """
+        if fmt not in RENDER_FORMATS:
+            raise ValueError(f"Unknown output format: {fmt}")
+        self.fmt = fmt
+        self.widths = dict(FIXED_WIDTHS, **(widths or {}))
+        self.batch_size = batch_size
+        self._memos = {}
+        self._tables = {}
+
+    def _encoder(self, name):
+        """
+        Return the function that turns one value of a column into its output text.
+        """
+        if self.fmt == 'text':
+            return str
+        if self.fmt == 'fixed':
+            width = self.widths[name]
+            return lambda value: ('' if value is None else str(value))[:width].ljust(width)
+        if self.fmt == 'csv':
+            return _csv_field
+        return _json_value
+
+    def _memo(self, name):
+        """
+        Return the memo of a column, creating it on first use.
+        """
+        if name not in self._memos:
+            self._memos[name] = _Memo(self._encoder(name))
+        return self._memos[name]
+
+    def _layout(self, names):
+        """
+        Return the text written before each column and after the last one.
+        """
+        if self.fmt == 'text':
+            labels = ['ID' if name == 'id' else DISPLAY_LABELS[RECORD_ATTRIBUTES.index(name)] for name in names]
+            return [f"{label}: " if i == 0 else f", {label}: " for i, label in enumerate(labels)] + ['\n']
+        if self.fmt == 'jsonl':
+            keys = [json.dumps(name) for name in names]
+            return [('{' if i == 0 else ', ') + f"{key}: " for i, key in enumerate(keys)] + ['}\n']
+        separator = ' ' if self.fmt == 'fixed' else ','
+        return [''] + [separator] * (len(names) - 1) + ['\r\n' if self.fmt == 'csv' else '\n']
+
+    def header(self, ids=False):
+        """
+        Return the header line of the format: the column names of the fixed-width and CSV formats,
+        or an empty string for the formats without one.
+
+        Parameters:
+        -----------
+        ids : bool
+            True if the lines start with an id column.
+        """
+        names = (['id'] if ids else []) + RECORD_ATTRIBUTES
+        titles = ['ID' if name == 'id' else CSV_FIELDNAMES[RECORD_ATTRIBUTES.index(name)] for name in names]
+        if self.fmt == 'fixed':
+            return " ".join(title[:self.widths[name]].ljust(self.widths[name]) for name, title in zip(names, titles)) + '\n'
+        if self.fmt == 'csv':
+            return ",".join(titles) + '\r\n'
+        return ''
+
+    def _columns(self, records, start, stop):
+        """
+        Return the output text of every attribute for a batch of records, one list per attribute.
+        """
+        if isinstance(records, ColumnarStore):
+            columns = []
+            for name in RECORD_ATTRIBUTES:
+                column = records.columns[name]
+                if isinstance(column, TextColumn):
+                    # Encode each distinct value of the store once, then map the codes of the batch.
+                    table = self._tables.setdefault(name, [])
+                    memo = self._memo(name)
+                    table.extend(memo[value] for value in column.values[len(table):])
+                    columns.append(list(map(table.__getitem__, column.codes[start:stop])))
+                else:
+                    # Stored numbers are shown in their CSV text form, as records built from the store show them.
+                    columns.append(list(map(self._memo(name).__getitem__, records.attribute_values(name, start, stop))))
+            return columns
+        batch = records[start:stop]
+        return [list(map(self._memo(name).__getitem__, map(operator.attrgetter(name), batch)))
+                for name in RECORD_ATTRIBUTES]
+
+    def chunks(self, records, ids=None):
+        """
+        Format records a batch at a time.
+
+        Parameters:
+        -----------
+        records : list of RecordBase or ColumnarStore
+            The records to format.
+        ids : list, optional
+            A key to write in a leading id column for each record, such as its row id.
+
+        Yields:
+        -------
+        str
+            The lines of up to batch_size records.
+        """
+        names = (['id'] if ids is not None else []) + RECORD_ATTRIBUTES
+        layout = self._layout(names)
+        self._tables = {}  # Tables of store values are only valid for one set of records
+        for start in range(0, len(records), self.batch_size):
+            stop = min(start + self.batch_size, len(records))
+            columns = self._columns(records, start, stop)
+            if ids is not None:
+                columns.insert(0, list(map(self._memo('id').__getitem__, ids[start:stop])))
+            parts = []
+            for text, column in zip(layout, columns):
+                parts.append(repeat(text))
+                parts.append(column)
+            parts.append(repeat(layout[-1]))
+            yield "".join(map("".join, zip(*parts)))
+
+    def write(self, records, stream=None, ids=None, header=True):
+        """
+        Write records to a stream in large chunks.
+
+        Parameters:
+        -----------
+        records : list of RecordBase or ColumnarStore
+            The records to write.
+        stream : file object, optional
+            A text stream, defaults to sys.stdout.
+        ids : list, optional
+            A key to write in a leading id column for each record.
+        header : bool
+            If True, write the header line of the format first.
+
+        Returns:
+        --------
+        int
+            The number of records written.
+        """
+        stream = sys.stdout if stream is None else stream
+        if header and self.header(ids is not None):
+            stream.write(self.header(ids is not None))
+        for chunk in self.chunks(records, ids):
+            stream.write(chunk)
+        stream.flush()
+        return len(records)
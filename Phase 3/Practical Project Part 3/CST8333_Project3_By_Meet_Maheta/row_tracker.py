@@ -0,0 +1,182 @@
+# row_tracker.py
+
+# Author: Meet Maheta
+
+import datetime
+import operator
+from record_base import RECORD_ATTRIBUTES
+from record_index import parse_date
+
+# The table columns in record attribute order; 'group' is a reserved word in SQL, so its column is group_.
+TABLE_COLUMNS = ['group_' if name == 'group' else name for name in RECORD_ATTRIBUTES]
+# Attributes stored in FLOAT columns, where a blank value has to be sent as NULL.
+FLOAT_ATTRIBUTES = ['section_length', 'adt', 'aadt']
+# Reads the attribute values of a record in RECORD_ATTRIBUTES order.
+_attribute_values = operator.attrgetter(*RECORD_ATTRIBUTES)
+
+
+def column_value(name, value):
+    """
+    Convert the value of one record attribute to the value stored in its table column.
+    Dates in any format of the CSV file become DATE values, and blank values of FLOAT columns become NULL.
+
+    Parameters:
+    -----------
+    name : str
+        The record attribute name.
+    value : object
+        The attribute value.
+
+    Returns:
+    --------
+    object
+        The column value.
+    """
+    if name == 'date':
+        ordinal = parse_date(value)
+        return None if ordinal is None else datetime.date.fromordinal(ordinal)
+    if name in FLOAT_ATTRIBUTES and value in (None, '', 'N/A'):
+        return None
+    return value
+
+
+def row_values(record):
+    """
+    Return the column values of a record for an INSERT, in TABLE_COLUMNS order.
+
+    Parameters:
+    -----------
+    record : RecordBase
+        The record to convert.
+
+    Returns:
+    --------
+    tuple
+        The 16 column values.
+    """
+    return tuple(column_value(name, getattr(record, name)) for name in RECORD_ATTRIBUTES)
+
+
+def row_hash(record):
+    """
+    Return a hash of the attribute values of a record, which tells whether the record changed since
+    its row was written without keeping a copy of the values.
+
+    Parameters:
+    -----------
+    record : RecordBase
+        The record to hash.
+
+    Returns:
+    --------
+    int
+        The hash of the 16 attribute values.
+    """
+    return hash(_attribute_values(record))
+
+
+class RowTracker:
+    """
+    The RowTracker class remembers which table row every in-memory record was loaded from or saved to,
+    together with the values the row held, so a save only has to send what changed.
+    Records are tracked by identity, so the records list can be reordered, filtered or extended freely.
+    The saved values are kept as one tuple of references per record; the records share those value
+    objects, so the tuple costs a few pointers and any record changed in place is found by comparing it.
+    """
+
+    def __init__(self):
+        """
+        Initialize a RowTracker that tracks no rows.
+        """
+        self.reset()
+
+    def reset(self, records=(), ids=()):
+        """
+        Track a new set of records that mirror the table exactly.
+
+        Parameters:
+        -----------
+        records : list of RecordBase
+            The records as they were loaded.
+        ids : list of int
+            The id of the row of each record.
+        """
+        self.rows = {}
+        self.by_id = {}
+        for record, row_id in zip(records, ids):
+            self.remember(record, row_id)
+
+    def remember(self, record, row_id, names=None):
+        """
+        Record that a row now holds the current values of a record.
+
+        Parameters:
+        -----------
+        record : RecordBase
+            The record.
+        row_id : int
+            The id of its row.
+        names : list of str, optional
+            If given, only these attributes were written to the row of a tracked record;
+            changes of its other attributes are still to be saved.
+        """
+        entry = self.rows.get(record)
+        if names is not None and entry is not None and entry[0] == row_id:
+            saved = list(entry[1])
+            for name in names:
+                position = RECORD_ATTRIBUTES.index(name)
+                saved[position] = getattr(record, name)
+            self.rows[record] = (row_id, tuple(saved))
+        else:
+            self.rows[record] = (row_id, _attribute_values(record))
+        self.by_id[row_id] = record
+
+    def forget(self, row_id):
+        """
+        Stop tracking a row that was deleted.
+        """
+        record = self.by_id.pop(row_id, None)
+        if record is not None:
+            self.rows.pop(record, None)
+
+    def record(self, row_id):
+        """
+        Return the tracked record of a row, or None.
+        """
+        return self.by_id.get(row_id)
+
+    def changes(self, records):
+        """
+        Compare the records with the rows they came from.
+        New and removed records are found by identity; every tracked record is compared with the values
+        its row holds, so records changed in place are found without being marked.
+
+        Parameters:
+        -----------
+        records : list of RecordBase
+            The current records.
+
+        Returns:
+        --------
+        tuple
+            The records to insert; (record, id, names) for every record whose values changed, with the names
+            of the changed attributes; and the ids of the rows whose records are gone.
+        """
+        rows = self.rows
+        inserts = []
+        updates = []
+        seen = set()
+        for record in records:
+            entry = rows.get(record)
+            if entry is None or entry[0] in seen:
+                inserts.append(record)
+                continue
+            row_id, saved = entry
+            seen.add(row_id)
+            values = _attribute_values(record)
+            if values != saved:
+                names = [name for name, old, new in zip(RECORD_ATTRIBUTES, saved, values)
+                         if old is not new and old != new]
+                updates.append((record, row_id, names))
+        deletes = [row_id for row_id in self.by_id if row_id not in seen] if len(seen) < len(self.by_id) else []
+        return inserts, updates, deletes
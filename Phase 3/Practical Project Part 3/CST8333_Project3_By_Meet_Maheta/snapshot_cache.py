@@ -0,0 +1,143 @@
+# snapshot_cache.py
+
+# Author: Meet Maheta
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+from columnar_store import ColumnarStore, TextColumn
+
+MAGIC = b'TRAFFIC-SNAPSHOT-2\n'
+HASH_BLOCK_BYTES = 1024 * 1024
+
+
+def snapshot_path(filename):
+    """
+    Return the path of the binary snapshot kept next to a CSV file.
+    """
+    return filename + '.snapshot'
+
+
+def source_key(filename):
+    """
+    Describe the current state of a CSV file.
+
+    Parameters:
+    -----------
+    filename : str
+        The path to the CSV file.
+
+    Returns:
+    --------
+    dict
+        The size, modification time and SHA-256 content hash of the file.
+    """
+    stat = os.stat(filename)
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as csvfile:
+        for block in iter(lambda: csvfile.read(HASH_BLOCK_BYTES), b''):
+            digest.update(block)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': digest.hexdigest()}
+
+
+def write_snapshot(store, filename, key=None):
+    """
+    Write a ColumnarStore to the snapshot file of a CSV file.
+    The snapshot is a JSON header, which also holds the raw text table of every numeric column,
+    followed by the raw bytes of every column array.
+
+    Parameters:
+    -----------
+    store : ColumnarStore
+        The parsed contents of the CSV file.
+    filename : str
+        The path to the CSV file the store was loaded from.
+    key : dict, optional
+        The source_key of the CSV file at the time it was parsed.
+    """
+    key = key or source_key(filename)
+    columns = []
+    blobs = []
+    offset = 0
+    for name, column in store.columns.items():
+        entry = {'name': name}
+        if isinstance(column, TextColumn):
+            data = column.codes.tobytes()
+            entry['values'] = column.values
+        else:
+            data = column.tobytes()
+            entry['raw'] = sorted(store.raw[name].items())
+        entry['offset'] = offset
+        entry['length'] = len(data)
+        padding = -len(data) % 8
+        blobs.append(data + b'\0' * padding)
+        offset += len(data) + padding
+        columns.append(entry)
+    header = json.dumps({'source': key, 'rows': len(store), 'byteorder': sys.byteorder,
+                         'columns': columns}).encode('utf-8')
+    header += b' ' * (-(len(MAGIC) + 8 + len(header)) % 8)
+    path = snapshot_path(filename)
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as snapshot:
+        snapshot.write(MAGIC)
+        snapshot.write(struct.pack('<Q', len(header)))
+        snapshot.write(header)
+        for blob in blobs:
+            snapshot.write(blob)
+        # The data must be on disk before the rename, or a crash could leave a complete name over a partial file.
+        snapshot.flush()
+        os.fsync(snapshot.fileno())
+    os.replace(temp_path, path)
+
+
+def read_snapshot(filename, key=None):
+    """
+    Load the snapshot of a CSV file if it still matches the file.
+
+    Parameters:
+    -----------
+    filename : str
+        The path to the CSV file.
+    key : dict, optional
+        The current source_key of the CSV file.
+
+    Returns:
+    --------
+    ColumnarStore or None
+        The stored records, or None if there is no snapshot or it is stale or unreadable.
+    """
+    path = snapshot_path(filename)
+    if not os.path.exists(path):
+        return None
+    key = key or source_key(filename)
+    try:
+        with open(path, 'rb') as snapshot, mmap.mmap(snapshot.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if data[:len(MAGIC)] != MAGIC:
+                return None
+            (header_length,) = struct.unpack('<Q', data[len(MAGIC):len(MAGIC) + 8])
+            body = len(MAGIC) + 8 + header_length
+            header = json.loads(data[len(MAGIC) + 8:body].decode('utf-8'))
+            if header['source'] != key:
+                return None
+            store = ColumnarStore()
+            for entry in header['columns']:
+                column = store.columns[entry['name']]
+                start = body + entry['offset']
+                target = column.codes if isinstance(column, TextColumn) else column
+                target.frombytes(data[start:start + entry['length']])
+                if len(target) != header['rows']:
+                    raise ValueError(f"column {entry['name']} has {len(target)} rows, expected {header['rows']}")
+                if header['byteorder'] != sys.byteorder:
+                    target.byteswap()
+                if isinstance(column, TextColumn):
+                    column.values.extend(entry['values'])
+                    column.lookup.update((value, code) for code, value in enumerate(entry['values']))
+                else:
+                    store.raw[entry['name']].update((index, text) for index, text in entry['raw'])
+            return store
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Ignoring unreadable snapshot: {e}")
+        return None
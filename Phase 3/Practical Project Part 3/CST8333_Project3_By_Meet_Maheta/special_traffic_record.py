@@ -9,6 +9,8 @@ class SpecialTrafficRecord(RecordBase):
     A subclass of RecordBase representing a special type of traffic record.
     """
 
+    __slots__ = ()
+
     def __init__(self, section_id, highway, section, section_length, section_description, date, description, group, type_, county, ptrucks, adt, aadt, direction, pct85, priority_points):
         """
         Initialize a SpecialTrafficRecord object with the provided attributes by calling the superclass initializer.
@@ -0,0 +1,817 @@
+# sql_manager.py
+
+# Author: Meet Maheta
+
+import threading
+from aggregation import AGGREGATE_FUNCTIONS
+from columnar_store import MISSING
+from filter_expression import SQL_DATE_TEST, SQL_TEXT, compile_sql, sql_column, sql_number
+from record import TrafficRecord
+from record_cache import CACHE_SIZE, RecordCache
+from record_base import NUMERIC_ATTRIBUTES, RECORD_ATTRIBUTES
+from row_tracker import TABLE_COLUMNS, RowTracker, column_value
+from special_traffic_record import SpecialTrafficRecord
+from string_table import StringTable
+
+SELECT_COLUMNS = ", ".join(TABLE_COLUMNS)
+# The number of rows sent per executemany call and fetched at a time by the streaming reads.
+BATCH_SIZE = 1000
+# The SQL functions that compute the aggregates of aggregation.aggregate.
+SQL_FUNCTIONS = {'count': 'COUNT', 'sum': 'SUM', 'mean': 'AVG', 'min': 'MIN', 'max': 'MAX'}
+
+
+class SqlManager:
+    """
+    The SqlManager class holds what the MySQL and SQLite TrafficManagers share: the records list and the
+    table rows behind it, delta saves, single and bulk writes, cached reads by id, paging and date ranges.
+    Filters, sorts and aggregates are pushed down to the database with query, count, value_counts and aggregate.
+    A subclass supplies the database: its connections, the table schema, how rows are streamed,
+    how a write transaction is begun and new ids are allocated, and how values are passed to the driver.
+    """
+
+    # The exception class of the database driver.
+    ERROR = Exception
+    # The parameter marker of the database driver.
+    PARAM = '%s'
+    # The SQL of a text parameter that a column is compared with as a binary string.
+    TEXT_PARAM = SQL_TEXT
+    # The SQL condition that the date column holds a date.
+    DATE_TEST = SQL_DATE_TEST
+
+    def __init__(self, batch_size=BATCH_SIZE, cache_size=CACHE_SIZE):
+        """
+        Initialize the state shared by the SQL TrafficManagers, with no records loaded yet.
+
+        Parameters:
+        -----------
+        batch_size : int
+            The number of rows sent per statement by the bulk writes, and fetched at a time by the streaming reads.
+        cache_size : int
+            The most rows get_record keeps in its LRU cache; 0 disables the cache.
+        """
+        self.batch_size = batch_size
+        self.lock = threading.RLock()
+        self.rows = RowTracker()  # The table row behind every loaded or saved record
+        self.cache = RecordCache(cache_size)  # Rows read by get_record and get_records, by id
+        self.strings = StringTable()  # One shared string per distinct value of the repetitive text columns
+        self._records = None  # Loaded from the table on first use of records
+
+    @property
+    def records(self):
+        """
+        The records list, loaded from the table the first time it is used; paging, counting and the
+        other queries run in the database and never load it.
+        """
+        with self.lock:
+            if self._records is None:
+                self.reload_data()
+            return self._records
+
+    @records.setter
+    def records(self, records):
+        with self.lock:
+            self._records = records
+
+    @property
+    def conn(self):
+        """
+        The connection of the calling thread, or None if the database cannot be reached.
+        """
+        raise NotImplementedError
+
+    def _stream(self, conn, columns, batch_size):
+        """
+        Run a SELECT of some record attributes in id order and yield the rows in batches of up to batch_size.
+        """
+        raise NotImplementedError
+
+    def _begin(self, conn):
+        """
+        Begin a write transaction on a connection.
+        """
+        raise NotImplementedError
+
+    def _next_id(self, conn, cursor):
+        """
+        Return the id following the largest id in the table, keeping other writers out until the transaction ends.
+        """
+        raise NotImplementedError
+
+    def _rollback(self, conn):
+        """
+        Undo the open transaction, ignoring a connection that is already gone.
+        """
+        raise NotImplementedError
+
+    def _sql_value(self, value):
+        """
+        Convert a column value, as returned by row_tracker.column_value, to the value passed to the driver.
+        """
+        return value
+
+    def _column_param(self, name, value):
+        """
+        Return the parameter stored in the column of one record attribute.
+        """
+        return self._sql_value(column_value(name, value))
+
+    def _row_params(self, record):
+        """
+        Return the parameters of the columns of a record, in TABLE_COLUMNS order.
+        """
+        return tuple(self._column_param(name, getattr(record, name)) for name in RECORD_ATTRIBUTES)
+
+    def _params(self, count):
+        """
+        Return count parameter markers separated by commas.
+        """
+        return ", ".join([self.PARAM] * count)
+
+    def _database_error(self, error):
+        """
+        Report a database error.
+        """
+        print(f"Database error: {error}")
+
+    @staticmethod
+    def _check_columns(columns):
+        """
+        Return the names of record attributes, plus 'id', or raise a ValueError for any other name.
+        """
+        for name in columns:
+            if name != 'id' and name not in RECORD_ATTRIBUTES:
+                raise ValueError(f"Unknown record attribute: {name}")
+        return list(columns)
+
+    def load_data(self):
+        """
+        Load data from the traffic_volumes table into the records list.
+
+        Returns:
+        --------
+        records : list of TrafficRecord
+            A list of TrafficRecord objects loaded from the database.
+        """
+        loaded = self._load()
+        return loaded[0] if loaded else []
+
+    def _load(self):
+        """
+        Load every record together with the id of its row, or return None on an error.
+        """
+        conn = self.conn
+        if not conn:
+            print("Failed to connect to the database.")
+            return None
+        try:
+            records = []
+            ids = []
+            share = self.strings.share
+            for rows in self._stream(conn, ['id'] + RECORD_ATTRIBUTES, self.batch_size):
+                for row in rows:
+                    ids.append(row[0])
+                    records.append(TrafficRecord(*share(row[1:])))
+            return records, ids
+        except self.ERROR as e:
+            self._database_error(e)
+            return None
+
+    def iter_records(self, batch_size=None):
+        """
+        Stream the records of the traffic_volumes table without holding the result set in memory.
+        The calling thread's connection is busy until the iteration ends, so other calls have to wait for it
+        or use another thread.
+
+        Parameters:
+        -----------
+        batch_size : int, optional
+            The number of rows fetched at a time, defaults to the manager's batch_size.
+
+        Yields:
+        -------
+        TrafficRecord
+            The records in id order.
+        """
+        conn = self.conn
+        if not conn:
+            print("Failed to connect to the database.")
+            return
+        try:
+            share = self.strings.share
+            for rows in self._stream(conn, RECORD_ATTRIBUTES, batch_size or self.batch_size):
+                for row in rows:
+                    yield TrafficRecord(*share(row))
+        except self.ERROR as e:
+            self._database_error(e)
+
+    def iter_batches(self, columns=None, batch_size=None):
+        """
+        Stream chosen columns of the traffic_volumes table as column batches.
+        Only the projected columns are read, and only one batch is held at a time.
+
+        Parameters:
+        -----------
+        columns : list of str, optional
+            The record attributes to read, plus 'id' if wanted; defaults to every attribute.
+        batch_size : int, optional
+            The number of rows per batch, defaults to the manager's batch_size.
+
+        Yields:
+        -------
+        dict
+            The projected attribute names mapped to lists with the values of up to batch_size rows, in id order.
+
+        Raises:
+        -------
+        ValueError
+            If a column is not a record attribute.
+        """
+        columns = self._check_columns(columns or RECORD_ATTRIBUTES)
+        conn = self.conn
+        if not conn:
+            print("Failed to connect to the database.")
+            return
+        try:
+            for rows in self._stream(conn, columns, batch_size or self.batch_size):
+                yield dict(zip(columns, (list(values) for values in zip(*rows))))
+        except self.ERROR as e:
+            self._database_error(e)
+
+    def save_data(self):
+        """
+        Save the records list to the traffic_volumes table.
+        Only the differences since the records were loaded or last saved are sent, in a single transaction:
+        new records are inserted in batches of batch_size rows, records changed in place update only the
+        columns that changed, and the rows of records removed from the list are deleted in batches.
+        On an error nothing is changed.
+        """
+        if self._records is None:
+            return  # Nothing was loaded, so nothing has changed
+        conn = self.conn
+        if not conn:
+            print("Failed to connect to the database.")
+            return
+        with self.lock:
+            inserts, updates, deletes = self.rows.changes(self._records)
+            try:
+                self._begin(conn)
+                cursor = conn.cursor()
+                self._delete_rows(cursor, deletes)
+                self._update_rows(cursor, updates)
+                ids = self._insert_rows(conn, cursor, inserts)
+                conn.commit()
+            except self.ERROR as e:
+                self._rollback(conn)
+                self._database_error(e)
+                return
+            self.cache.invalidate(deletes + [row_id for record, row_id, names in updates])
+            for row_id in deletes:
+                self.rows.forget(row_id)
+            for record, row_id, names in updates:
+                self.rows.remember(record, row_id)
+            for record, row_id in zip(inserts, ids):
+                self.rows.remember(record, row_id)
+
+    def _delete_rows(self, cursor, ids):
+        """
+        Delete rows by id, batch_size ids per statement.
+        """
+        for start in range(0, len(ids), self.batch_size):
+            batch = ids[start:start + self.batch_size]
+            cursor.execute(f"DELETE FROM traffic_volumes WHERE id IN ({self._params(len(batch))})", batch)
+
+    def _update_rows(self, cursor, updates):
+        """
+        Write the changed columns of changed records over their rows.
+        Updates that change the same columns share one statement, sent batch_size rows per executemany call.
+        """
+        groups = {}
+        for record, row_id, names in updates:
+            groups.setdefault(tuple(names), []).append((record, row_id))
+        for names, rows in groups.items():
+            query = ("UPDATE traffic_volumes SET "
+                     + ", ".join(f"{TABLE_COLUMNS[RECORD_ATTRIBUTES.index(name)]} = {self.PARAM}" for name in names)
+                     + f" WHERE id = {self.PARAM}")
+            for start in range(0, len(rows), self.batch_size):
+                cursor.executemany(query, [tuple(self._column_param(name, getattr(record, name)) for name in names)
+                                           + (row_id,) for record, row_id in rows[start:start + self.batch_size]])
+
+    def _insert_rows(self, conn, cursor, records):
+        """
+        Insert records under new ids following the largest id in the table, and return the ids.
+        """
+        if not records:
+            return []
+        first = self._next_id(conn, cursor)
+        ids = list(range(first, first + len(records)))
+        self._write_rows(cursor, records, ids)
+        return ids
+
+    def _write_rows(self, cursor, records, ids):
+        """
+        Insert records with their ids, batch_size rows per executemany call.
+        """
+        query = f"INSERT INTO traffic_volumes (id, {SELECT_COLUMNS}) VALUES ({self._params(len(TABLE_COLUMNS) + 1)})"
+        for start in range(0, len(records), self.batch_size):
+            cursor.executemany(query, [(row_id,) + self._row_params(record) for record, row_id
+                                       in zip(records[start:start + self.batch_size],
+                                              ids[start:start + self.batch_size])])
+
+    def add_record(self, record_data):
+        """
+        Add a new record to the database, and to the records list if it is loaded.
+
+        Parameters:
+        -----------
+        record_data : dict
+            A dictionary containing the data for the new record.
+        """
+        conn = self.conn
+        if not conn:
+            print("Failed to connect to the database.")
+            return
+        record = self.strings.share_record(TrafficRecord(**record_data))
+        # One locked step, so a concurrent save_data never sees the record listed but not yet tracked.
+        with self.lock:
+            try:
+                self._begin(conn)
+                row_id = self._insert_rows(conn, conn.cursor(), [record])[0]
+                conn.commit()
+            except self.ERROR as e:
+                self._rollback(conn)
+                self._database_error(e)
+                return
+            if self._records is not None:
+                self._records.append(record)
+                self.rows.remember(record, row_id)
+
+    def add_records(self, records_data):
+        """
+        Add many new records to the database in a single transaction, and to the records list if it is loaded.
+
+        Parameters:
+        -----------
+        records_data : list of dict
+            One dictionary of record data per new record.
+
+        Returns:
+        --------
+        bool
+            True if the records were added, False otherwise.
+        """
+        conn = self.conn
+        if not conn:
+            print("Failed to connect to the database.")
+            return False
+        records = [self.strings.share_record(TrafficRecord(**record_data)) for record_data in records_data]
+        try:
+            self._begin(conn)
+            ids = self._insert_rows(conn, conn.cursor(), records)
+            conn.commit()
+        except self.ERROR as e:
+            self._rollback(conn)
+            self._database_error(e)
+            return False
+        with self.lock:
+            if self._records is not None:
+                self._records.extend(records)
+                for record, row_id in zip(records, ids):
+                    self.rows.remember(record, row_id)
+        return True
+
+    def edit_record(self, record_id, new_data):
+        """
+        Edit an existing record in the database, updating only the given columns.
+        The loaded record of the row, if any, is updated as well.
+
+        Parameters:
+        -----------
+        record_id : int
+            The ID of the record to edit.
+        new_data : dict
+            A dictionary mapping the attributes to change to their new values.
+
+        Returns:
+        --------
+        bool
+            True if the record was successfully edited, False otherwise.
+        """
+        conn = self.conn
+        if not conn:
+            print("Failed to connect to the database.")
+            return False
+        for name in new_data:
+            if name not in RECORD_ATTRIBUTES:
+                raise AttributeError(f"Unknown record attribute: {name}")
+        if not new_data:
+            return False
+        columns = [TABLE_COLUMNS[RECORD_ATTRIBUTES.index(name)] for name in new_data]
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                "UPDATE traffic_volumes SET " + ", ".join(f"{column}={self.PARAM}" for column in columns)
+                + f" WHERE id={self.PARAM}",
+                [self._column_param(name, value) for name, value in new_data.items()] + [record_id]
+            )
+            conn.commit()
+        except self.ERROR as e:
+            self._rollback(conn)
+            self._database_error(e)
+            return False
+        self.cache.invalidate([record_id])
+        with self.lock:
+            record = self.rows.record(record_id)
+            if record is not None:
+                for name, value in new_data.items():
+                    setattr(record, name, value)
+                self.strings.share_record(record)
+                self.rows.remember(record, record_id, list(new_data))
+        return cursor.rowcount > 0  # Return True if a record was updated
+
+    def delete_record(self, record_id):
+        """
+        Delete a record from the database and from the loaded records.
+
+        Parameters:
+        -----------
+        record_id : int
+            The ID of the record to delete.
+
+        Returns:
+        --------
+        bool
+            True if the record was successfully deleted, False otherwise.
+        """
+        conn = self.conn
+        if not conn:
+            print("Failed to connect to the database.")
+            return False
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f"DELETE FROM traffic_volumes WHERE id={self.PARAM}", (record_id,))
+            conn.commit()
+        except self.ERROR as e:
+            self._rollback(conn)
+            self._database_error(e)
+            return False
+        self.cache.invalidate([record_id])
+        with self.lock:
+            record = self.rows.record(record_id)
+            if record is not None:
+                self.rows.forget(record_id)
+                # Drop the loaded record too, so a later save does not need to delete it again.
+                for index, loaded in enumerate(self._records):
+                    if loaded is record:
+                        del self._records[index]
+                        break
+        return cursor.rowcount > 0  # Return True if a record was deleted
+
+    def get_record(self, record_id):
+        """
+        Retrieve a record from the database by ID.
+        Recently read rows are answered from the LRU cache without a round trip to the database.
+
+        Parameters:
+        -----------
+        record_id : int
+            The ID of the record to retrieve.
+
+        Returns:
+        --------
+        TrafficRecord or None
+            The TrafficRecord object if found, None otherwise.
+        """
+        return self.get_records([record_id])[0]
+
+    def get_records(self, ids):
+        """
+        Retrieve many records from the database by ID.
+        Cached rows are used as they are, and all the others are fetched with one
+        SELECT ... WHERE id IN (...) per batch_size ids and added to the cache.
+
+        Parameters:
+        -----------
+        ids : list of int
+            The IDs of the records to retrieve.
+
+        Returns:
+        --------
+        list of TrafficRecord or None
+            One new TrafficRecord per ID, in the order of the IDs, with None for IDs that have no row.
+        """
+        ids = list(ids)
+        rows, missing, version = self.cache.lookup(ids)
+        if missing:
+            conn = self.conn
+            if not conn:
+                print("Failed to connect to the database.")
+                return [None] * len(ids)
+            missing = list(dict.fromkeys(missing))
+            fetched = {}
+            try:
+                cursor = conn.cursor()
+                for start in range(0, len(missing), self.batch_size):
+                    batch = missing[start:start + self.batch_size]
+                    cursor.execute(f"SELECT id, {SELECT_COLUMNS} FROM traffic_volumes WHERE id IN "
+                                   f"({self._params(len(batch))})", batch)
+                    for row in cursor.fetchall():
+                        fetched[row[0]] = tuple(row[1:])
+            except self.ERROR as e:
+                self._database_error(e)
+                return [None] * len(ids)
+            self.cache.store(fetched, version)
+            rows.update(fetched)
+        # Every call gets its own records, so changing one does not change the cached row.
+        return [TrafficRecord(*rows[row_id]) if row_id in rows else None for row_id in ids]
+
+    def fetch_page(self, size, after=None, before=None):
+        """
+        Retrieve one page of records by keyset pagination on the primary key.
+        A page is found through the id index with a single range scan, so every page
+        is as fast as the first one, however large the table is.
+
+        Parameters:
+        -----------
+        size : int
+            The most records on the page.
+        after : int, optional
+            If given, the page starts with the first row whose id is greater than this one.
+        before : int, optional
+            If given, the page ends with the last row whose id is less than this one.
+
+        Returns:
+        --------
+        list of tuple
+            (id, TrafficRecord) pairs in id order; the first page when neither cursor is given.
+        """
+        conn = self.conn
+        if not conn:
+            print("Failed to connect to the database.")
+            return []
+        query = f"SELECT id, {SELECT_COLUMNS} FROM traffic_volumes"
+        if before is not None:
+            # Read the page backwards from the cursor, then restore id order.
+            query += f" WHERE id < {self.PARAM} ORDER BY id DESC LIMIT {self.PARAM}"
+            params = (before, size)
+        elif after is not None:
+            query += f" WHERE id > {self.PARAM} ORDER BY id LIMIT {self.PARAM}"
+            params = (after, size)
+        else:
+            query += f" ORDER BY id LIMIT {self.PARAM}"
+            params = (size,)
+        try:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
+        except self.ERROR as e:
+            self._database_error(e)
+            return []
+        if before is not None:
+            rows.reverse()
+        return [(row[0], TrafficRecord(*row[1:])) for row in rows]
+
+    def find_date_range(self, start, end, highway=None):
+        """
+        Retrieve the records dated between two dates, both included, through the date index.
+
+        Parameters:
+        -----------
+        start : str or datetime.date
+            The first date of the range, in any date format of the CSV file.
+        end : str or datetime.date
+            The last date of the range.
+        highway : str, optional
+            If given, only records of this highway are returned, using the (highway, date) index.
+
+        Returns:
+        --------
+        list of TrafficRecord
+            The matching records in date order.
+        """
+        conn = self.conn
+        if not conn:
+            print("Failed to connect to the database.")
+            return []
+        start = column_value('date', start)
+        end = column_value('date', end)
+        if start is None or end is None:
+            return []
+        query = f"SELECT {SELECT_COLUMNS} FROM traffic_volumes WHERE date BETWEEN {self.PARAM} AND {self.PARAM}"
+        params = [self._sql_value(start), self._sql_value(end)]
+        if highway is not None:
+            query += f" AND highway = {self.PARAM}"
+            params.append(highway)
+        query += " ORDER BY date, id"
+        try:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            return [TrafficRecord(*row) for row in cursor.fetchall()]
+        except self.ERROR as e:
+            self._database_error(e)
+            return []
+
+    def reload_data(self):
+        """
+        Reload the records list from the database.
+        """
+        self.strings.clear()
+        loaded = self._load()
+        with self.lock:
+            self._records, ids = loaded if loaded else ([], [])
+            self.rows.reset(self._records, ids)
+
+    def query(self, where=None, columns=None, order_by=None, limit=None, offset=0):
+        """
+        Retrieve the records that match a filter expression. Filtering, sorting, paging and projection
+        all run in the database as one parameterized query, so only the result rows are sent.
+
+        Parameters:
+        -----------
+        where : str, optional
+            A filter expression as accepted by filter_expression.compile_filter,
+            e.g. 'aadt > 5000 and county == "HFX"'; all records match if it is not given.
+        columns : list of str, optional
+            The record attributes to return, plus 'id' if wanted. When given, dictionaries
+            of just these columns are returned instead of records.
+        order_by : str or list of str, optional
+            The attributes to sort by, each prefixed with '-' to sort it in descending order.
+            Numeric attributes sort as numbers with blank values last; ties keep id order.
+        limit : int, optional
+            The most records to return.
+        offset : int
+            The number of matching records to skip before the first one returned.
+
+        Returns:
+        --------
+        list of TrafficRecord or list of dict
+            The matching records, or their projected columns.
+
+        Raises:
+        -------
+        ValueError
+            If the expression is not valid or an attribute is unknown.
+        """
+        names = ['id'] + RECORD_ATTRIBUTES if columns is None else self._check_columns(columns)
+        condition, params = self._where(where)
+        query = f"SELECT {', '.join(sql_column(name) for name in names)} FROM traffic_volumes{condition}"
+        query += self._order(order_by)
+        if limit is not None or offset:
+            query += f" LIMIT {self.PARAM} OFFSET {self.PARAM}"
+            params += [2 ** 63 - 1 if limit is None else int(limit), int(offset)]
+        rows = self._fetch(query, params)
+        if columns is None:
+            return [TrafficRecord(*row[1:]) for row in rows]
+        return [dict(zip(names, row)) for row in rows]
+
+    def count(self, where=None):
+        """
+        Count the records that match a filter expression in the database.
+
+        Parameters:
+        -----------
+        where : str, optional
+            A filter expression as accepted by filter_expression.compile_filter.
+
+        Returns:
+        --------
+        int
+            The number of matching records.
+        """
+        condition, params = self._where(where)
+        rows = self._fetch(f"SELECT COUNT(*) FROM traffic_volumes{condition}", params)
+        return rows[0][0] if rows else 0
+
+    def value_counts(self, column, where=None, limit=None):
+        """
+        Count the records per value of one attribute with a GROUP BY in the database.
+
+        Parameters:
+        -----------
+        column : str
+            The attribute to count the values of, e.g. 'county'.
+        where : str, optional
+            A filter expression the counted records must match.
+        limit : int, optional
+            The most values to return.
+
+        Returns:
+        --------
+        list of tuple
+            (value, count) pairs, the most frequent value first and equal counts in value order.
+        """
+        name = sql_column(self._check_columns([column])[0])
+        condition, params = self._where(where)
+        query = (f"SELECT {name}, COUNT(*) AS records FROM traffic_volumes{condition} "
+                 f"GROUP BY {name} ORDER BY records DESC, {name}")
+        if limit is not None:
+            query += f" LIMIT {self.PARAM}"
+            params.append(int(limit))
+        return [(value, count) for value, count in self._fetch(query, params)]
+
+    def aggregate(self, by, metrics, where=None):
+        """
+        Group the records and compute aggregates of numeric attributes with a GROUP BY in the database.
+        Takes the same by and metrics as aggregation.aggregate and returns rows of the same form.
+
+        Parameters:
+        -----------
+        by : str or list of str
+            The attributes to group by; an empty list aggregates all records as one group.
+        metrics : dict
+            Numeric attributes mapped to lists of functions from AGGREGATE_FUNCTIONS, e.g. {'aadt': ['mean', 'max']}.
+        where : str, optional
+            A filter expression the aggregated records must match.
+
+        Returns:
+        --------
+        list of dict
+            One row per group, sorted by the group values, holding the group values, 'rows' with the
+            number of records in the group, and one '<attribute>_<function>' entry per metric.
+
+        Raises:
+        -------
+        ValueError
+            If an attribute or function is unknown.
+        """
+        by = self._check_columns([by] if isinstance(by, str) else list(by))
+        labels = []
+        selects = [sql_column(name) for name in by] + ['COUNT(*)']
+        for name, functions in metrics.items():
+            if name not in NUMERIC_ATTRIBUTES:
+                raise ValueError(f"Only numeric attributes can be aggregated, not {name}")
+            for function in [functions] if isinstance(functions, str) else functions:
+                if function not in AGGREGATE_FUNCTIONS:
+                    raise ValueError(f"Unknown aggregate function: {function}")
+                labels.append((f"{name}_{function}", function))
+                selects.append(f"{SQL_FUNCTIONS[function]}({sql_number(name)})")
+        condition, params = self._where(where)
+        query = f"SELECT {', '.join(selects)} FROM traffic_volumes{condition}"
+        if by:
+            columns = ", ".join(sql_column(name) for name in by)
+            query += f" GROUP BY {columns} ORDER BY {columns}"
+        results = []
+        for row in self._fetch(query, params):
+            result = dict(zip(by, row), rows=row[len(by)])
+            for (label, function), value in zip(labels, row[len(by) + 1:]):
+                # Blank values are left out, as in aggregation.aggregate: an empty sum is 0, other aggregates NaN.
+                if function == 'count':
+                    result[label] = int(value)
+                elif value is None:
+                    result[label] = 0.0 if function == 'sum' else MISSING
+                else:
+                    result[label] = float(value)
+            if result['rows']:
+                results.append(result)
+        return results
+
+    def _where(self, where):
+        """
+        Compile a filter expression to a WHERE clause and the list of its parameters.
+        """
+        if not where:
+            return "", []
+        condition, params = compile_sql(where, self.PARAM, self.TEXT_PARAM, self.DATE_TEST)
+        return f" WHERE {condition}", [self._sql_value(param) for param in params]
+
+    def _order(self, order_by):
+        """
+        Build the ORDER BY clause of query; id order is always the last key, so the order is stable.
+        """
+        keys = []
+        for name in [order_by] if isinstance(order_by, str) else (order_by or []):
+            descending = name.startswith('-')
+            name = self._check_columns([name.lstrip('-')])[0]
+            if name in NUMERIC_ATTRIBUTES:
+                expression = sql_number(name)
+                keys.append(f"{expression} IS NULL")  # Blank values last in either direction
+            else:
+                expression = sql_column(name)
+            keys.append(expression + (" DESC" if descending else ""))
+        return " ORDER BY " + ", ".join(keys + ['id'])
+
+    def _fetch(self, query, params):
+        """
+        Run a query on the calling thread's connection and return all its rows, or an empty list on an error.
+        """
+        conn = self.conn
+        if not conn:
+            print("Failed to connect to the database.")
+            return []
+        try:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            return cursor.fetchall()
+        except self.ERROR as e:
+            self._database_error(e)
+            return []
+
+    def demonstrate_polymorphism(self):
+        """
+        Demonstrate polymorphism with TrafficRecord and SpecialTrafficRecord.
+        """
+        sample_records = [
+            TrafficRecord("1", "Highway1", "Section1", "10", "Description1", "2023-01-01", "Desc1", "Group1", "Type1", "County1", "10", "1000", "2000", "North", "85", "10"),
+            SpecialTrafficRecord("2", "Highway2", "Section2", "20", "Description2", "2023-01-02", "Desc2", "Group2", "Type2", "County2", "20", "2000", "3000", "South", "90", "20")
+        ]
+        for record in sample_records:
+            print(record.display())
@@ -0,0 +1,240 @@
+# sqlite_manager.py
+
+# Author: Meet Maheta
+
+import datetime
+import sqlite3
+import threading
+import weakref
+from record_cache import CACHE_SIZE
+from row_tracker import column_value
+from sql_manager import BATCH_SIZE, SqlManager
+
+# The traffic_volumes table of Traffic_Schema.sql, with the SQLite types that hold the same values.
+# Dates are stored as ISO 'YYYY-MM-DD' text, so they sort and compare as dates; text that is not a date is kept as it is.
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS traffic_volumes (
+        id INTEGER PRIMARY KEY,
+        section_id TEXT,
+        highway TEXT,
+        section TEXT,
+        section_length REAL,
+        section_description TEXT,
+        date TEXT,
+        description TEXT,
+        group_ TEXT,
+        type_ TEXT,
+        county TEXT,
+        ptrucks TEXT,
+        adt REAL,
+        aadt REAL,
+        direction TEXT,
+        pct85 TEXT,
+        priority_points TEXT
+    );
+    CREATE INDEX IF NOT EXISTS idx_section_id ON traffic_volumes (section_id);
+    CREATE INDEX IF NOT EXISTS idx_date ON traffic_volumes (date);
+    CREATE INDEX IF NOT EXISTS idx_highway_date ON traffic_volumes (highway, date);
+    CREATE INDEX IF NOT EXISTS idx_county ON traffic_volumes (county);
+'''
+# The seconds a writer waits for another connection's write transaction before giving up.
+BUSY_TIMEOUT = 30.0
+
+
+def sqlite_value(value):
+    """
+    Convert a column value to the value stored by SQLite, where dates are ISO text.
+    """
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    return value
+
+
+class TrafficManager(SqlManager):
+    """
+    The TrafficManager class manages traffic records in an embedded SQLite database file,
+    with the same interface as the MySQL TrafficManager and no database server to run.
+    The database is kept in WAL mode, so readers never wait for a writer and every
+    committed write is durable, and bulk writes run in a single transaction.
+    """
+
+    ERROR = sqlite3.Error
+    PARAM = '?'
+    # SQLite compares text as binary strings unless a column asks for another collation.
+    TEXT_PARAM = '?'
+    # A date that does not parse is kept as its text, so only ISO dates can be compared as dates.
+    DATE_TEST = "date GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]'"
+
+    def __init__(self, filename, batch_size=BATCH_SIZE, cache_size=CACHE_SIZE):
+        """
+        Initialize the TrafficManager with the database file, creating the table and its indexes if needed.
+
+        Parameters:
+        -----------
+        filename : str
+            The path of the SQLite database file; it is created if it does not exist.
+        batch_size : int
+            The number of rows sent per statement by the bulk writes, and fetched at a time by the streaming reads.
+        cache_size : int
+            The most rows get_record keeps in its LRU cache; 0 disables the cache.
+        """
+        super().__init__(batch_size, cache_size)
+        self.filename = filename
+        self.local = threading.local()  # Each thread opens its own connection, held by a _ThreadConnection
+        self.connections = []
+        if self.conn:
+            self.create_table()
+
+    def connect_to_db(self):
+        """
+        Open a new connection to the database file in WAL mode.
+        Transactions are begun explicitly, so the connection runs in autocommit mode otherwise.
+
+        Returns:
+        --------
+        conn : sqlite3.Connection
+            The new SQLite connection object.
+
+        Raises:
+        -------
+        sqlite3.Error
+            If the database file cannot be opened.
+        """
+        conn = sqlite3.connect(self.filename, timeout=BUSY_TIMEOUT, isolation_level=None, check_same_thread=False)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=FULL")
+        except sqlite3.Error:
+            conn.close()
+            raise
+        return conn
+
+    @property
+    def conn(self):
+        """
+        The connection of the calling thread, opened on its first use, or None if the database cannot be opened.
+        """
+        holder = getattr(self.local, 'holder', None)
+        if holder is None:
+            try:
+                conn = self.connect_to_db()
+            except sqlite3.Error as e:
+                print(f"Error: {e}")
+                return None
+            holder = _ThreadConnection(conn)
+            # Close the connection when the thread ends without calling release_connection.
+            holder.finalizer = weakref.finalize(holder, self._close_connection, conn)
+            self.local.holder = holder
+            with self.lock:
+                self.connections.append(conn)
+        return holder.conn
+
+    def _close_connection(self, conn):
+        """
+        Close a thread's connection and stop tracking it.
+        """
+        with self.lock:
+            if conn in self.connections:
+                self.connections.remove(conn)
+        conn.close()
+
+    def release_connection(self):
+        """
+        Close the calling thread's connection, e.g. when a worker thread is done with the manager.
+        Connections of threads that exit are closed automatically.
+        """
+        holder = getattr(self.local, 'holder', None)
+        if holder is not None:
+            del self.local.holder
+            holder.finalizer()
+
+    def close(self):
+        """
+        Close the connections of the manager.
+        """
+        with self.lock:
+            connections, self.connections = self.connections, []
+        for conn in connections:
+            conn.close()
+        self.local = threading.local()
+
+    def create_table(self):
+        """
+        Create the traffic_volumes table and its indexes if they do not exist.
+        """
+        conn = self.conn
+        if not conn:
+            print("Failed to connect to the database.")
+            return
+        try:
+            conn.executescript(SCHEMA)
+        except sqlite3.Error as e:
+            self._database_error(e)
+
+    def _stream(self, conn, columns, batch_size):
+        """
+        Run a SELECT of some record attributes and yield the rows in fetchmany batches.
+        SQLite steps through the result as it is fetched, so only one batch is held at a time.
+        """
+        names = ", ".join('group_' if name == 'group' else name for name in columns)
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"SELECT {names} FROM traffic_volumes ORDER BY id")
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    return
+                yield rows
+        finally:
+            cursor.close()
+
+    def _begin(self, conn):
+        """
+        Begin an IMMEDIATE transaction, so no other connection can write until it ends.
+        """
+        conn.execute("BEGIN IMMEDIATE")
+
+    def _next_id(self, conn, cursor):
+        """
+        Return the id following the largest id in the table; the IMMEDIATE transaction keeps other writers out.
+        """
+        cursor.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM traffic_volumes")
+        return cursor.fetchone()[0]
+
+    def _rollback(self, conn):
+        """
+        Undo the open transaction, if there is one.
+        """
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            pass
+
+    def _sql_value(self, value):
+        """
+        Convert a column value to the value stored by SQLite.
+        """
+        return sqlite_value(value)
+
+    def _column_param(self, name, value):
+        """
+        Return the value stored for one record attribute. A date that does not parse is kept as its
+        raw text, as in the CSV file, rather than lost as NULL; the date column is TEXT, so it can hold it.
+        """
+        stored = column_value(name, value)
+        if stored is None and name == 'date' and value not in (None, ''):
+            return str(value)
+        return sqlite_value(stored)
+
+
+class _ThreadConnection:
+    """
+    The connection a thread opened, kept in thread-local storage.
+    """
+
+    __slots__ = ('conn', 'finalizer', '__weakref__')
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.finalizer = None
@@ -0,0 +1,81 @@
+# string_table.py
+
+# Author: Meet Maheta
+
+from record_base import RECORD_ATTRIBUTES
+
+# The text attributes that repeat across many rows and share one string per distinct value.
+SHARED_ATTRIBUTES = ['highway', 'section_description', 'group', 'type_', 'county', 'direction']
+SHARED_POSITIONS = [RECORD_ATTRIBUTES.index(name) for name in SHARED_ATTRIBUTES]
+
+
+class StringTable:
+    """
+    The StringTable class interns the values of the low-cardinality text attributes.
+    Every distinct value is stored once, and the records built through the table refer to that single
+    string instead of each holding an equal copy, which saves the memory of the copies.
+    """
+
+    def __init__(self):
+        """
+        Initialize an empty table.
+        """
+        self.values = {}
+
+    def __len__(self):
+        """
+        Return the number of distinct values in the table.
+        """
+        return len(self.values)
+
+    def clear(self):
+        """
+        Forget every value, e.g. before the records are reloaded, so values that are gone are not kept alive.
+        """
+        self.values = {}
+
+    def intern(self, value):
+        """
+        Return the shared string equal to a value, adding the value to the table if it is new.
+
+        Parameters:
+        -----------
+        value : str
+            The text value to share.
+
+        Returns:
+        --------
+        str
+            The shared string.
+        """
+        return self.values.setdefault(value, value)
+
+    def share(self, values):
+        """
+        Replace the shared attributes of a row of raw values by their shared strings.
+
+        Parameters:
+        -----------
+        values : list
+            The values of one record in RECORD_ATTRIBUTES order; a list is changed in place.
+
+        Returns:
+        --------
+        list
+            The row with shared strings, ready for TrafficRecord(*values).
+        """
+        if type(values) is not list:
+            values = list(values)
+        setdefault = self.values.setdefault
+        for position in SHARED_POSITIONS:
+            value = values[position]
+            values[position] = setdefault(value, value)
+        return values
+
+    def share_record(self, record):
+        """
+        Replace the shared attributes of a record by their shared strings, e.g. after it was added or edited.
+        """
+        for name in SHARED_ATTRIBUTES:
+            setattr(record, name, self.intern(getattr(record, name)))
+        return record
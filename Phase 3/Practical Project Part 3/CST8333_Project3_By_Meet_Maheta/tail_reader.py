@@ -0,0 +1,149 @@
+# tail_reader.py
+
+# Author: Meet Maheta
+
+import hashlib
+import mmap
+import os
+from parallel_loader import column_positions, count_quotes, parse_range, parse_ranges, split_ranges
+
+# The bytes just before the loaded offset that are checksummed to detect a rewritten file.
+CHECK_WINDOW_BYTES = 64 * 1024
+
+
+class TailTracker:
+    """
+    The TailTracker class remembers how far a CSV file has been loaded, so rows appended to it later
+    can be read without parsing the whole file again.
+    The device and inode of the file are kept, and the header and the bytes just before the loaded
+    offset are checksummed; if any of them change, the file was replaced or rewritten rather than
+    appended to and it has to be loaded in full.
+    """
+
+    def __init__(self, filename):
+        """
+        Initialize a TailTracker for a CSV file that has not been loaded yet.
+
+        Parameters:
+        -----------
+        filename : str
+            The path to the CSV file.
+        """
+        self.filename = filename
+        self.reset()
+
+    def reset(self):
+        """
+        Forget the loaded state, so the next read_tail asks for a full load.
+        """
+        self.offset = None
+        self.header_end = None
+        self.columns = None
+        self.checksum = None
+        self.identity = None
+
+    def _checksum(self, csvfile, offset):
+        """
+        Hash the header and the window of bytes that ends at an offset.
+        """
+        digest = hashlib.sha256()
+        csvfile.seek(0)
+        digest.update(csvfile.read(self.header_end))
+        start = max(self.header_end, offset - CHECK_WINDOW_BYTES)
+        csvfile.seek(start)
+        digest.update(csvfile.read(offset - start))
+        return digest.hexdigest()
+
+    @staticmethod
+    def _identity(csvfile):
+        """
+        Return the device and inode of an open file, which change when another writer replaces the file.
+        """
+        stat = os.fstat(csvfile.fileno())
+        return stat.st_dev, stat.st_ino
+
+    def _remember(self, offset):
+        """
+        Record that the file has been loaded up to an offset.
+        """
+        with open(self.filename, 'rb') as csvfile:
+            self.identity = self._identity(csvfile)
+            self.checksum = self._checksum(csvfile, offset)
+        self.offset = offset
+
+    def load(self, workers=1):
+        """
+        Parse the whole file as it is now and start tracking it.
+
+        Parameters:
+        -----------
+        workers : int
+            The number of processes used to parse the file.
+
+        Yields:
+        -------
+        list
+            The values of each row in CSV_FIELDNAMES order.
+        """
+        self.reset()
+        workers = workers or os.cpu_count() or 1
+        header_end, ranges = split_ranges(self.filename, workers)
+        if header_end == 0:
+            return
+        columns = column_positions(self.filename, header_end)
+        yield from parse_ranges(self.filename, ranges, columns, workers)
+        end = ranges[-1][1] if ranges else header_end
+        with open(self.filename, 'rb') as csvfile:
+            csvfile.seek(end - 1)
+            complete = csvfile.read(1) == b'\n'
+        # A last row without a newline may still be being written, so it cannot be a tail offset.
+        if complete:
+            self.header_end = header_end
+            self.columns = columns
+            self._remember(end)
+
+    def read_tail(self):
+        """
+        Parse the complete rows appended since the last load or tail read.
+
+        Returns:
+        --------
+        list of list or None
+            The new rows in CSV_FIELDNAMES order, or None if the file must be loaded in full
+            because it was never loaded, was replaced, shrank, or its loaded part changed.
+        """
+        if self.offset is None:
+            return None
+        try:
+            size = os.path.getsize(self.filename)
+            if size < self.offset:
+                return None
+            with open(self.filename, 'rb') as csvfile:
+                if self._identity(csvfile) != self.identity or self._checksum(csvfile, self.offset) != self.checksum:
+                    return None
+            if size == self.offset:
+                return []
+            with open(self.filename, 'rb') as csvfile, mmap.mmap(csvfile.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                end = self._last_row_end(data, self.offset)
+        except (OSError, ValueError):
+            return None
+        rows = parse_range(self.filename, self.offset, end, self.columns)
+        self._remember(end)
+        return rows
+
+    @staticmethod
+    def _last_row_end(data, start):
+        """
+        Return the end of the last complete row after a row boundary, ignoring a row still being written.
+        """
+        position = start
+        quotes = 0
+        last = start
+        while True:
+            newline = data.find(b'\n', position)
+            if newline < 0:
+                return last
+            quotes += count_quotes(data, position, newline)
+            position = newline + 1
+            if quotes % 2 == 0:
+                last = position
@@ -2,9 +2,114 @@
 
 # Author: Meet Maheta
 
+import csv
+import gc
+import io
+import json
+import locale
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import types
 import unittest
-from traffic_manager import TrafficManager
+from concurrent.futures import Future
+from unittest import mock
+import business
+import parallel_loader
+import presentation
+import snapshot_cache
+import sqlite_manager
+from aggregation import aggregate
+from connection_pool import ConnectionPool, Error, PoolError
+from filter_expression import compile_filter
+from mapped_reader import MappedCsv
+from record_base import CSV_FIELDNAMES, RECORD_ATTRIBUTES
+from record_index import parse_date
+from record_renderer import RecordRenderer
+from string_table import SHARED_ATTRIBUTES, SHARED_POSITIONS, StringTable
+try:
+    from mysql.connector import connect
+    from traffic_manager import TrafficManager
+except ImportError:
+    TrafficManager = None
 
+CSV_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Traffic_Volumes_-_Provincial_Highway_System.csv')
+RECORD_DATA = {
+    'section_id': '9999', 'highway': 'H', 'section': 'S', 'section_length': 1.0,
+    'section_description': 'Desc', 'date': '2023-01-01', 'description': 'Desc',
+    'group': 'G', 'type_': 'T', 'county': 'C', 'ptrucks': '5', 'adt': 1000.0,
+    'aadt': 2000.0, 'direction': 'D', 'pct85': '85', 'priority_points': '7'
+}
+
+
+def mysql_available():
+    """
+    Return True if the MySQL connector is installed and the test database accepts connections.
+    """
+    if TrafficManager is None:
+        return False
+    try:
+        connect(host='localhost', database='traffic', user='mmb0702', password='System #1234').close()
+    except Error:
+        return False
+    return True
+
+
+def load_traffic_manager():
+    """
+    Import traffic_manager, with a stand-in for the MySQL connector when it is not installed,
+    so the code that only talks to a cursor can be tested without it.
+    """
+    try:
+        import traffic_manager
+        return traffic_manager
+    except ImportError:
+        pass
+
+    class StandInError(Exception):
+        def __init__(self, msg=None, errno=None):
+            super().__init__(msg)
+            self.errno = errno
+    errors = types.ModuleType('mysql.connector.errors')
+    errors.Error = StandInError
+    for name in ('InterfaceError', 'OperationalError', 'PoolError'):
+        setattr(errors, name, type(name, (StandInError,), {}))
+    connector = types.ModuleType('mysql.connector')
+    connector.Error = StandInError
+    connector.errors = errors
+    connector.connect = mock.Mock()
+    package = types.ModuleType('mysql')
+    package.connector = connector
+    with mock.patch.dict(sys.modules, {'mysql': package, 'mysql.connector': connector,
+                                       'mysql.connector.errors': errors}):
+        import traffic_manager
+    return traffic_manager
+
+
+class CsvFileTestCase(unittest.TestCase):
+    """
+    Base class for tests that work on a copy of the CSV file in a temporary directory.
+    """
+
+    def setUp(self):
+        """
+        Set up the test environment by copying the CSV file to a temporary directory.
+        """
+        self.tmpdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmpdir, 'traffic.csv')
+        shutil.copy(CSV_FILE, self.filename)
+        self.record_data = dict(RECORD_DATA)
+
+    def tearDown(self):
+        """
+        Remove the temporary directory.
+        """
+        shutil.rmtree(self.tmpdir)
+
+@unittest.skipUnless(mysql_available(), "MySQL server not available")
 class TestTrafficManager(unittest.TestCase):
     """
     Unit tests for the TrafficManager class.
@@ -85,11 +190,1391 @@ class TestTrafficManager(unittest.TestCase):
         self.manager.delete_record(id)
         self.assertIsNone(self.manager.get_record(id))
 
+    def test_find_date_range(self):
+        """
+        Test the find_date_range method to ensure it returns only records inside the range.
+        """
+        self.manager.add_record(RECORD_DATA)
+        self.assertEqual(len(self.manager.find_date_range('2022-12-01', '2023-01-31', highway='H')), 1)
+        self.assertEqual(len(self.manager.find_date_range('2020-01-01', '2020-12-31')), 0)
+
+    def test_save_data_bulk(self):
+        """
+        Test that save_data replaces the table with the records list in batches.
+        """
+        self.manager.records = business.TrafficManager(CSV_FILE).records[:2500]
+        self.manager.batch_size = 1000
+        self.manager.save_data()
+        self.assertEqual(len(self.manager.load_data()), 2500)
+
+    def test_add_records(self):
+        """
+        Test the add_records method to ensure it adds every record in one transaction.
+        """
+        self.assertTrue(self.manager.add_records([dict(RECORD_DATA, section_id=str(9000 + number))
+                                                  for number in range(5)]))
+        self.assertEqual(len(self.manager.load_data()), 5)
+
+    def test_concurrent_workers(self):
+        """
+        Test that several threads can share the manager, each through its own pooled connection.
+        """
+        def worker(number):
+            self.manager.add_records([dict(RECORD_DATA, section_id=str(number))])
+            self.manager.release_connection()
+        threads = [threading.Thread(target=worker, args=(number,)) for number in range(12)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(self.manager.load_data()), 12)
+
+    def test_streaming_load(self):
+        """
+        Test that records and projected column batches stream in batches, and that stopping early
+        leaves the connection usable.
+        """
+        self.manager.records = business.TrafficManager(CSV_FILE).records[:250]
+        self.manager.save_data()
+        batches = list(self.manager.iter_batches(['id', 'county', 'aadt'], batch_size=100))
+        self.assertEqual([len(batch['county']) for batch in batches], [100, 100, 50])
+        self.assertEqual(set(batches[0]), {'id', 'county', 'aadt'})
+        self.assertEqual(sum(1 for record in self.manager.iter_records(batch_size=64)), 250)
+        for record in self.manager.iter_records(batch_size=10):
+            break
+        self.assertEqual(len(self.manager.load_data()), 250)
+        with self.assertRaises(ValueError):
+            next(self.manager.iter_batches(['speed']))
+
+    def test_delta_save(self):
+        """
+        Test that save_data only inserts, updates and deletes the rows that changed.
+        """
+        self.manager.records = business.TrafficManager(CSV_FILE).records[:300]
+        self.manager.save_data()
+        self.manager.reload_data()
+        ids = [row_id for batch in self.manager.iter_batches(['id']) for row_id in batch['id']]
+        self.manager.records[0].county = 'NEW'
+        del self.manager.records[1:3]
+        self.manager.records.append(business.TrafficManager(CSV_FILE).records[-1])
+        self.manager.save_data()
+        rows = {row_id: county for batch in self.manager.iter_batches(['id', 'county'])
+                for row_id, county in zip(batch['id'], batch['county'])}
+        self.assertEqual(len(rows), 299)
+        self.assertEqual(rows[ids[0]], 'NEW')
+        self.assertNotIn(ids[1], rows)
+        self.assertTrue(set(ids[3:]) <= set(rows))
+
+    def test_record_cache(self):
+        """
+        Test that get_record and get_records answer repeated reads from the cache,
+        and that edits and deletes invalidate the cached rows.
+        """
+        self.manager.records = business.TrafficManager(CSV_FILE).records[:5]
+        self.manager.save_data()
+        ids = [row_id for batch in self.manager.iter_batches(['id']) for row_id in batch['id']]
+        first = self.manager.get_record(ids[0])
+        self.assertEqual((self.manager.cache.hits, self.manager.cache.misses), (0, 1))
+        first.county = 'CHANGED'
+        self.assertNotEqual(self.manager.get_record(ids[0]).county, 'CHANGED')
+        self.assertEqual(self.manager.cache.hits, 1)
+        records = self.manager.get_records(ids + [-1])
+        self.assertEqual(len(records), 6)
+        self.assertIsNone(records[-1])
+        self.assertEqual((self.manager.cache.hits, self.manager.cache.misses), (2, 6))
+        self.manager.edit_record(ids[1], {'adt': 12345.0})
+        self.assertEqual(self.manager.get_record(ids[1]).adt, 12345.0)
+        self.manager.delete_record(ids[2])
+        self.assertIsNone(self.manager.get_record(ids[2]))
+
+    def test_query_push_down(self):
+        """
+        Test that the query methods filter, sort, count and aggregate in the database
+        with the same results as the in-memory filter and aggregate functions, comparing text case-sensitively.
+        """
+        records = business.TrafficManager(CSV_FILE).records[:1000]
+        self.manager.records = records
+        self.manager.save_data()
+        expression = 'aadt > 5000 and not county == "HFX"'
+        expected = compile_filter(expression).positions(records)
+        self.assertEqual(self.manager.count(expression), len(expected))
+        rows = self.manager.query(expression, columns=['county'])
+        self.assertEqual([row['county'] for row in rows], [records[position].county for position in expected])
+        top = self.manager.query(order_by='-aadt', limit=3)
+        self.assertEqual([record.aadt for record in top],
+                         sorted((float(record.aadt) for record in records if record.aadt != ''), reverse=True)[:3])
+        counts = self.manager.value_counts('county', where='aadt > 1000')
+        self.assertEqual(sum(count for value, count in counts), self.manager.count('aadt > 1000'))
+        rows = self.manager.aggregate(['county'], {'aadt': ['count', 'max']}, where='adt >= 1000')
+        matching = [records[position] for position in compile_filter('adt >= 1000').positions(records)]
+        self.assertEqual(rows, aggregate(matching, ['county'], {'aadt': ['count', 'max']}))
+        for expression in ('county == "hfx"', 'county in ("hfx", "HFX")', 'county != "hfx"', 'county >= "a"'):
+            self.assertEqual(self.manager.count(expression), len(compile_filter(expression).positions(records)))
+        with self.assertRaises(ValueError):
+            self.manager.query('speed > 10')
+
+    def test_fetch_page(self):
+        """
+        Test that fetch_page walks the table forwards and backwards by id, across gaps left by deletes,
+        and that the CSV manager pages by record index in the same way.
+        """
+        csv_manager = business.TrafficManager(CSV_FILE)
+        self.manager.records = csv_manager.records[:10]
+        self.manager.save_data()
+        ids = [row_id for batch in self.manager.iter_batches(['id']) for row_id in batch['id']]
+        self.manager.delete_record(ids[4])
+        first = self.manager.fetch_page(4)
+        self.assertEqual([key for key, record in first], ids[:4])
+        second = self.manager.fetch_page(4, after=first[-1][0])
+        self.assertEqual([key for key, record in second], ids[5:9])
+        self.assertEqual([key for key, record in self.manager.fetch_page(4, before=second[0][0])], ids[:4])
+        self.assertEqual([key for key, record in self.manager.fetch_page(4, after=ids[-1])], [])
+        self.assertEqual([key for key, record in csv_manager.fetch_page(3, after=2)], [3, 4, 5])
+        self.assertEqual([key for key, record in csv_manager.fetch_page(3, before=2)], [0, 1])
+
     def test_demonstrate_polymorphism(self):
         """
         Test the demonstrate_polymorphism method to ensure it displays the correct output.
         """
         self.manager.demonstrate_polymorphism()
 
+class TestSQLiteManager(unittest.TestCase):
+    """
+    Unit tests for the SQLite TrafficManager.
+    """
+
+    def setUp(self):
+        """
+        Set up the test environment with a new database file in a temporary directory.
+        """
+        self.tmpdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmpdir, 'traffic.db')
+        self.manager = sqlite_manager.TrafficManager(self.filename)
+        self.record_data = dict(RECORD_DATA)
+
+    def tearDown(self):
+        """
+        Close the manager and remove the temporary directory.
+        """
+        self.manager.close()
+        shutil.rmtree(self.tmpdir)
+
+    def test_schema_and_wal(self):
+        """
+        Test that the database is in WAL mode and the lookup columns are indexed.
+        """
+        conn = self.manager.conn
+        self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], 'wal')
+        indexes = {row[1] for row in conn.execute("PRAGMA index_list(traffic_volumes)")}
+        self.assertTrue({'idx_section_id', 'idx_date', 'idx_highway_date', 'idx_county'} <= indexes)
+        plan = conn.execute("EXPLAIN QUERY PLAN SELECT * FROM traffic_volumes WHERE county = 'C'").fetchall()
+        self.assertIn('idx_county', str(plan))
+
+    def test_add_edit_delete(self):
+        """
+        Test that single-row writes are stored and visible to a new manager.
+        """
+        self.manager.add_record(self.record_data)
+        row_id = next(self.manager.iter_batches(['id']))['id'][0]
+        self.assertTrue(self.manager.edit_record(row_id, {'adt': 2000.0}))
+        self.assertEqual(sqlite_manager.TrafficManager(self.filename).get_record(row_id).adt, 2000.0)
+        self.assertEqual(self.manager.records[0].adt, 2000.0)
+        self.assertEqual(len(self.manager.find_date_range('2022-12-01', '2023-01-31', highway='H')), 1)
+        self.assertEqual(len(self.manager.find_date_range('2020-01-01', '2020-12-31')), 0)
+        self.assertTrue(self.manager.delete_record(row_id))
+        self.assertIsNone(self.manager.get_record(row_id))
+        self.assertEqual(self.manager.records, [])
+
+    def test_unparsed_date_is_kept(self):
+        """
+        Test that a date that does not parse is stored as its text instead of NULL.
+        """
+        self.manager.add_record(dict(self.record_data, date='7'))
+        self.manager.records[0].section = 'T'
+        self.manager.save_data()
+        self.manager.reload_data()
+        self.assertEqual((self.manager.records[0].date, self.manager.records[0].section), ('7', 'T'))
+        row_id = next(self.manager.iter_batches(['id']))['id'][0]
+        self.assertTrue(self.manager.edit_record(row_id, {'date': '07/13/2023'}))
+        self.assertEqual(self.manager.get_record(row_id).date, '2023-07-13')
+
+    def test_bulk_and_delta_save(self):
+        """
+        Test that save_data writes the records list in bulk and later only its changes,
+        including records changed in place.
+        """
+        records = business.TrafficManager(CSV_FILE).records
+        self.manager.records = records[:2500]
+        self.manager.save_data()
+        self.manager.reload_data()
+        self.assertEqual(len(self.manager.records), 2500)
+        ids = [row_id for batch in self.manager.iter_batches(['id']) for row_id in batch['id']]
+        self.assertEqual(self.manager.rows.changes(self.manager.records), ([], [], []))
+        self.manager.records[0].county = 'NEW'
+        self.assertEqual(self.manager.rows.changes(self.manager.records),
+                         ([], [(self.manager.records[0], ids[0], ['county'])], []))
+        del self.manager.records[1:3]
+        self.manager.records.append(records[-1])
+        self.manager.save_data()
+        rows = {row_id: county for batch in self.manager.iter_batches(['id', 'county'], batch_size=100)
+                for row_id, county in zip(batch['id'], batch['county'])}
+        self.assertEqual(len(rows), 2499)
+        self.assertEqual(rows[ids[0]], 'NEW')
+        self.assertNotIn(ids[1], rows)
+
+    def test_query_push_down(self):
+        """
+        Test that query, count, value_counts and aggregate run in SQLite with the same results
+        as the in-memory filter and aggregate functions, comparing text and dates as Python does.
+        """
+        records = business.TrafficManager(CSV_FILE).records[:1000]
+        self.manager.records = records
+        self.manager.save_data()
+        for expression in ('aadt > 5000 and not county == "HFX"', 'county == "hfx"', 'county in ("hfx", "HFX")',
+                           'county != "hfx"', 'county >= "a"', 'date >= 2020-01-01', 'ptrucks > 10'):
+            self.assertEqual(self.manager.count(expression), len(compile_filter(expression).positions(records)))
+        expected = compile_filter('date < 2015-01-01').positions(records)
+        rows = self.manager.query('date < 2015-01-01', columns=['section_id'])
+        self.assertEqual([row['section_id'] for row in rows], [records[position].section_id for position in expected])
+        top = self.manager.query(order_by='-aadt', limit=3, offset=1)
+        self.assertEqual([record.aadt for record in top],
+                         sorted((float(record.aadt) for record in records if record.aadt != ''), reverse=True)[1:4])
+        counts = self.manager.value_counts('county', where='aadt > 1000', limit=2)
+        self.assertEqual(len(counts), 2)
+        self.assertGreaterEqual(counts[0][1], counts[1][1])
+        rows = self.manager.aggregate(['county'], {'aadt': ['count', 'max']}, where='adt >= 1000')
+        matching = [records[position] for position in compile_filter('adt >= 1000').positions(records)]
+        self.assertEqual(rows, aggregate(matching, ['county'], {'aadt': ['count', 'max']}))
+
+    def test_records_are_loaded_on_first_use(self):
+        """
+        Test that a new manager pages and counts in the database without loading the records list.
+        """
+        self.manager.add_records([dict(self.record_data, section_id=str(number)) for number in range(5)])
+        manager = sqlite_manager.TrafficManager(self.filename)
+        with mock.patch.object(manager, '_stream', wraps=manager._stream) as stream:
+            self.assertEqual(len(manager.fetch_page(2)), 2)
+            self.assertEqual(manager.count(), 5)
+            stream.assert_not_called()
+            self.assertEqual(len(manager.records), 5)
+            self.assertEqual(stream.call_count, 1)
+        manager.close()
+
+    def test_concurrent_workers(self):
+        """
+        Test that several threads can write through their own connections.
+        """
+        def worker(number):
+            self.manager.add_records([dict(self.record_data, section_id=str(number))] * 3)
+            self.manager.release_connection()
+        threads = [threading.Thread(target=worker, args=(number,)) for number in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(self.manager.load_data()), 24)
+
+    def test_in_place_edit_updates_one_column(self):
+        """
+        Test that a record changed in place is saved without being marked, by an UPDATE of the changed column only,
+        and that a later edit_record of another column does not hide the unsaved change.
+        """
+        self.manager.add_records([dict(self.record_data, section_id=str(number)) for number in range(3)])
+        self.manager.records[1].aadt = 1234.0
+        statements = []
+        self.manager.conn.set_trace_callback(statements.append)
+        self.manager.save_data()
+        self.manager.conn.set_trace_callback(None)
+        updates = [statement for statement in statements if statement.startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+        self.assertTrue(updates[0].startswith('UPDATE traffic_volumes SET aadt = '))
+        self.manager.records[2].county = 'KIN'
+        row_id = self.manager.rows.rows[self.manager.records[2]][0]
+        self.assertTrue(self.manager.edit_record(row_id, {'adt': 5.0}))
+        self.manager.save_data()
+        self.manager.reload_data()
+        self.assertEqual([record.aadt for record in self.manager.records], [2000.0, 1234.0, 2000.0])
+        self.assertEqual((self.manager.records[2].county, self.manager.records[2].adt), ('KIN', 5.0))
+
+    def test_exited_thread_connection_is_closed(self):
+        """
+        Test that the connection of a thread that exits without release_connection is closed.
+        """
+        opened = []
+        thread = threading.Thread(target=lambda: opened.append(self.manager.conn))
+        thread.start()
+        thread.join()
+        del thread
+        gc.collect()
+        self.assertNotIn(opened[0], self.manager.connections)
+        with self.assertRaises(sqlite3.ProgrammingError):
+            opened[0].execute("SELECT 1")
+
+    def test_add_record_during_save(self):
+        """
+        Test that a record added while another thread saves is written exactly once.
+        """
+        saver = threading.Thread(target=self.manager.save_data)
+
+        def racing_next_id(conn, cursor):
+            del self.manager._next_id
+            saver.start()
+            saver.join(0.2)
+            return self.manager._next_id(conn, cursor)
+        self.manager._next_id = racing_next_id
+        self.manager.add_record(self.record_data)
+        saver.join()
+        self.assertEqual(len(self.manager.records), 1)
+        self.assertEqual(len(self.manager.load_data()), 1)
+
+class TestBulkWrites(unittest.TestCase):
+    """
+    Unit tests for the batched and LOAD DATA writes of the MySQL TrafficManager, against a mock cursor.
+    """
+
+    def setUp(self):
+        """
+        Set up the test environment with a MySQL TrafficManager whose connection is a mock.
+        """
+        self.module = load_traffic_manager()
+        manager_class = self.module.TrafficManager
+        with mock.patch.object(manager_class, 'connect_to_db', return_value=mock.MagicMock()):
+            self.manager = manager_class('localhost', 'traffic', 'user', 'password', batch_size=2)
+        self.records = [business.TrafficRecord(**dict(RECORD_DATA, section_id=str(number))) for number in range(5)]
+        self.ids = list(range(10, 15))
+
+    def test_rows_are_batched(self):
+        """
+        Test that inserts are sent in executemany calls of batch_size rows, each row led by its id.
+        """
+        cursor = mock.Mock()
+        self.manager._write_rows(cursor, self.records, self.ids)
+        calls = cursor.executemany.call_args_list
+        self.assertEqual([len(call.args[1]) for call in calls], [2, 2, 1])
+        self.assertTrue(calls[0].args[0].startswith("INSERT INTO traffic_volumes (id, section_id,"))
+        self.assertEqual(calls[0].args[1][0][:3], (10, '0', 'H'))
+        self.assertEqual(len(calls[0].args[1][0]), len(RECORD_ATTRIBUTES) + 1)
+
+    def test_load_infile(self):
+        """
+        Test that local_infile loads every row from one temporary file, which is removed afterwards.
+        """
+        loaded = []
+
+        def load(query, params):
+            with open(params[0], encoding='utf-8') as datafile:
+                loaded.append((query, params[0], datafile.read().splitlines()))
+        cursor = mock.Mock()
+        cursor.execute.side_effect = load
+        self.manager.local_infile = True
+        self.manager._write_rows(cursor, self.records, self.ids)
+        query, path, lines = loaded[0]
+        self.assertEqual(query, self.module.LOAD_QUERY)
+        self.assertEqual(len(lines), 5)
+        self.assertTrue(lines[0].startswith('10,0,H,S,1.0,Desc,2023-01-01,'))
+        self.assertFalse(os.path.exists(path))
+        cursor.executemany.assert_not_called()
+
+    def test_load_infile_fallback(self):
+        """
+        Test that a refused LOAD DATA LOCAL INFILE falls back to batched inserts, and that other errors are raised.
+        """
+        cursor = mock.Mock()
+        cursor.execute.side_effect = self.module.Error("Loading local data is disabled", errno=3948)
+        self.manager.local_infile = True
+        with mock.patch('sys.stdout', io.StringIO()):
+            self.manager._write_rows(cursor, self.records, self.ids)
+        self.assertFalse(self.manager.local_infile)
+        self.assertEqual(cursor.executemany.call_count, 3)
+        cursor = mock.Mock()
+        cursor.execute.side_effect = self.module.Error("Table is full", errno=1114)
+        self.manager.local_infile = True
+        with self.assertRaises(self.module.Error):
+            self.manager._write_rows(cursor, self.records, self.ids)
+        cursor.executemany.assert_not_called()
+
+    def test_create_table_adds_missing_indexes(self):
+        """
+        Test that create_table creates only the indexes an existing table lacks.
+        """
+        cursor = self.manager.conn.cursor.return_value
+        cursor.fetchall.return_value = [('PRIMARY',), ('idx_date',), ('idx_county',)]
+        self.manager.create_table()
+        queries = [call.args[0] for call in cursor.execute.call_args_list]
+        self.assertEqual(queries[1], self.module.INDEX_QUERY)
+        self.assertEqual(queries[2:], ["CREATE INDEX idx_section_id ON traffic_volumes (section_id)",
+                                       "CREATE INDEX idx_highway_date ON traffic_volumes (highway, date)"])
+
+    def test_next_id_closes_cursor(self):
+        """
+        Test that the cursor that reads the next id is closed, also when the query fails.
+        """
+        conn = mock.Mock()
+        lookup = conn.cursor.return_value
+        lookup.fetchone.return_value = (42,)
+        self.assertEqual(self.manager._next_id(conn, None), 42)
+        lookup.close.assert_called_once()
+        lookup.reset_mock()
+        lookup.execute.side_effect = self.module.Error("Lock wait timeout exceeded", errno=1205)
+        with self.assertRaises(self.module.Error):
+            self.manager._next_id(conn, None)
+        lookup.close.assert_called_once()
+
+class TestConnectionPool(unittest.TestCase):
+    """
+    Unit tests for the ConnectionPool class, using mock connections.
+    """
+
+    def setUp(self):
+        """
+        Set up a pool whose connections are mocks.
+        """
+        self.connect = mock.Mock(side_effect=lambda: mock.Mock())
+        self.pool = ConnectionPool(self.connect, size=2, timeout=0.1, backoff=0)
+
+    def test_thread_keeps_its_connection(self):
+        """
+        Test that a thread gets the same connection until it releases it, and that it is reused after.
+        """
+        conn = self.pool.connection()
+        self.assertIs(self.pool.connection(), conn)
+        other = []
+        thread = threading.Thread(target=lambda: other.append(self.pool.connection()))
+        thread.start()
+        thread.join()
+        self.assertIsNot(other[0], conn)
+        self.pool.release()
+        self.assertIs(self.pool.connection(), conn)
+        self.assertEqual(self.connect.call_count, 2)
+
+    def test_pool_is_bounded(self):
+        """
+        Test that a thread cannot check out more connections than the pool size.
+        """
+        self.pool.connection()
+        held = threading.Event()
+        done = threading.Event()
+
+        def hold():
+            self.pool.connection()
+            held.set()
+            done.wait()
+        thread = threading.Thread(target=hold)
+        thread.start()
+        held.wait()
+        errors = []
+        waiter = threading.Thread(target=lambda: errors.append(self._checkout_error()))
+        waiter.start()
+        waiter.join()
+        done.set()
+        thread.join()
+        self.assertIsInstance(errors[0], PoolError)
+
+    def _checkout_error(self):
+        """
+        Return the error raised when checking out a connection, or None.
+        """
+        try:
+            self.pool.connection()
+        except Exception as e:
+            return e
+        return None
+
+    def test_reconnect_with_backoff(self):
+        """
+        Test that failed connection attempts are retried and a lost connection is replaced.
+        """
+        self.connect.side_effect = [Error("down"), Error("down"), mock.Mock(), mock.Mock()]
+        with mock.patch('connection_pool.time.sleep') as sleep:
+            conn = self.pool.connection()
+        self.assertEqual(self.connect.call_count, 3)
+        self.assertEqual(sleep.call_count, 2)
+        conn.ping.side_effect = Error("lost")
+        self.pool.check_interval = -1
+        self.assertIsNot(self.pool.connection(), conn)
+        conn.close.assert_called_once()
+
+class TestColumnarStore(CsvFileTestCase):
+    """
+    Unit tests for the columnar storage mode of the CSV TrafficManager.
+    """
+
+    def setUp(self):
+        """
+        Set up the test environment with a manager over a copy of the CSV file.
+        """
+        super().setUp()
+        self.manager = business.TrafficManager(self.filename, columnar=True)
+
+    def test_matches_object_records(self):
+        """
+        Test that the columnar store returns the same records as the list of objects.
+        """
+        objects = business.TrafficManager(self.filename)
+        self.assertEqual(len(self.manager.records), len(objects.records))
+        for index in (0, 1234, len(objects.records) - 1):
+            self.assertEqual(self.manager.get_record(index).display(), objects.get_record(index).display())
+
+    def test_add_edit_delete(self):
+        """
+        Test that add_record, edit_record and delete_record work on the columnar store.
+        """
+        count = len(self.manager.records)
+        self.manager.add_record(self.record_data)
+        self.assertEqual(self.manager.get_record(count).section_id, '9999')
+        self.assertTrue(self.manager.edit_record(count, {'aadt': 2500.0, 'county': 'HFX'}))
+        objects = business.TrafficManager(self.filename)
+        objects.add_record(self.record_data)
+        objects.edit_record(count, {'aadt': 2500.0, 'county': 'HFX'})
+        self.assertEqual(self.manager.get_record(count).display(), objects.get_record(count).display())
+        self.assertEqual(self.manager.get_record(count).aadt, 2500.0)
+        self.assertEqual(self.manager.get_record(count).county, 'HFX')
+        with self.assertRaises(AttributeError):
+            self.manager.get_record(count).aadt = 1.0
+        self.assertTrue(self.manager.delete_record(count))
+        self.assertEqual(len(self.manager.records), count)
+
+    def test_records_are_slotted(self):
+        """
+        Test that the record objects of both storage modes have no per-instance __dict__.
+        """
+        objects = business.TrafficManager(self.filename)
+        for record in (objects.get_record(0), self.manager.get_record(0)):
+            self.assertFalse(hasattr(record, '__dict__'))
+        with self.assertRaises(AttributeError):
+            objects.get_record(0).extra = 1
+
+    def test_deletes_are_batched(self):
+        """
+        Test that deleted rows are skipped at once and removed from the columns in one pass later.
+        """
+        objects = business.TrafficManager(self.filename).records
+        store = self.manager.records
+        store.update_row(7, {'aadt': '4.50'})
+        objects[7].aadt = '4.50'
+        for index in (0, 5, 6, 100, -1):
+            del store[index]
+            del objects[index]
+        store.append_row(['1', 'X'] + [''] * 10 + ['P'])
+        objects.append(business.TrafficRecord('1', 'X', *([''] * 10), 'P', '', '', ''))
+        self.assertEqual(len(store._deleted), 5)
+        self.assertEqual([record.display() for record in store[:200]], [record.display() for record in objects[:200]])
+        self.assertEqual(store[-1].display(), objects[-1].display())
+        self.assertEqual(store.get_attribute(5, 'aadt'), '4.50')
+        self.assertEqual(len(store.column('adt')), len(objects))
+        self.assertEqual(store._deleted, [])
+        self.assertEqual([record.display() for record in store], [record.display() for record in objects])
+
+    def test_numeric_text_is_kept(self):
+        """
+        Test that numeric values the store cannot hold as numbers keep their text through deletes,
+        rendering and snapshots, and count as blank in aggregates.
+        """
+        count = len(self.manager.records)
+        self.manager.add_record(dict(self.record_data, ptrucks='P', aadt='4.50'))
+        self.manager.records.append_row(['1', 'X'])
+        self.assertTrue(self.manager.delete_record(0))
+        record = self.manager.get_record(count - 1)
+        self.assertEqual((record.ptrucks, record.aadt), ('P', '4.50'))
+        self.assertEqual(self.manager.get_record(count).highway, 'X')
+        self.assertEqual(len(self.manager.records.columns['adt']), count + 1)
+        output = io.StringIO()
+        RecordRenderer('csv').write(self.manager.records, output)
+        self.assertIn(',P,', output.getvalue())
+        snapshot_cache.write_snapshot(self.manager.records, self.filename)
+        restored = snapshot_cache.read_snapshot(self.filename)[count - 1]
+        self.assertEqual((restored.ptrucks, restored.aadt), ('P', '4.50'))
+        self.assertTrue(self.manager.edit_record(count - 1, {'aadt': '7'}))
+        self.assertEqual(self.manager.records.raw['aadt'], {})
+        rows = aggregate(self.manager.records, ['ptrucks'], {'aadt': ['count']})
+        self.assertIn({'ptrucks': 'P', 'rows': 1, 'aadt_count': 1}, rows)
+        self.assertEqual(rows, aggregate(list(self.manager.records), ['ptrucks'], {'aadt': ['count']}))
+
+    def test_save_round_trip(self):
+        """
+        Test that saving the columnar store and reloading it keeps every record.
+        """
+        before = [record.display() for record in self.manager.records[:50]]
+        self.manager.save_data()
+        self.manager.reload_data()
+        self.assertEqual([record.display() for record in self.manager.records[:50]], before)
+
+class TestStreaming(CsvFileTestCase):
+    """
+    Unit tests for the streaming read and save path of the CSV TrafficManager.
+    """
+
+    def setUp(self):
+        """
+        Set up the test environment with a manager over a copy of the CSV file.
+        """
+        super().setUp()
+        self.manager = business.TrafficManager(self.filename)
+
+    def test_iter_records_chunks(self):
+        """
+        Test that iter_records yields every record in chunks of the requested size.
+        """
+        chunks = list(self.manager.iter_records(chunk_size=1000))
+        self.assertTrue(all(len(chunk) <= 1000 for chunk in chunks))
+        self.assertEqual(sum(len(chunk) for chunk in chunks), len(self.manager.records))
+        self.assertEqual(chunks[0][0].display(), self.manager.records[0].display())
+
+    def test_aggregate_streamed_file(self):
+        """
+        Test that aggregating a streamed file in chunks gives the same groups as aggregating the loaded records.
+        """
+        metrics = {'aadt': ['count', 'sum', 'mean', 'min', 'max'], 'adt': ['max']}
+        expected = self.manager.aggregate(['county'], metrics)
+        with mock.patch.object(business, 'STREAM_CHUNK_SIZE', 1000):
+            streamed = self.manager.aggregate(['county'], metrics, filename=self.filename)
+        self.assertEqual(len(streamed), len(expected))
+        for row, wanted in zip(streamed, expected):
+            self.assertEqual(row.keys(), wanted.keys())
+            for name, value in wanted.items():
+                if isinstance(value, float):
+                    self.assertTrue(value != value and row[name] != row[name] or abs(row[name] - value) <= 1e-6 * abs(value))
+                else:
+                    self.assertEqual(row[name], value)
+
+    def test_save_streamed_records(self):
+        """
+        Test that save_data can consume a filtered stream read from the same file.
+        """
+        expected = [record.display() for record in self.manager.records if record.county == 'HFX']
+        self.manager.save_data(record for record in self.manager.iter_records() if record.county == 'HFX')
+        self.manager.reload_data()
+        self.assertEqual([record.display() for record in self.manager.records], expected)
+
+class TestParallelLoader(unittest.TestCase):
+    """
+    Unit tests for the multi-process CSV loader.
+    """
+
+    def test_matches_serial_load(self):
+        """
+        Test that a parallel load returns the same records in the same order as a serial load,
+        including rows whose quoted fields contain newlines.
+        """
+        serial = business.TrafficManager(CSV_FILE)
+        with mock.patch.object(parallel_loader, 'MIN_CHUNK_BYTES', 64 * 1024):
+            parallel = business.TrafficManager(CSV_FILE, workers=4)
+        self.assertEqual(len(parallel.records), len(serial.records))
+        self.assertTrue(any('\n' in record.description for record in parallel.records))
+        for expected, actual in zip(serial.records, parallel.records):
+            self.assertEqual(actual.display(), expected.display())
+
+    def test_ranges_split_on_row_boundaries(self):
+        """
+        Test that no byte range starts inside a quoted field.
+        """
+        with mock.patch.object(parallel_loader, 'MIN_CHUNK_BYTES', 1024):
+            header_end, ranges = parallel_loader.split_ranges(CSV_FILE, 64)
+        with open(CSV_FILE, 'rb') as csvfile:
+            data = csvfile.read()
+        self.assertEqual(ranges[0][0], header_end)
+        self.assertEqual(ranges[-1][1], len(data))
+        for start, _ in ranges:
+            self.assertEqual(data[:start].count(b'"') % 2, 0)
+            self.assertEqual(data[start - 1:start], b'\n')
+
+    def test_ranges_in_flight_are_bounded(self):
+        """
+        Test that only a few ranges per worker are submitted ahead of the rows being read,
+        and that every worker decodes with the encoding the serial reader uses.
+        """
+        submitted = []
+
+        class Executor:
+            def __init__(self, max_workers):
+                pass
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc_info):
+                pass
+
+            def submit(self, function, *args):
+                submitted.append(args)
+                future = Future()
+                future.set_result(function(*args))
+                return future
+        with mock.patch.object(parallel_loader, 'MIN_CHUNK_BYTES', 1024), \
+                mock.patch.object(parallel_loader, 'ProcessPoolExecutor', Executor):
+            header_end, ranges = parallel_loader.split_ranges(CSV_FILE, 64)
+            rows = parallel_loader.parse_ranges(CSV_FILE, ranges,
+                                                parallel_loader.column_positions(CSV_FILE, header_end), workers=2)
+            next(rows)
+            self.assertEqual(len(submitted), 2 * parallel_loader.RANGES_PER_WORKER + 1)
+            self.assertEqual(len(list(rows)) + 1, len(business.TrafficManager(CSV_FILE).records))
+        self.assertEqual(len(submitted), len(ranges))
+        self.assertTrue(all(args[-1] == locale.getpreferredencoding(False) for args in submitted))
+
+class TestMappedCsv(unittest.TestCase):
+    """
+    Unit tests for the memory-mapped CSV reader.
+    """
+
+    def test_views_match_records(self):
+        """
+        Test that record views decode the same values as the CSV TrafficManager.
+        """
+        records = business.TrafficManager(CSV_FILE).records
+        with MappedCsv(CSV_FILE) as mapped:
+            first = mapped[:5]
+            self.assertEqual(len(mapped._starts), 5)
+            self.assertEqual([view.display() for view in first], [record.display() for record in records[:5]])
+            self.assertEqual(len(mapped), len(records))
+            for expected, view in zip(records, mapped):
+                self.assertEqual(view.display(), expected.display())
+            self.assertEqual(mapped[0].number('aadt'), float(records[0].aadt))
+
+    def test_encoding(self):
+        """
+        Test that record views decode with the encoding the serial CSV reader uses.
+        """
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, 'latin.csv')
+            with open(filename, 'w', newline='', encoding='latin-1') as csvfile:
+                writer = csv.writer(csvfile)
+                writer.writerow(CSV_FIELDNAMES)
+                writer.writerow(['1', '102', '', '', 'Côte', '2023-01-01', 'Chéticamp'] + [''] * 9)
+            with mock.patch('locale.getpreferredencoding', return_value='latin-1'), MappedCsv(filename) as mapped:
+                self.assertEqual(mapped[0].description, 'Chéticamp')
+                self.assertEqual(mapped[0].section_description, 'Côte')
+
+    def test_display_records_pages(self):
+        """
+        Test that display_records pages through a MappedCsv, which has no fetch_page method.
+        """
+        records = business.TrafficManager(CSV_FILE).records
+        output = io.StringIO()
+        with MappedCsv(CSV_FILE) as mapped, mock.patch('builtins.input', side_effect=['n', 'p', 'q']), \
+                mock.patch('sys.stdout', output):
+            presentation.display_records(mapped, 2)
+            self.assertLess(len(mapped._starts), 10)
+        lines = output.getvalue().splitlines()
+        self.assertEqual(len(lines), 6)
+        self.assertIn(f"SECTION ID: {records[2].section_id}", lines[2])
+        self.assertEqual(lines[4], lines[0])
+
+class TestSnapshotCache(CsvFileTestCase):
+    """
+    Unit tests for the binary snapshot cache of the CSV TrafficManager.
+    """
+
+    def test_reload_uses_snapshot(self):
+        """
+        Test that reload_data reads the snapshot instead of parsing an unchanged file.
+        """
+        manager = business.TrafficManager(self.filename, columnar=True, cache=True)
+        self.assertTrue(os.path.exists(snapshot_cache.snapshot_path(self.filename)))
+        expected = [record.display() for record in manager.records]
+        with mock.patch.object(manager, 'load_columnar') as load_columnar:
+            manager.reload_data()
+            load_columnar.assert_not_called()
+        self.assertEqual([record.display() for record in manager.records], expected)
+
+    def test_stale_snapshot_is_rebuilt(self):
+        """
+        Test that a changed CSV file is parsed again and its snapshot replaced.
+        """
+        manager = business.TrafficManager(self.filename, cache=True)
+        count = len(manager.records)
+        with open(self.filename, 'a', newline='') as csvfile:
+            csvfile.write('1,1,1,1,NEW,01/01/2024,NEW,A,TC,HFX,,100,100,,,\n')
+        manager.reload_data()
+        self.assertEqual(len(manager.records), count + 1)
+        self.assertIsNotNone(snapshot_cache.read_snapshot(self.filename))
+
+    def test_short_column_is_rejected(self):
+        """
+        Test that a snapshot whose columns do not all hold the number of rows in its header is ignored.
+        """
+        store = business.TrafficManager(self.filename, columnar=True).records
+        store.columns['adt'].pop()
+        snapshot_cache.write_snapshot(store, self.filename)
+        with mock.patch('sys.stdout', io.StringIO()) as output:
+            self.assertIsNone(snapshot_cache.read_snapshot(self.filename))
+        self.assertIn("column adt has", output.getvalue())
+
+class TestIncrementalReload(CsvFileTestCase):
+    """
+    Unit tests for the incremental tail reload of the CSV TrafficManager.
+    """
+
+    def setUp(self):
+        """
+        Set up the test environment with a manager over a copy of the CSV file.
+        """
+        super().setUp()
+        self.manager = business.TrafficManager(self.filename, incremental=True)
+
+    def test_reload_reads_appended_rows(self):
+        """
+        Test that reload_data parses only complete appended rows and keeps earlier records.
+        """
+        count = len(self.manager.records)
+        first = self.manager.records[0]
+        with open(self.filename, 'a', newline='') as csvfile:
+            csvfile.write('1,1,1,1,NEW,01/01/2024,"TWO\nLINES",A,TC,HFX,,100,100,,,\n2,2,2,')
+        with mock.patch.object(self.manager, 'load_data') as load_data:
+            self.manager.reload_data()
+            load_data.assert_not_called()
+        self.assertIs(self.manager.records[0], first)
+        self.assertEqual(len(self.manager.records), count + 1)
+        self.assertEqual(self.manager.records[-1].description, 'TWO\nLINES')
+
+    def test_rewritten_file_reloads_in_full(self):
+        """
+        Test that a change to the loaded part of the file triggers a full reload.
+        """
+        self.manager.edit_record(0, {'county': 'XYZ'})
+        self.manager.save_data()
+        self.manager.reload_data()
+        self.assertEqual(self.manager.records[0].county, 'XYZ')
+        self.assertEqual(len(self.manager.records), len(business.TrafficManager(self.filename).records))
+
+    def test_replaced_file_reloads_in_full(self):
+        """
+        Test that a file replaced by another writer, with an early edit and an appended record, is reloaded in full.
+        """
+        other = business.TrafficManager(self.filename)
+        other.edit_record(5, {'county': 'KIN'})
+        other.add_record(self.record_data)
+        other.save_data()
+        self.manager.reload_data()
+        self.assertEqual(self.manager.records[5].county, 'KIN')
+        self.assertEqual(len(self.manager.records), len(other.records))
+
+class TestIncrementalSave(CsvFileTestCase):
+    """
+    Unit tests for the dirty-tracked save of the CSV TrafficManager.
+    """
+
+    def setUp(self):
+        """
+        Set up the test environment with a manager over a copy of the CSV file.
+        """
+        super().setUp()
+        self.manager = business.TrafficManager(self.filename)
+
+    def test_append_only_save(self):
+        """
+        Test that saving new records only appends them and keeps the old bytes.
+        """
+        with open(self.filename, 'rb') as csvfile:
+            before = csvfile.read()
+        self.manager.add_record(self.record_data)
+        self.manager.save_data()
+        with open(self.filename, 'rb') as csvfile:
+            after = csvfile.read()
+        self.assertTrue(after.startswith(before))
+        self.assertEqual(after[len(before):], b'9999,H,S,1.0,Desc,2023-01-01,Desc,G,T,C,5,1000.0,2000.0,D,85,7\n')
+
+    def test_mixed_changes_save(self):
+        """
+        Test that edits, deletions and additions are all written by the incremental rewrite.
+        """
+        self.manager.edit_record(3, {'county': 'XYZ'})
+        self.manager.delete_record(0)
+        self.manager.add_record(self.record_data)
+        expected = [record.display() for record in self.manager.records]
+        self.manager.save_data()
+        self.assertFalse(os.path.exists(self.filename + '.tmp'))
+        self.assertEqual([record.display() for record in business.TrafficManager(self.filename).records], expected)
+
+    def test_in_place_edits_are_saved(self):
+        """
+        Test that records changed in place, without edit_record, are written by the incremental save,
+        including when the only other change is an appended record.
+        """
+        self.manager.get_record(2).county = 'XYZ'
+        self.manager.records[7].aadt = '4321'
+        self.manager.add_record(self.record_data)
+        self.manager.save_data()
+        records = business.TrafficManager(self.filename).records
+        self.assertEqual(records[2].county, 'XYZ')
+        self.assertEqual(records[7].aadt, '4321')
+        self.assertEqual(len(records), len(self.manager.records))
+        self.manager.records[2].county = 'ABC'
+        self.manager.save_data()
+        self.assertEqual(business.TrafficManager(self.filename).records[2].county, 'ABC')
+
+class TestJournal(CsvFileTestCase):
+    """
+    Unit tests for the write-ahead journal of the CSV TrafficManager.
+    """
+
+    def test_unsaved_changes_are_replayed(self):
+        """
+        Test that changes logged to the journal are applied again by a new manager.
+        """
+        manager = business.TrafficManager(self.filename, journal=True)
+        manager.add_record(self.record_data)
+        manager.edit_record(0, {'county': 'XYZ'})
+        manager.delete_record(1)
+        expected = [record.display() for record in manager.records]
+        manager.journal.close()
+        restarted = business.TrafficManager(self.filename, journal=True)
+        self.assertEqual([record.display() for record in restarted.records], expected)
+
+    def test_failed_changes_are_not_replayed(self):
+        """
+        Test that an edit that fails is not journaled, and that journal entries that can no longer
+        be applied are set aside instead of stopping the next load.
+        """
+        manager = business.TrafficManager(self.filename, journal=True)
+        county = manager.records[0].county
+        with self.assertRaises(AttributeError):
+            manager.edit_record(0, {'county': 'XYZ', 'bogus': 1})
+        self.assertEqual(manager.records[0].county, county)
+        manager.journal.append(['edit', 10 ** 9, {'county': 'XYZ'}])
+        manager.journal.append(['edit', 0, {'bogus': 1}])
+        manager.edit_record(1, {'county': 'XYZ'})
+        manager.journal.close()
+        restarted = business.TrafficManager(self.filename, journal=True)
+        self.assertEqual(restarted.records[0].county, county)
+        self.assertEqual(restarted.records[1].county, 'XYZ')
+        with open(restarted.journal.path + '.rejected', encoding='utf-8') as rejected:
+            self.assertEqual(len(rejected.readlines()), 2)
+        restarted.journal.close()
+        self.assertEqual(business.TrafficManager(self.filename, journal=True).records[1].county, 'XYZ')
+
+    def test_appended_file_keeps_journal(self):
+        """
+        Test that rows appended to the file by another writer do not invalidate the journal,
+        and that they are folded in after the journaled changes on reload and restart.
+        """
+        manager = business.TrafficManager(self.filename, journal=True, incremental=True)
+        count = len(manager.records)
+        manager.edit_record(0, {'county': 'ZZZ'})
+        manager.add_record(self.record_data)
+        with open(self.filename, 'a', newline='') as csvfile:
+            csvfile.write('1,1,1,1,NEW,01/01/2024,NEW,A,TC,HFX,,100,100,,,\n')
+        manager.reload_data()
+        self.assertEqual(manager.records[0].county, 'ZZZ')
+        self.assertEqual([record.section_description for record in manager.records[count:]], ['Desc', 'NEW'])
+        manager.edit_record(count + 1, {'county': 'YYY'})
+        expected = [record.display() for record in manager.records]
+        manager.journal.close()
+        restarted = business.TrafficManager(self.filename, journal=True, incremental=True)
+        self.assertEqual([record.display() for record in restarted.records], expected)
+        restarted.save_data()
+        self.assertEqual([record.display() for record in business.TrafficManager(self.filename).records], expected)
+
+    def test_saved_journal_is_not_replayed(self):
+        """
+        Test that a journal whose changes reached the file before a crash is not applied a second time.
+        """
+        manager = business.TrafficManager(self.filename, journal=True)
+        manager.add_record(self.record_data)
+        expected = len(manager.records)
+        with mock.patch.object(manager.journal, 'reset', side_effect=OSError("crash")):
+            with self.assertRaises(OSError):
+                manager.save_data()
+        manager.journal.close()
+        self.assertEqual(len(business.TrafficManager(self.filename, journal=True).records), expected)
+
+    def test_compaction_folds_journal(self):
+        """
+        Test that a journal past its size threshold is saved into the CSV file and emptied.
+        """
+        manager = business.TrafficManager(self.filename, journal=True, compact_bytes=1000)
+        for _ in range(20):
+            manager.add_record(self.record_data)
+        manager._compactor.join()
+        manager.compact()
+        self.assertEqual(manager.journal.read(), [])
+        self.assertEqual(manager.journal.rows, len(manager.records))
+        self.assertEqual(len(business.TrafficManager(self.filename).records), len(manager.records))
+
+class TestRecordIndex(CsvFileTestCase):
+    """
+    Unit tests for the hash index lookups of the CSV TrafficManager.
+    """
+
+    def setUp(self):
+        """
+        Set up the test environment with a manager over a copy of the CSV file.
+        """
+        super().setUp()
+        self.manager = business.TrafficManager(self.filename)
+
+    def scan(self, **criteria):
+        """
+        Return the indexes of the matching records found by a full scan.
+        """
+        return [index for index, record in enumerate(self.manager.records)
+                if all(getattr(record, name) == value for name, value in criteria.items())]
+
+    def test_find_by_matches_scan(self):
+        """
+        Test that indexed lookups return the same records as a full scan.
+        """
+        self.assertEqual(self.manager.find_indexes(county='HFX', highway='102'), self.scan(county='HFX', highway='102'))
+        self.assertEqual(self.manager.find_indexes(section_id='1047'), self.scan(section_id='1047'))
+        self.assertEqual(self.manager.find_indexes(direction='N', aadt='300'), self.scan(direction='N', aadt='300'))
+        self.assertTrue(all(record.section_id == '1047' for record in self.manager.find_by(section_id='1047')))
+
+    def test_index_follows_changes(self):
+        """
+        Test that lookups stay correct after add_record, edit_record, delete_record and reload_data.
+        """
+        self.manager.find_by(county='HFX')
+        self.manager.edit_record(0, {'county': 'NEW'})
+        self.assertEqual(self.manager.find_indexes(county='NEW'), [0])
+        self.manager.add_record(dict(self.record_data, county='NEW'))
+        self.assertEqual(self.manager.find_indexes(county='NEW'), [0, len(self.manager.records) - 1])
+        self.manager.delete_record(0)
+        self.assertEqual(self.manager.find_indexes(county='NEW'), [len(self.manager.records) - 1])
+        self.assertEqual(self.manager.find_indexes(county='HFX'), self.scan(county='HFX'))
+        self.manager.reload_data()
+        self.assertEqual(self.manager.find_indexes(county='NEW'), [])
+
+    def test_delete_updates_index(self):
+        """
+        Test that deletions move the indexed positions down instead of forcing a rebuild.
+        """
+        self.manager.find_by(county='HFX')
+        for index in (3, 0, 500, len(self.manager.records) - 1):
+            self.manager.delete_record(index)
+        self.assertFalse(self.manager.index.stale)
+        with mock.patch.object(self.manager.index, 'build') as build:
+            self.assertEqual(self.manager.find_indexes(county='HFX'), self.scan(county='HFX'))
+            self.assertEqual(self.manager.find_indexes(section_id='1047'), self.scan(section_id='1047'))
+            build.assert_not_called()
+
+class TestDateIndex(unittest.TestCase):
+    """
+    Unit tests for the date range queries of the CSV TrafficManager.
+    """
+
+    def setUp(self):
+        """
+        Set up the test environment by loading the CSV file.
+        """
+        self.manager = business.TrafficManager(CSV_FILE)
+
+    def scan(self, start, end, highway=None):
+        """
+        Return the displays of the matching records found by a full scan.
+        """
+        first, last = parse_date(start), parse_date(end)
+        return sorted(record.display() for record in self.manager.records
+                      if parse_date(record.date) is not None and first <= parse_date(record.date) <= last
+                      and highway in (None, record.highway))
+
+    def test_parse_date_formats(self):
+        """
+        Test that the date formats found in the data parse to the same ordinal.
+        """
+        self.assertEqual(parse_date('07/13/2023'), parse_date('2023-07-13'))
+        self.assertEqual(parse_date('11/05/07'), parse_date('2007-11-05'))
+        self.assertIsNone(parse_date('not a date'))
+
+    def test_range_matches_scan(self):
+        """
+        Test that range queries, with and without a highway, match a full scan.
+        """
+        records = self.manager.find_date_range('2019-01-01', '2022-12-31')
+        self.assertEqual(sorted(record.display() for record in records), self.scan('2019-01-01', '2022-12-31'))
+        dates = [parse_date(record.date) for record in records]
+        self.assertEqual(dates, sorted(dates))
+        records = self.manager.find_date_range('01/01/2010', '12/31/2015', highway='102')
+        self.assertEqual(sorted(record.display() for record in records), self.scan('2010-01-01', '2015-12-31', '102'))
+
+    def test_index_follows_changes(self):
+        """
+        Test that additions, edits and deletions keep the date index in step without rebuilding it.
+        """
+        self.manager.find_date_range('2019-01-01', '2022-12-31')
+        with mock.patch.object(self.manager.dates, 'build') as build:
+            for day in range(1, 6):
+                self.manager.add_record(dict(RECORD_DATA, date=f'2020-06-0{day}'))
+            self.manager.edit_record(0, {'date': '2021-01-01'})
+            self.manager.delete_record(1)
+            self.manager.delete_record(len(self.manager.records) - 2)
+            records = self.manager.find_date_range('2019-01-01', '2022-12-31')
+            build.assert_not_called()
+        self.assertEqual(sorted(record.display() for record in records), self.scan('2019-01-01', '2022-12-31'))
+        self.assertEqual(len(self.manager.dates.ordinals), len(self.manager.records))
+
+    def test_batched_changes(self):
+        """
+        Test that runs of deletions are applied together, and that large batches of additions are merged.
+        """
+        self.manager.find_date_range('2019-01-01', '2022-12-31')
+        for index in (10, 10, 3, 4000, 9000, 0):
+            self.manager.delete_record(index)
+        self.assertEqual(len(self.manager.dates.removed), 6)
+        for number in range(100):
+            self.manager.add_record(dict(RECORD_DATA, date=f'2020-06-{number % 28 + 1:02d}'))
+        self.assertEqual(self.manager.dates.removed, [])
+        self.manager.delete_record(5)
+        self.manager.delete_record(len(self.manager.records) - 1)
+        records = self.manager.find_date_range('2019-01-01', '2022-12-31')
+        self.assertEqual(sorted(record.display() for record in records), self.scan('2019-01-01', '2022-12-31'))
+        keys = self.manager.dates.keys
+        self.assertEqual(list(keys), sorted(keys))
+
+class TestAggregation(unittest.TestCase):
+    """
+    Unit tests for the group-by aggregation of the CSV TrafficManager.
+    """
+
+    def setUp(self):
+        """
+        Set up the test environment by loading the CSV file.
+        """
+        self.manager = business.TrafficManager(CSV_FILE)
+
+    def check(self, manager):
+        """
+        Compare the per-county AADT aggregates with a plain loop over the records.
+        """
+        expected = {}
+        for record in self.manager.records:
+            if record.aadt != '':
+                expected.setdefault(record.county, []).append(float(record.aadt))
+        rows = manager.aggregate(['county'], {'aadt': ['count', 'sum', 'mean', 'max']})
+        self.assertEqual([row['county'] for row in rows], sorted({record.county for record in self.manager.records}))
+        for row in rows:
+            values = expected.get(row['county'], [])
+            self.assertEqual(row['aadt_count'], len(values))
+            if values:
+                self.assertAlmostEqual(row['aadt_sum'], sum(values), places=4)
+                self.assertAlmostEqual(row['aadt_mean'], sum(values) / len(values), places=4)
+                self.assertEqual(row['aadt_max'], max(values))
+
+    def test_aggregate_records(self):
+        """
+        Test aggregation over a list of record objects.
+        """
+        self.check(self.manager)
+
+    def test_aggregate_columnar(self):
+        """
+        Test aggregation over a ColumnarStore, grouped by two attributes.
+        """
+        self.check(business.TrafficManager(CSV_FILE, columnar=True))
+        rows = self.manager.aggregate(['highway', 'direction'], {'adt': 'sum'})
+        self.assertEqual(sum(row['rows'] for row in rows), len(self.manager.records))
+
+    def test_blank_and_many_keys(self):
+        """
+        Test that None group values sort last, and that grouping by every attribute,
+        whose combinations outnumber a 64-bit code, still finds each distinct key.
+        """
+        records = self.manager.records[:3000]
+        records[0].county = None
+        rows = aggregate(records, ['county'], {'aadt': 'count'})
+        self.assertIsNone(rows[-1]['county'])
+        rows = aggregate(records, RECORD_ATTRIBUTES, {'aadt': 'count'})
+        keys = {tuple(getattr(record, name) for name in RECORD_ATTRIBUTES) for record in records}
+        self.assertEqual({tuple(row[name] for name in RECORD_ATTRIBUTES) for row in rows}, keys)
+        self.assertEqual(sum(row['rows'] for row in rows), len(records))
+
+    def test_unknown_function(self):
+        """
+        Test that an unknown aggregate function raises a ValueError.
+        """
+        with self.assertRaises(ValueError):
+            self.manager.aggregate(['county'], {'aadt': ['median']})
+
+class TestFilterExpression(unittest.TestCase):
+    """
+    Unit tests for the filter expressions of the CSV TrafficManager.
+    """
+
+    def setUp(self):
+        """
+        Set up the test environment by loading the CSV file.
+        """
+        self.manager = business.TrafficManager(CSV_FILE)
+
+    def scan(self, manager, predicate):
+        """
+        Return the indexes of the records accepted by a predicate.
+        """
+        return [index for index, record in enumerate(manager.records) if predicate(record)]
+
+    def check(self, manager):
+        """
+        Compare compiled filters with the same conditions written as Python predicates.
+        """
+        since = parse_date('2020-01-01')
+        self.assertEqual(
+            manager.query_indexes('aadt > 5000 and county == "HFX" and date >= 2020-01-01'),
+            self.scan(manager, lambda record: record.aadt != '' and float(record.aadt) > 5000
+                      and record.county == 'HFX' and (parse_date(record.date) or 0) >= since))
+        self.assertEqual(
+            manager.query_indexes("highway in (102, 103) and not (direction == 'N' or type == TC)"),
+            self.scan(manager, lambda record: record.highway in ('102', '103')
+                      and not (record.direction == 'N' or record.type_ == 'TC')))
+
+    def test_query_records(self):
+        """
+        Test filters over a list of record objects.
+        """
+        self.check(self.manager)
+        self.assertTrue(all(record.county == 'HFX' for record in self.manager.query('county == HFX')))
+
+    def test_query_columnar(self):
+        """
+        Test filters over a ColumnarStore.
+        """
+        self.check(business.TrafficManager(CSV_FILE, columnar=True))
+
+    def test_compiled_filters_are_cached(self):
+        """
+        Test that the same expression text is compiled only once.
+        """
+        self.assertIs(compile_filter('aadt >= 100'), compile_filter('aadt >= 100'))
+
+    def test_invalid_expressions(self):
+        """
+        Test that invalid expressions raise a ValueError.
+        """
+        for expression in ('aadt >', 'speed == 1', 'aadt > high', 'date > 2020-13-45', '(aadt > 1', 'aadt ~ 2'):
+            with self.assertRaises(ValueError):
+                self.manager.query(expression)
+
+class TestRanking(unittest.TestCase):
+    """
+    Unit tests for the top_k and bottom_k queries of the CSV TrafficManager.
+    """
+
+    def setUp(self):
+        """
+        Set up the test environment by loading the CSV file.
+        """
+        self.manager = business.TrafficManager(CSV_FILE)
+
+    def expected(self, column, k, largest, county=None):
+        """
+        Return the displays of the k best records found by a full sort.
+        """
+        ranked = [(float(getattr(record, column)), index) for index, record in enumerate(self.manager.records)
+                  if getattr(record, column) != '' and county in (None, record.county)]
+        ranked.sort(key=lambda item: (-item[0] if largest else item[0], item[1]))
+        return [self.manager.records[index].display() for value, index in ranked[:k]]
+
+    def test_top_and_bottom_k(self):
+        """
+        Test that top_k and bottom_k match a full sort, including ties, for loaded and columnar records.
+        """
+        columnar = business.TrafficManager(CSV_FILE, columnar=True)
+        for manager in (self.manager, columnar):
+            self.assertEqual([record.display() for record in manager.top_k('aadt', 50)], self.expected('aadt', 50, True))
+            self.assertEqual([record.display() for record in manager.bottom_k('ptrucks', 20)],
+                             self.expected('ptrucks', 20, False))
+            self.assertEqual([record.display() for record in manager.top_k('adt', 10, where='county == HFX')],
+                             self.expected('adt', 10, True, 'HFX'))
+
+    def test_streaming_top_k(self):
+        """
+        Test that ranking a file in one streaming pass gives the same records.
+        """
+        self.assertEqual([record.display() for record in self.manager.top_k('aadt', 50, filename=CSV_FILE)],
+                         self.expected('aadt', 50, True))
+        self.assertEqual([record.display() for record in self.manager.bottom_k('ptrucks', 5, 'county == HFX', CSV_FILE)],
+                         self.expected('ptrucks', 5, False, 'HFX'))
+
+    def test_text_column_rejected(self):
+        """
+        Test that ranking by a text attribute raises a ValueError.
+        """
+        with self.assertRaises(ValueError):
+            self.manager.top_k('county', 5)
+
+class TestRecordRenderer(unittest.TestCase):
+    """
+    Unit tests for the bulk record renderer.
+    """
+
+    def setUp(self):
+        """
+        Set up the test environment by loading the records as objects and as a ColumnarStore.
+        """
+        self.records = business.TrafficManager(CSV_FILE).records[:3000]
+        self.store = business.TrafficManager(CSV_FILE, columnar=True).records
+
+    def render(self, records, fmt, **options):
+        """
+        Render records to a string.
+        """
+        stream = io.StringIO()
+        RecordRenderer(fmt, batch_size=512).write(records, stream, **options)
+        return stream.getvalue()
+
+    def test_text_matches_display(self):
+        """
+        Test that the text format writes the lines of display, with an optional id column.
+        """
+        text = self.render(self.records, 'text', ids=list(range(len(self.records))))
+        prefix = len('Traffic Record - ')
+        self.assertEqual(text, "".join(f"ID: {index}, {record.display()[prefix:]}\n"
+                                       for index, record in enumerate(self.records)))
+
+    def test_csv_and_jsonl_round_trip(self):
+        """
+        Test that the CSV and JSON Lines output read back to the record values.
+        """
+        expected = [[getattr(record, name) for name in RECORD_ATTRIBUTES] for record in self.records]
+        rows = list(csv.reader(io.StringIO(self.render(self.records, 'csv'))))
+        self.assertEqual(rows[0], CSV_FIELDNAMES)
+        self.assertEqual(rows[1:], expected)
+        objects = [json.loads(line) for line in self.render(self.records, 'jsonl').splitlines()]
+        self.assertEqual(objects, [dict(zip(RECORD_ATTRIBUTES, values)) for values in expected])
+
+    def test_columnar_store_matches_objects(self):
+        """
+        Test that a ColumnarStore renders the same as the records built from it, in every format.
+        """
+        records = list(self.store)
+        for fmt in ['text', 'fixed', 'csv', 'jsonl']:
+            self.assertEqual(self.render(self.store, fmt), self.render(records, fmt))
+        with self.assertRaises(ValueError):
+            RecordRenderer('xml')
+
+class TestStringTable(unittest.TestCase):
+    """
+    Unit tests for the shared strings of the repetitive text attributes.
+    """
+
+    def test_intern(self):
+        """
+        Test that equal values share one string and that clear forgets them.
+        """
+        table = StringTable()
+        first = table.intern('HFX')
+        self.assertIs(table.intern(''.join(['H', 'FX'])), first)
+        self.assertEqual(table.share(['x'] * 16)[SHARED_POSITIONS[0]], 'x')
+        self.assertEqual(len(table), 2)
+        table.clear()
+        self.assertEqual(len(table), 0)
+
+    def test_loaded_records_share_strings(self):
+        """
+        Test that the CSV loader and add_record make equal values the same object,
+        and that a reload drops the values of records that are gone.
+        """
+        manager = business.TrafficManager(CSV_FILE)
+        for name in SHARED_ATTRIBUTES:
+            values = {}
+            for record in manager.records:
+                self.assertIs(values.setdefault(getattr(record, name), getattr(record, name)), getattr(record, name))
+        county = manager.records[0].county
+        manager.add_record({'section_id': '1', 'highway': '1', 'section': '1', 'section_length': '1',
+                            'section_description': 'D', 'date': '01/01/2024', 'description': 'D', 'group': 'A',
+                            'type_': 'TC', 'county': county[:1] + county[1:], 'ptrucks': '', 'adt': '1', 'aadt': '1',
+                            'direction': '', 'pct85': '', 'priority_points': ''})
+        self.assertIs(manager.records[-1].county, county)
+        manager.strings.intern('NOT IN THE FILE')
+        manager.reload_data()
+        self.assertNotIn('NOT IN THE FILE', manager.strings.values)
+
 if __name__ == "__main__":
     unittest.main()
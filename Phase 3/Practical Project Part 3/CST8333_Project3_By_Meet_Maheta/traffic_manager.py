@@ -2,17 +2,53 @@
 
 # Author: Meet Maheta
 
+import csv
+import datetime
+import os
+import tempfile
 import mysql.connector
 from mysql.connector import Error
-from record import TrafficRecord
-from special_traffic_record import SpecialTrafficRecord
+from mysql.connector.errors import InterfaceError, OperationalError
+from connection_pool import POOL_SIZE, ConnectionPool
+from record_cache import CACHE_SIZE
+from row_tracker import TABLE_COLUMNS, row_values
+from sql_manager import BATCH_SIZE, SqlManager
 
-class TrafficManager:
+LOAD_QUERY = ("LOAD DATA LOCAL INFILE %s INTO TABLE traffic_volumes CHARACTER SET utf8mb4 "
+              "FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' LINES TERMINATED BY '\\n' (id, "
+              + ", ".join(TABLE_COLUMNS) + ")")
+# The error numbers of a LOAD DATA LOCAL INFILE refused by the server or the client, after which
+# the rows are inserted with batched INSERTs instead: ER_NOT_ALLOWED_COMMAND, CR_LOAD_DATA_LOCAL_INFILE_REJECTED
+# and ER_CLIENT_LOCAL_FILES_DISABLED.
+LOCAL_INFILE_REFUSED = (1148, 2068, 3948)
+# The indexes of the traffic_volumes table and their columns: the lookups by section and county,
+# the date ranges, and the date ranges of one highway.
+TABLE_INDEXES = [('idx_section_id', 'section_id'), ('idx_date', 'date'), ('idx_highway_date', 'highway, date'),
+                 ('idx_county', 'county')]
+# Lists the indexes the traffic_volumes table already has; MySQL has no CREATE INDEX IF NOT EXISTS.
+INDEX_QUERY = ("SELECT DISTINCT INDEX_NAME FROM information_schema.statistics "
+               "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'traffic_volumes'")
+
+
+def infile_value(value):
+    """
+    Format a column value as a field of a LOAD DATA file, where NULL is written as \\N and backslashes are escaped.
+    """
+    if value is None:
+        return '\\N'
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    return str(value).replace('\\', '\\\\')
+
+class TrafficManager(SqlManager):
     """
     The TrafficManager class manages traffic records using MySQL database.
     """
 
-    def __init__(self, host, database, user, password):
+    ERROR = Error
+
+    def __init__(self, host, database, user, password, batch_size=BATCH_SIZE, local_infile=False, pool_size=POOL_SIZE,
+                 cache_size=CACHE_SIZE):
         """
         Initialize the TrafficManager with database connection details.
 
@@ -26,46 +62,85 @@ class TrafficManager:
             The username for the MySQL database.
         password : str
             The password for the MySQL database.
+        batch_size : int
+            The number of rows sent per statement by the bulk writes, and fetched at a time by the streaming reads.
+        local_infile : bool
+            If True, save_data loads the records with LOAD DATA LOCAL INFILE from a temporary file,
+            which the server must allow through its local_infile setting.
+        pool_size : int
+            The most connections open at the same time; each thread that uses the manager checks out its own.
+        cache_size : int
+            The most rows get_record keeps in its LRU cache; 0 disables the cache.
         """
+        super().__init__(batch_size, cache_size)
         self.host = host
         self.database = database
         self.user = user
         self.password = password
-        self.conn = self.connect_to_db()  # Connect to the database
-        self.records = self.load_data() if self.conn else []  # Load data if connection is successful
+        self.local_infile = local_infile
+        self.pool = ConnectionPool(self.connect_to_db, size=pool_size)  # Connections are opened on first use
 
     def connect_to_db(self):
         """
-        Establish a connection to the MySQL database.
+        Open a new connection to the MySQL database. The pool calls this whenever it needs another connection.
 
         Returns:
         --------
-        conn : mysql.connector.connection.MySQLConnection or None
-            The MySQL connection object if successful, None otherwise.
+        conn : mysql.connector.connection.MySQLConnection
+            The new MySQL connection object.
+
+        Raises:
+        -------
+        mysql.connector.Error
+            If the connection cannot be established.
+        """
+        conn = mysql.connector.connect(
+            host=self.host,
+            database=self.database,
+            user=self.user,
+            password=self.password,
+            allow_local_infile=self.local_infile
+        )
+        if conn.is_connected():
+            print("Connected to MySQL database")
+        return conn
+
+    @property
+    def conn(self):
+        """
+        The connection of the calling thread, checked out of the pool on its first use
+        and replaced if it was lost, or None if the database cannot be reached.
         """
         try:
-            conn = mysql.connector.connect(
-                host=self.host,
-                database=self.database,
-                user=self.user,
-                password=self.password
-            )
-            if conn.is_connected():
-                print("Connected to MySQL database")
-            return conn
+            return self.pool.connection()
         except Error as e:
             print(f"Error: {e}")
             return None
 
+    def release_connection(self):
+        """
+        Give the calling thread's connection back to the pool, e.g. when a worker thread is done with the manager.
+        Connections of threads that exit are given back automatically.
+        """
+        self.pool.release()
+
+    def close(self):
+        """
+        Close the connections of the manager.
+        """
+        self.pool.close()
+
     def create_table(self):
         """
-        Create the traffic_volumes table if it does not exist.
+        Create the traffic_volumes table if it does not exist, and any of its indexes that are missing,
+        so a table created before an index was added gets it too.
         """
-        if not self.conn:
+        conn = self.conn
+        if not conn:
             print("Failed to connect to the database.")
             return
         try:
-            cursor = self.conn.cursor()
+            cursor = conn.cursor()
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS traffic_volumes (
                     id INT AUTO_INCREMENT PRIMARY KEY,
@@ -87,200 +162,104 @@ class TrafficManager:
                     priority_points VARCHAR(255)
                 )
             ''')
-            self.conn.commit()
+            cursor.execute(INDEX_QUERY)
+            existing = {row[0] for row in cursor.fetchall()}
+            for name, columns in TABLE_INDEXES:
+                if name not in existing:
+                    cursor.execute(f"CREATE INDEX {name} ON traffic_volumes ({columns})")
+            conn.commit()
         except Error as e:
-            print(f"Database error: {e}")
+            self._database_error(e)
 
-    def load_data(self):
+    def _stream(self, conn, columns, batch_size):
         """
-        Load data from the traffic_volumes table into the records list.
-
-        Returns:
-        --------
-        records : list of TrafficRecord
-            A list of TrafficRecord objects loaded from the database.
+        Run a SELECT of some record attributes on an unbuffered cursor and yield the rows in fetchmany batches.
+        Rows left unread when the caller stops early are drained, so the connection can be used again.
         """
-        if not self.conn:
-            print("Failed to connect to the database.")
-            return []
+        names = ", ".join('`group_`' if name == 'group' else f'`{name}`' for name in columns)
+        cursor = conn.cursor(buffered=False)
+        finished = False
         try:
-            records = []
-            cursor = self.conn.cursor()
-            cursor.execute("SELECT * FROM traffic_volumes")
-            rows = cursor.fetchall()
-            for row in rows:
-                record = TrafficRecord(*row[1:])  # Exclude the auto-incremented ID
-                records.append(record)
-            return records
-        except Error as e:
-            print(f"Database error: {e}")
-            return []
+            cursor.execute(f"SELECT {names} FROM traffic_volumes ORDER BY id")
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    finished = True
+                    return
+                yield rows
+        finally:
+            try:
+                if not finished:
+                    conn.consume_results()
+                cursor.close()
+            except Error:
+                pass
 
-    def save_data(self):
+    def _begin(self, conn):
         """
-        Save the records list to the traffic_volumes table.
+        Begin a write transaction; MySQL starts one with the first statement, as autocommit is off.
         """
-        if not self.conn:
-            print("Failed to connect to the database.")
-            return
-        try:
-            cursor = self.conn.cursor()
-            cursor.execute("DELETE FROM traffic_volumes")  # Clear existing records
-            for record in self.records:
-                cursor.execute('''
-                    INSERT INTO traffic_volumes (
-                        section_id, highway, section, section_length, section_description,
-                        date, description, group_, type_, county, ptrucks, adt, aadt,
-                        direction, pct85, priority_points
-                    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                ''', (
-                    record.section_id, record.highway, record.section, record.section_length,
-                    record.section_description, record.date, record.description, record.group,
-                    record.type_, record.county, record.ptrucks, record.adt, record.aadt,
-                    record.direction, record.pct85, record.priority_points
-                ))
-            self.conn.commit()
-        except Error as e:
-            print(f"Database error: {e}")
 
-    def add_record(self, record_data):
+    def _next_id(self, conn, cursor):
         """
-        Add a new record to the records list and the database.
-
-        Parameters:
-        -----------
-        record_data : dict
-            A dictionary containing the data for the new record.
+        Return the id following the largest id in the table.
+        The ids are chosen here rather than by AUTO_INCREMENT because a multi-row INSERT or LOAD DATA
+        is only given consecutive auto-increment ids in some lock modes, and every new row's id must be known.
+        At InnoDB's default REPEATABLE READ level, reading the largest id FOR UPDATE takes a next-key lock
+        on the end of the primary key, so any other insert of a larger id, from this manager or another client,
+        waits until the transaction ends. LAST_INSERT_ID() is set to the first new id, as it would be
+        for auto-increment ids.
         """
-        if not self.conn:
-            print("Failed to connect to the database.")
-            return
-        record = TrafficRecord(**record_data)
-        self.records.append(record)
+        lookup = conn.cursor(buffered=True)
         try:
-            cursor = self.conn.cursor()
-            cursor.execute('''
-                INSERT INTO traffic_volumes (
-                    section_id, highway, section, section_length, section_description,
-                    date, description, group_, type_, county, ptrucks, adt, aadt,
-                    direction, pct85, priority_points
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            ''', (
-                record.section_id, record.highway, record.section, record.section_length,
-                record.section_description, record.date, record.description, record.group,
-                record.type_, record.county, record.ptrucks, record.adt, record.aadt,
-                record.direction, record.pct85, record.priority_points
-            ))
-            self.conn.commit()
-        except Error as e:
-            print(f"Database error: {e}")
+            lookup.execute("SELECT LAST_INSERT_ID(COALESCE(MAX(id), 0) + 1) FROM traffic_volumes FOR UPDATE")
+            return lookup.fetchone()[0]
+        finally:
+            lookup.close()
 
-    def edit_record(self, record_id, new_data):
+    def _write_rows(self, cursor, records, ids):
         """
-        Edit an existing record in the database.
-
-        Parameters:
-        -----------
-        record_id : int
-            The ID of the record to edit.
-        new_data : dict
-            A dictionary containing the updated data for the record.
-        
-        Returns:
-        --------
-        bool
-            True if the record was successfully edited, False otherwise.
+        Insert records with their ids, with LOAD DATA LOCAL INFILE when local_infile is set.
+        If the server or the client refuses LOAD DATA LOCAL INFILE, local_infile is turned off
+        and the rows are inserted in batches instead, in the same transaction.
         """
-        if not self.conn:
-            print("Failed to connect to the database.")
-            return False
-        try:
-            cursor = self.conn.cursor()
-            cursor.execute('''
-                UPDATE traffic_volumes SET
-                    section_id=%s, highway=%s, section=%s, section_length=%s,
-                    section_description=%s, date=%s, description=%s, group_=%s, type_=%s,
-                    county=%s, ptrucks=%s, adt=%s, aadt=%s, direction=%s, pct85=%s, priority_points=%s
-                WHERE id=%s
-            ''', (
-                new_data['section_id'], new_data['highway'], new_data['section'], new_data['section_length'],
-                new_data['section_description'], new_data['date'], new_data['description'], new_data['group'],
-                new_data['type_'], new_data['county'], new_data['ptrucks'], new_data['adt'], new_data['aadt'],
-                new_data['direction'], new_data['pct85'], new_data['priority_points'], record_id
-            ))
-            self.conn.commit()
-            return cursor.rowcount > 0  # Return True if a record was updated
-        except Error as e:
-            print(f"Database error: {e}")
-            return False
+        if self.local_infile:
+            try:
+                self._load_infile(cursor, records, ids)
+                return
+            except Error as e:
+                if e.errno not in LOCAL_INFILE_REFUSED:
+                    raise
+                print(f"LOAD DATA LOCAL INFILE is not allowed, inserting in batches instead: {e}")
+                self.local_infile = False
+        super()._write_rows(cursor, records, ids)
 
-    def delete_record(self, record_id):
+    def _load_infile(self, cursor, records, ids):
         """
-        Delete a record from the database.
-
-        Parameters:
-        -----------
-        record_id : int
-            The ID of the record to delete.
-        
-        Returns:
-        --------
-        bool
-            True if the record was successfully deleted, False otherwise.
+        Write records with their ids to a temporary CSV file and load it with a single LOAD DATA LOCAL INFILE statement.
         """
-        if not self.conn:
-            print("Failed to connect to the database.")
-            return False
+        with tempfile.NamedTemporaryFile('w', newline='', encoding='utf-8', suffix='.csv', delete=False) as datafile:
+            writer = csv.writer(datafile, lineterminator='\n')
+            for record, row_id in zip(records, ids):
+                writer.writerow([row_id] + [infile_value(value) for value in row_values(record)])
         try:
-            cursor = self.conn.cursor()
-            cursor.execute("DELETE FROM traffic_volumes WHERE id=%s", (record_id,))
-            self.conn.commit()
-            return cursor.rowcount > 0  # Return True if a record was deleted
-        except Error as e:
-            print(f"Database error: {e}")
-            return False
+            cursor.execute(LOAD_QUERY, (datafile.name,))
+        finally:
+            os.remove(datafile.name)
 
-    def get_record(self, record_id):
+    def _rollback(self, conn):
         """
-        Retrieve a record from the database by ID.
-
-        Parameters:
-        -----------
-        record_id : int
-            The ID of the record to retrieve.
-        
-        Returns:
-        --------
-        TrafficRecord or None
-            The TrafficRecord object if found, None otherwise.
+        Undo the open transaction, ignoring a connection that is already gone.
         """
-        if not self.conn:
-            print("Failed to connect to the database.")
-            return None
         try:
-            cursor = self.conn.cursor()
-            cursor.execute("SELECT * FROM traffic_volumes WHERE id=%s", (record_id,))
-            row = cursor.fetchone()
-            if row:
-                return TrafficRecord(*row[1:])  # Exclude the auto-incremented ID
-            return None
-        except Error as e:
-            print(f"Database error: {e}")
-            return None
-
-    def reload_data(self):
-        """
-        Reload the records list from the database.
-        """
-        self.records = self.load_data()
+            conn.rollback()
+        except Error:
+            pass
 
-    def demonstrate_polymorphism(self):
+    def _database_error(self, error):
         """
-        Demonstrate polymorphism with TrafficRecord and SpecialTrafficRecord.
+        Report a database error; when the connection was lost, drop it so the next call reconnects.
         """
-        sample_records = [
-            TrafficRecord("1", "Highway1", "Section1", "10", "Description1", "2023-01-01", "Desc1", "Group1", "Type1", "County1", "10", "1000", "2000", "North", "85", "10"),
-            SpecialTrafficRecord("2", "Highway2", "Section2", "20", "Description2", "2023-01-02", "Desc2", "Group2", "Type2", "County2", "20", "2000", "3000", "South", "90", "20")
-        ]
-        for record in sample_records:
-            print(record.display())
+        super()._database_error(error)
+        if isinstance(error, (InterfaceError, OperationalError)):
+            self.pool.discard()
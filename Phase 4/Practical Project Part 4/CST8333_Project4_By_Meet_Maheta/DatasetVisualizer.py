@@ -2,6 +2,7 @@
 
 # Author: Meet Maheta
 
+import random
 import matplotlib
 matplotlib.use('TkAgg')
 
@@ -13,6 +14,10 @@ except ImportError as e:
     print("Please ensure you have installed pandas and matplotlib.")
     exit(1)
 
+# The number of rows shown by a column preview, and read at a time when a column is sampled.
+PREVIEW_ROWS = 10
+SAMPLE_CHUNK_ROWS = 65536
+
 class DatasetVisualizer:
     """
     This class provides functionality to load a dataset from a CSV file, 
@@ -22,10 +27,31 @@ class DatasetVisualizer:
     def __init__(self, file_path):
         """
         Initialize the DatasetVisualizer with the file path.
-        Load the dataset.
+        Read the column names; the dataset itself is loaded when a chart first needs it.
         """
         self.file_path = file_path
-        self.df = self.load_dataset()
+        self._df = None
+        self.columns = self.load_columns()
+
+    @property
+    def df(self):
+        """
+        The whole dataset as a DataFrame, loaded on first use.
+        """
+        if self._df is None:
+            self._df = self.load_dataset()
+        return self._df
+
+    def load_columns(self):
+        """
+        Read only the header row of the CSV file.
+        Return the column names.
+        """
+        try:
+            return pd.read_csv(self.file_path, nrows=0).columns
+        except FileNotFoundError:
+            print(f"Error: The file at '{self.file_path}' was not found.")
+            exit(1)
 
     def load_dataset(self): 
 
@@ -45,12 +71,42 @@ class DatasetVisualizer:
         Parse the dataset to get value counts of the selected column.
         Return the data as a Series.
         """
-        if column_name not in self.df.columns:
+        if column_name not in self.columns:
             print(f"Error: The column '{column_name}' is not found in the dataset.")
             exit(1)
         data = self.df[column_name].value_counts()
         return data
 
+    def preview_column(self, column_name, rows=PREVIEW_ROWS, sample=False, seed=None):
+        """
+        Preview the values of one column without loading the dataset.
+        The first rows are read and parsing stops there, or a random sample of rows is taken
+        in one streaming pass over the file (reservoir sampling), holding one chunk at a time.
+        Return the values as a Series indexed by row number.
+        """
+        if column_name not in self.columns:
+            print(f"Error: The column '{column_name}' is not found in the dataset.")
+            return None
+        if not sample:
+            if self._df is not None:
+                return self._df[column_name].head(rows)
+            return pd.read_csv(self.file_path, usecols=[column_name], nrows=rows)[column_name]
+        chooser = random.Random(seed)
+        reservoir = []
+        seen = 0
+        for chunk in pd.read_csv(self.file_path, usecols=[column_name], chunksize=SAMPLE_CHUNK_ROWS):
+            for number, value in chunk[column_name].items():
+                if seen < rows:
+                    reservoir.append((number, value))
+                else:
+                    slot = chooser.randrange(seen + 1)  # Each row is kept with probability rows / (seen + 1)
+                    if slot < rows:
+                        reservoir[slot] = (number, value)
+                seen += 1
+        reservoir.sort(key=lambda item: item[0])
+        return pd.Series([value for number, value in reservoir], index=[number for number, value in reservoir],
+                         name=column_name)
+
     def create_vertical_bar_chart(self, data, title, xlabel, ylabel): 
         """
         Create and display a vertical bar chart.
@@ -74,15 +130,15 @@ class DatasetVisualizer:
         Return the selected column name.
         """
         print("Available columns:")
-        for i, column in enumerate(self.df.columns):
+        for i, column in enumerate(self.columns):
             print(f"{i + 1}. {column}")
         while True:
             try:
                 column_index = int(input("Select a column number to visualize (or enter 0 to exit): ")) - 1
                 if column_index == -1:
                     return None
-                if 0 <= column_index < len(self.df.columns):
-                    return self.df.columns[column_index]
+                if 0 <= column_index < len(self.columns):
+                    return self.columns[column_index]
                 else:
                     print("Invalid column number. Please try again.")
             except ValueError:
@@ -95,6 +151,8 @@ class DatasetVisualizer:
         while True:
             print("\n--- Main Menu (Meet Maheta) ---")
             print("1. Visualize a column")
+            print("2. Preview a column (first rows)")
+            print("3. Preview a column (random sample)")
             print("0. Exit")
             try:
                 choice = int(input("Enter your choice: "))
@@ -105,6 +163,12 @@ class DatasetVisualizer:
                         break
                     data = self.parse_dataset(column_name)
                     self.create_vertical_bar_chart(data, f"Vertical Bar Chart of {column_name}", column_name, "Frequency")
+                elif choice in (2, 3):
+                    column_name = self.user_select_column()
+                    if column_name is None:
+                        print("Exiting the program. Goodbye!")
+                        break
+                    print(self.preview_column(column_name, sample=choice == 3).to_string())
                 elif choice == 0:
                     print("Exiting the program. Goodbye!")
                     break